@@ -1,60 +1,38 @@
 import streamlit as st
-import requests
-import os
-import openai
 
-# Initialize OpenAI client
-openai.api_key = os.environ["OPENAI_API_KEY"]
+import app_shell
+
+#Alvin Liu UI
+# Custom CSS for enhanced styling (keeping existing styles but removing button styles)
+MAIN_CSS = """
+    /* Card styling */
+    .css-1r6slb0 {
+        background-color: white;
+        border-radius: 10px;
+        padding: 1.5rem;
+        box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
+        transition: transform 0.2s;
+    }
+    .css-1r6slb0:hover {
+        transform: translateY(-5px);
+    }
+
+    /* Chat container styling */
+    .chat-container {
+        background-color: white;
+        border-radius: 10px;
+        padding: 1rem;
+        margin-top: 1rem;
+        box-shadow: 0 2px 4px rgba(0, 0, 0, 0.1);
+    }
+"""
 
 # Configure Streamlit theme
-st.set_page_config(
-    page_title="Creekside Trail Explorer",
-    page_icon="🏞️",
-    layout="wide",
+app_shell.setup_page(
+    MAIN_CSS,
+    title="Creekside Trail Explorer",
     initial_sidebar_state="expanded"
 )
-#Alvin Liu UI
-# Custom CSS for enhanced styling (keeping existing styles but removing button styles)
-st.markdown("""
-    <style>
-        /* Main content styling */
-        .stApp {
-            background-color: #f5f7f9;
-        }
-        
-        /* Header styling */
-        .main-header {
-            color: #2c3e50;
-            font-family: 'Helvetica Neue', sans-serif;
-            padding: 1.5rem 0;
-            text-align: center;
-            background: linear-gradient(90deg, #a8e6cf 0%, #dcedc1 100%);
-            border-radius: 10px;
-            margin-bottom: 2rem;
-        }
-        
-        /* Card styling */
-        .css-1r6slb0 {
-            background-color: white;
-            border-radius: 10px;
-            padding: 1.5rem;
-            box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-            transition: transform 0.2s;
-        }
-        .css-1r6slb0:hover {
-            transform: translateY(-5px);
-        }
-        
-        /* Chat container styling */
-        .chat-container {
-            background-color: white;
-            border-radius: 10px;
-            padding: 1rem;
-            margin-top: 1rem;
-            box-shadow: 0 2px 4px rgba(0, 0, 0, 0.1);
-        }
-    </style>
-""", unsafe_allow_html=True)
 
 # Main header with enhanced styling
 st.markdown("""
@@ -78,28 +56,7 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Sidebar Enhancement
-with st.sidebar:
-    st.markdown("""
-        <div style='text-align: center; padding: 1rem;'>
-            <h2 style='color: #FFFFFF;'>💭 Trail Chat Assistant</h2>
-        </div>
-    """, unsafe_allow_html=True)
-    
-    if "chat_history" not in st.session_state:
-        st.session_state.chat_history = []
-    
-    # Chat container
-    messages = st.container()
-    with messages:
-        for message in st.session_state.chat_history:
-            if message["role"] == "user":
-                with st.chat_message("user"):
-                    st.write(message["content"])
-    
-    # Chat input with styling
-    prompt = st.chat_input("Ask about trails...")
-    if prompt:
-        st.session_state.chat_history.append({"role": "user", "content": prompt})
+app_shell.chat_sidebar()
 
 # Feature cards with enhanced styling
 st.markdown("<h2 style='color: black;'>🎯 Explore Our Features</h2>", unsafe_allow_html=True)
@@ -161,3 +118,5 @@ st.markdown("""
         <p style='font-size: 0.8em;'>© 2024 Creekside Trail Explorer</p>
     </div>
 """, unsafe_allow_html=True)
+
+app_shell.perf_panel()
@@ -0,0 +1,228 @@
+import argparse
+import io
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Tuple
+
+# Canned answers; long enough that streamed replies arrive in many chunks
+CHAT_REPLY = ("This trail follows the creek through oak woodland and open meadows. "
+              "Expect gentle grades, shaded picnic areas and good birdwatching in spring. "
+              "Bring water, stay on marked paths and check the park's hours before you go.")
+SPECIES_REPLY = {
+    "species": [{"name": "Coast Live Oak", "kind": "plant", "confidence": "high"},
+                {"name": "Western Scrub-Jay", "kind": "animal", "confidence": "medium"}],
+    "summary": "An oak-lined trail with a scrub-jay perched on a branch.",
+}
+
+
+class StubConfig:
+    """Latency and failure behaviour shared by every request the stub serves."""
+
+    def __init__(self, latency: float = 0.5, jitter: float = 0.5, chunk_interval: float = 0.02,
+                 error_rate: float = 0.0, rate_limit_rate: float = 0.0, seed: Optional[int] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.chunk_interval = chunk_interval
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.requests = 0
+        self.failures = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay(self) -> float:
+        """Seconds before the first byte: `latency` scaled by up to +/- `jitter`."""
+        with self._lock:
+            return max(0.0, self.latency * (1 + self._random.uniform(-self.jitter, self.jitter)))
+
+    def point(self) -> Tuple[float, float]:
+        """A random (lat, lng) in the county, for geocode replies."""
+        with self._lock:
+            return 37.2 + self._random.random() * 0.3, -122.1 + self._random.random() * 0.5
+
+    def failure(self) -> Optional[int]:
+        """HTTP status to fail this request with, if it should fail."""
+        with self._lock:
+            self.requests += 1
+            roll = self._random.random()
+            if roll < self.rate_limit_rate:
+                self.failures += 1
+                return 429
+            if roll < self.rate_limit_rate + self.error_rate:
+                self.failures += 1
+                return 500
+            return None
+
+
+def _png(size: int = 64) -> bytes:
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (size, size), (120, 170, 110)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Minimal stand-ins for the OpenAI and Google Maps endpoints the app uses.
+
+    OpenAI: POST /v1/chat/completions (streamed or not, JSON mode aware) and
+    POST /v1/images/generations, whose URLs point back at GET /files/*.png.
+    Google Maps: GET /maps/api/geocode/json.
+    """
+
+    protocol_version = "HTTP/1.1"
+    config: StubConfig = StubConfig()
+    image: bytes = b""
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: dict, headers: Optional[dict] = None) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _fail(self) -> bool:
+        status = self.config.failure()
+        if status is None:
+            return False
+        time.sleep(self.config.delay() / 4)
+        if status == 429:
+            self._send_json(429, {"error": {"message": "Rate limit reached (stub)", "type": "rate_limit"}},
+                            {"Retry-After": "0.2"})
+        else:
+            self._send_json(500, {"error": {"message": "Internal error (stub)", "type": "server_error"}})
+        return True
+
+    def _read_body(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_POST(self):
+        body = self._read_body()
+        path = self.path.split("?")[0]
+        if self._fail():
+            return
+        if path.endswith("/chat/completions"):
+            self._chat(body)
+        elif path.endswith("/images/generations"):
+            time.sleep(self.config.delay())
+            host = self.headers.get("Host")
+            self._send_json(200, {"created": int(time.time()),
+                                  "data": [{"url": f"http://{host}/files/illustration.png"}]})
+        else:
+            self._send_json(404, {"error": {"message": f"No stub for {path}"}})
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path.startswith("/files/"):
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(self.image)))
+            self.end_headers()
+            self.wfile.write(self.image)
+        elif path == "/maps/api/geocode/json":
+            if self._fail():
+                return
+            time.sleep(self.config.delay())
+            lat, lng = self.config.point()
+            self._send_json(200, {"status": "OK", "results": [{"geometry": {"location": {"lat": lat, "lng": lng}}}]})
+        else:
+            self.send_error(404)
+
+    def _chat(self, body: dict) -> None:
+        model = body.get("model", "stub")
+        json_mode = (body.get("response_format") or {}).get("type") == "json_object"
+        text = json.dumps(SPECIES_REPLY) if json_mode else CHAT_REPLY
+        prompt_tokens = len(json.dumps(body.get("messages", []))) // 4
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(text) // 4,
+                 "total_tokens": prompt_tokens + len(text) // 4}
+        time.sleep(self.config.delay())
+
+        if not body.get("stream"):
+            self._send_json(200, {
+                "id": "chatcmpl-stub", "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text},
+                             "finish_reason": "stop"}],
+                "usage": usage,
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def event(payload) -> None:
+            data = f"data: {payload}\n\n".encode()
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        def chunk(choices: list, **extra) -> str:
+            return json.dumps({"id": "chatcmpl-stub", "object": "chat.completion.chunk",
+                               "created": int(time.time()), "model": model, "choices": choices, **extra})
+
+        try:
+            words = text.split(" ")
+            for i, word in enumerate(words):
+                content = word if i == len(words) - 1 else word + " "
+                event(chunk([{"index": 0, "delta": {"content": content}, "finish_reason": None}]))
+                time.sleep(self.config.chunk_interval)
+            event(chunk([{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+            if (body.get("stream_options") or {}).get("include_usage"):
+                event(chunk([], usage=usage))
+            event("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client closed the stream early, e.g. on a Streamlit rerun
+            pass
+
+
+def start(port: int = 0, config: Optional[StubConfig] = None, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """
+    Serve the stubs on a background thread and return the server.
+
+    Point the app at them with OPENAI_BASE_URL=http://host:port/v1 and
+    GOOGLE_MAPS_BASE_URL=http://host:port; `port=0` picks a free port.
+    """
+    handler = type("ConfiguredStubHandler", (StubHandler,), {"config": config or StubConfig(), "image": _png()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="api-stubs", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve local stand-ins for the OpenAI and Google Maps APIs.")
+    parser.add_argument("--port", type=int, default=8088)
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds before each response starts")
+    parser.add_argument("--jitter", type=float, default=0.5, help="Latency varies by up to this share")
+    parser.add_argument("--chunk-interval", type=float, default=0.02, help="Seconds between streamed chunks")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests failing with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share of requests failing with 429")
+    args = parser.parse_args()
+
+    config = StubConfig(args.latency, args.jitter, args.chunk_interval, args.error_rate, args.rate_limit_rate)
+    server = start(args.port, config)
+    host, port = server.server_address
+    print(f"Stubs listening; run the app with\n"
+          f"  OPENAI_BASE_URL=http://{host}:{port}/v1 OPENAI_API_KEY=stub "
+          f"GOOGLE_MAPS_BASE_URL=http://{host}:{port} streamlit run Main.py")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
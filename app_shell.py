@@ -0,0 +1,159 @@
+import html
+import os
+import re
+import sys
+import uuid
+from collections import deque
+from functools import lru_cache
+
+import openai
+import streamlit as st
+
+import perf_trace
+import trail_chat
+
+# Styles shared by every page; pages pass their own additions to `setup_page`
+BASE_CSS = """
+    /* Main content styling */
+    .stApp {
+        background-color: #f5f7f9;
+    }
+
+    /* Header styling */
+    .main-header {
+        color: #2c3e50;
+        font-family: 'Helvetica Neue', sans-serif;
+        padding: 1.5rem 0;
+        text-align: center;
+        background: linear-gradient(90deg, #a8e6cf 0%, #dcedc1 100%);
+        border-radius: 10px;
+        margin-bottom: 2rem;
+    }
+"""
+
+# Headings and buttons as styled on the feature pages
+PAGE_CSS = """
+    h1, h2, h3, h4 {
+        color: black !important;
+        font-family: 'Helvetica Neue', sans-serif;
+        margin-bottom: 1rem;
+    }
+
+    .stButton>button {
+        border-radius: 20px;
+        background-color: #3498db;
+        color: white;
+        border: none;
+        padding: 0.5rem 1rem;
+        transition: background-color 0.3s;
+    }
+
+    .stButton>button:hover {
+        background-color: #2980b9;
+    }
+"""
+
+# Query parameter that turns the performance panel on (?perf=1) or off (?perf=0)
+PERF_PARAM = "perf"
+
+# Script runs of this session listed in the performance panel
+PERF_HISTORY = 20
+
+
+def minify_css(css: str) -> str:
+    """Strip comments and collapse whitespace in a stylesheet."""
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    return re.sub(r"\s*([{};:,>])\s*", r"\1", css).strip()
+
+
+@lru_cache(maxsize=None)
+def style_block(css: str) -> str:
+    """The `<style>` element for the shared styles plus `css`, built once per process."""
+    return f"<style>{minify_css(BASE_CSS + css)}</style>"
+
+
+def configure_openai() -> None:
+    """Point the OpenAI client at the API key from the environment, if one is set."""
+    key = os.environ.get("OPENAI_API_KEY")
+    if key:
+        openai.api_key = key
+
+
+def setup_page(css: str = "", title: str = None, icon: str = "🏞️", **page_config) -> None:
+    """
+    Configure a page: page settings, the OpenAI key and the stylesheet.
+    Also starts the timing trace for this script run (see perf_trace.py).
+
+    Streamlit drops any element a rerun does not draw again, so the styles
+    are re-sent on every rerun; they are assembled and minified once per
+    process and sent as a single element.
+
+    Args:
+        css (str): Page-specific CSS added after the shared styles
+        title (str): Browser tab title; the page config is left alone if None
+        icon (str): Browser tab icon
+        **page_config: Further `st.set_page_config` arguments
+    """
+    page = os.path.basename(sys._getframe(1).f_code.co_filename)
+    session = st.session_state.setdefault("perf_session", uuid.uuid4().hex[:12])
+    perf_trace.start_trace(page, session)
+    if title is not None:
+        st.set_page_config(page_title=title, page_icon=icon, layout="wide", **page_config)
+    configure_openai()
+    st.markdown(style_block(css), unsafe_allow_html=True)
+
+
+def chat_sidebar() -> None:
+    """Draw the Trail Chat Assistant in the sidebar."""
+    with st.sidebar:
+        trail_chat.chat_sidebar()
+
+
+def waterfall_html(trace: perf_trace.Trace) -> str:
+    """Draw a trace's spans as horizontal bars placed by start time and duration."""
+    total = max(trace.seconds * 1000, 1.0)
+    rows = []
+    for span in trace.waterfall():
+        left = 100 * span["offset_ms"] / total
+        width = max(100 * span["ms"] / total, 0.5)
+        color = "#e74c3c" if span["error"] else "#3498db"
+        details = ", ".join(f"{key}={value}" for key, value in span.items()
+                            if key not in ("span", "depth", "offset_ms", "ms") and value != "")
+        rows.append(
+            f"<div title='{html.escape(details, quote=True)}' style='font-size:0.75em;margin:2px 0'>"
+            f"<div style='padding-left:{span['depth'] * 0.75}em'>{html.escape(span['span'])} "
+            f"<span style='color:#7f8c8d'>{span['ms']:,.1f} ms</span></div>"
+            f"<div style='background:#ecf0f1;height:6px;position:relative'>"
+            f"<div style='position:absolute;left:{left:.2f}%;width:{width:.2f}%;height:6px;"
+            f"background:{color}'></div></div></div>"
+        )
+    return "".join(rows) or "<div style='font-size:0.75em'>No spans recorded in this run.</div>"
+
+
+def perf_panel() -> None:
+    """
+    Draw the performance panel in the sidebar, if this session turned it on with `?perf=1`.
+
+    Call at the end of a page. It shows a waterfall of the spans recorded so
+    far in this run, this session's recent run times and process-wide span
+    percentiles. Spans from worker threads appear only if the work was
+    submitted with the run's context.
+    """
+    if PERF_PARAM in st.query_params:
+        st.session_state.show_perf = st.query_params[PERF_PARAM] != "0"
+    trace = perf_trace.current_trace()
+    if not st.session_state.get("show_perf") or trace is None:
+        return
+
+    trace.finish()
+    runs = st.session_state.setdefault("perf_runs", deque(maxlen=PERF_HISTORY))
+    runs.appendleft({"page": trace.page, "run": trace.id, "ms": round(trace.seconds * 1000, 1),
+                     "spans": len(trace.spans)})
+    with st.sidebar.expander("⏱️ Performance", expanded=True):
+        st.caption(f"This run: {trace.seconds * 1000:,.0f} ms, {len(trace.spans)} spans")
+        st.markdown(waterfall_html(trace), unsafe_allow_html=True)
+        st.caption("Recent runs in this session")
+        st.dataframe(list(runs), hide_index=True)
+        st.caption("All sessions (recent samples)")
+        st.dataframe(perf_trace.metrics.summary(), hide_index=True)
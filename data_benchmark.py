@@ -0,0 +1,372 @@
+import argparse
+import datetime
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+import geocode_index
+import park_map
+import park_search
+import park_spatial
+import park_stats
+import park_table
+import parks_data
+import parks_snapshot
+import perf_trace
+from response_cache import CACHE_DIR
+
+BENCHMARK_DIR = os.path.join(CACHE_DIR, "benchmarks")
+DEFAULT_RESULTS = os.path.join(BENCHMARK_DIR, "data_results.json")
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, "data_baseline.json")
+
+SIZES = (1_000, 10_000, 100_000, 1_000_000)
+
+# Bump when the generator changes so cached datasets are rebuilt
+GENERATOR_VERSION = 1
+
+# A result counts as a regression when it is this much slower than the
+# baseline and at least MIN_DELTA seconds slower (below that is timer noise)
+TOLERANCE = 0.25
+MIN_DELTA = 0.0005
+
+# Steps slower than this (seconds) are timed once instead of `repeat` times
+SLOW_STEP = 2.0
+
+# Cardinality and mix modelled on Parks.csv: a few cities (San Jose most
+# common), about a fifth of rows without a city or street address, two
+# statuses and four suffixes
+CITY_WEIGHTS = {
+    "San Jose": 30, "Santa Clara": 6, "Sunnyvale": 6, "Cupertino": 5, "Palo Alto": 5,
+    "Mountain View": 5, "Milpitas": 4, "Campbell": 4, "Los Gatos": 4, "Saratoga": 4,
+    "Morgan Hill": 4, "Gilroy": 4, "Los Altos": 3, "Los Altos Hills": 2, "Monte Sereno": 1,
+    "Watsonville": 1,
+}
+BLANK_CITY = 0.2
+BLANK_ADDRESS = 0.22
+BLANK_ZIP = 0.5
+STATUS_WEIGHTS = {"open": 0.75, "closed/land bank": 0.25}
+SUFFIX_WEIGHTS = {"County Park": 0.65, "Property": 0.24, "Park": 0.08, "Heritage County Park": 0.03}
+
+NAME_WORDS = ["Alder", "Almaden", "Anderson", "Bernal", "Calero", "Chesbro", "Coyote", "Cottle",
+              "Del Valle", "Ed Levin", "Grant", "Guadalupe", "Hellyer", "Joseph", "Lexington",
+              "Madonna", "Metcalf", "Montalvo", "Moody", "Penitencia", "Rancho", "Sanborn",
+              "Santa Teresa", "Stevens", "Summit", "Tulare", "Uvas", "Vasona", "Villa", "Wilder"]
+NAME_FEATURES = ["Creek", "Hill", "Ridge", "Lake", "Reservoir", "Gulch", "Meadow", "Canyon",
+                 "Valley", "Springs", "Trail", "Grove", "Road", "Point", "Falls"]
+STREETS = ["Snell", "Bernal", "McKean", "Dell", "Metcalf", "Montalvo", "Cristo Rey", "Pole Line",
+           "Watsonville", "Almaden", "Hellyer", "Santa Teresa", "Blossom Hill", "Capitol", "Story"]
+STREET_TYPES = ["Ave.", "Rd.", "Drive", "Blvd.", "Way", "Ln."]
+
+# Cities picked in the city filter, and searches typed into the trail selector
+FILTER_CITIES = ["San Jose", "Palo Alto"]
+PREFIX_QUERY = "santa t"
+FUZZY_QUERY = "penitncia crek"
+
+
+def _weighted(rng: np.random.Generator, weights: Dict[str, float], n: int) -> np.ndarray:
+    values = np.array(list(weights), dtype=object)
+    p = np.array(list(weights.values()), dtype=float)
+    return values[rng.choice(len(values), size=n, p=p / p.sum())]
+
+
+def _blank(rng: np.random.Generator, values: np.ndarray, share: float) -> np.ndarray:
+    values = values.astype(object)
+    values[rng.random(len(values)) < share] = None
+    return values
+
+
+def generate_parks(n: int, seed: int = 0) -> pd.DataFrame:
+    """A raw frame shaped like Parks.csv with `n` rows (as read with every column a string)."""
+    rng = np.random.default_rng(seed)
+    names = (_weighted(rng, {word: 1 for word in NAME_WORDS}, n) + " "
+             + _weighted(rng, {word: 1 for word in NAME_FEATURES}, n))
+    # Large datasets have many distinct names, not just the word combinations
+    numbered = rng.random(n) < 0.5
+    names[numbered] = names[numbered] + " " + rng.integers(1, max(n // 10, 2), numbered.sum()).astype(str)
+
+    addresses = (rng.integers(100, 25000, n).astype(str) + " "
+                 + _weighted(rng, {street: 1 for street in STREETS}, n) + " "
+                 + _weighted(rng, {street_type: 1 for street_type in STREET_TYPES}, n))
+    cities = _weighted(rng, CITY_WEIGHTS, n)
+    zip_codes = rng.integers(95002, 95197, n).astype(str).astype(object)
+    plus_four = rng.random(n) < 0.1
+    zip_codes[plus_four] = zip_codes[plus_four] + "-" + rng.integers(1000, 9999, plus_four.sum()).astype(str)
+
+    acres = rng.lognormal(mean=3.0, sigma=2.0, size=n)
+    area = acres * 4046.86 * rng.uniform(0.95, 1.05, n)
+    created = pd.Timestamp("2020-01-01", tz="UTC") + pd.to_timedelta(rng.integers(0, 5 * 365 * 86400, n), unit="s")
+
+    return pd.DataFrame({
+        "OBJECTID": rng.permutation(n) + 1,
+        "Park Name": names,
+        "Address": _blank(rng, addresses, BLANK_ADDRESS),
+        "City": _blank(rng, cities, BLANK_CITY),
+        "Zip Code": _blank(rng, zip_codes, BLANK_ZIP),
+        "Status": _weighted(rng, STATUS_WEIGHTS, n),
+        "Suffix": _weighted(rng, SUFFIX_WEIGHTS, n),
+        "Acres": acres,
+        "created_date": created.strftime(parks_data.CREATED_DATE_FORMAT),
+        "Shape__Area": area,
+        "Shape__Length": np.sqrt(area) * 4 * rng.uniform(1.0, 3.0, n),
+    })
+
+
+def generate_coordinates(df: pd.DataFrame, seed: int = 0) -> pd.DataFrame:
+    """A coordinate table for `df` (see geocode_index.py): city centre plus jitter, else the county."""
+    rng = np.random.default_rng(seed + 1)
+    centres = [geocode_index.CITY_CENTROIDS.get(city, geocode_index.COUNTY_CENTROID)
+               if isinstance(city, str) else geocode_index.COUNTY_CENTROID for city in df["City"]]
+    lat, lng = np.array(centres).T
+    has_address = df["Address"].notna().to_numpy()
+    return pd.DataFrame({
+        "objectid": df["OBJECTID"],
+        "lat": lat + rng.normal(0, 0.03, len(df)),
+        "lng": lng + rng.normal(0, 0.03, len(df)),
+        "source": np.where(has_address, "address", "city_centroid"),
+        "query": "",
+    })
+
+
+def dataset(n: int, seed: int = 0, directory: str = BENCHMARK_DIR) -> Dict[str, str]:
+    """Paths of the synthetic parks CSV and coordinate table for `n` rows, generated on first use."""
+    os.makedirs(directory, exist_ok=True)
+    stem = os.path.join(directory, f"parks_v{GENERATOR_VERSION}_{n}_{seed}")
+    paths = {"parks": stem + ".csv", "coordinates": stem + "_coordinates.csv"}
+    if not all(os.path.exists(path) for path in paths.values()):
+        df = generate_parks(n, seed)
+        generate_coordinates(df, seed).to_csv(paths["coordinates"], index=False)
+        df.to_csv(paths["parks"], index=False)
+    return paths
+
+
+def measure(fn: Callable, repeat: int) -> Dict[str, float]:
+    """
+    Median and best wall time of `repeat` calls to `fn`, after one warm-up call.
+
+    Steps whose warm-up takes over `SLOW_STEP` seconds are timed by that
+    call alone, so the largest datasets finish in minutes.
+    """
+    start = time.perf_counter()
+    fn()
+    warm_up = time.perf_counter() - start
+    if warm_up > SLOW_STEP:
+        return {"median_s": warm_up, "min_s": warm_up, "runs": 1}
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return {"median_s": statistics.median(times), "min_s": min(times), "runs": repeat}
+
+
+def run_size(n: int, repeat: int, seed: int = 0) -> List[dict]:
+    """Time each step of the Trail Finder data path on a synthetic dataset of `n` rows."""
+    paths = dataset(n, seed)
+    results = []
+
+    def record(op: str, fn: Callable, **extra) -> None:
+        result = measure(fn, repeat)
+        results.append({"rows": n, "op": op, **result,
+                         "ns_per_row": result["median_s"] / n * 1e9, **extra})
+
+    # Load: CSV parse, columnar snapshot, cached in-process frame
+    record("load.csv", lambda: parks_data.parse_parks(pd.read_csv(paths["parks"], dtype={"Zip Code": str})))
+    with tempfile.TemporaryDirectory() as snapshot_dir:
+        parks_snapshot.build_snapshot(paths["parks"], snapshot_dir)
+        record("load.snapshot", lambda: parks_snapshot.load_snapshot(snapshot_dir))
+    record("load.cached", lambda: parks_data.load_parks(paths["parks"]))
+    record("load.coordinates", lambda: geocode_index.load_coordinate_table(paths["coordinates"]))
+    df = parks_data.load_parks(paths["parks"])
+    coordinates = geocode_index.load_coordinate_table(paths["coordinates"])
+
+    # City filter, as the sidebar multiselect applies it
+    record("filter.cities", lambda: sorted(df["city"].dropna().unique()))
+    record("filter.city", lambda: df[df["city"].isin(FILTER_CITIES).to_numpy()])
+    mask = df["city"].isin(FILTER_CITIES).to_numpy()
+    filtered = df[mask]
+
+    # Filtered table: sorted once per filter, then sent one page at a time
+    table_filter = park_table.TableFilter(cities=tuple(FILTER_CITIES))
+    record("table.sort", lambda: park_table.order_rows(df, table_filter, "park name"))
+    rows, distances = park_table.order_rows(df, table_filter, "park name")
+    page = park_table.page_frame(df, rows, distances, park_table.DEFAULT_COLUMNS, 0, 25)
+    record("table.page", lambda: park_table.page_frame(df, rows, distances, park_table.DEFAULT_COLUMNS, 0, 25),
+           payload_bytes=len(page.to_json(orient="split")))
+
+    # Name lookup in the trail selector
+    record("search.build", lambda: park_search.ParkSearchIndex(df))
+    index = park_search.ParkSearchIndex(df)
+    record("search.prefix", lambda: index.search(PREFIX_QUERY, limit=50, allowed=mask))
+    record("search.fuzzy", lambda: index.search(FUZZY_QUERY, limit=50, allowed=mask))
+    record("search.browse", lambda: index.search("", limit=50, allowed=mask))
+
+    # Statistics panel
+    metric = next(iter(park_stats.METRICS))
+    record("stats.build", lambda: park_stats.AggregateCube(df))
+    cube = park_stats.AggregateCube(df)
+    record("stats.query", lambda: cube.query(metric, city=FILTER_CITIES))
+    record("stats.exact", lambda: park_stats.summarize(filtered[metric].to_numpy()))
+
+    # Distance filter
+    objectids = df["objectid"].tolist()
+    rows = [row for row, objectid in enumerate(objectids) if objectid in coordinates]
+    lats = [coordinates[objectids[row]].lat for row in rows]
+    lngs = [coordinates[objectids[row]].lng for row in rows]
+    record("spatial.build", lambda: park_spatial.SpatialIndex(lats, lngs, rows))
+    spatial = park_spatial.SpatialIndex(lats, lngs, rows)
+    centre = geocode_index.CITY_CENTROIDS["San Jose"]
+    record("spatial.within", lambda: spatial.within(*centre, 5))
+    record("spatial.nearest", lambda: spatial.nearest(*centre, 10))
+
+    # Map payload for the filtered parks, serialized as FastMarkerCluster sends it
+    record("map.payload", lambda: json.dumps(park_map.marker_data(filtered, coordinates)),
+           payload_bytes=len(json.dumps(park_map.marker_data(filtered, coordinates))),
+           markers=len(filtered))
+    return results
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=parks_data.APP_DIR,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"python": platform.python_version(), "numpy": np.__version__, "pandas": pd.__version__,
+            "platform": platform.platform(), "processor": platform.processor() or platform.machine(),
+            "commit": commit}
+
+
+def run(sizes=SIZES, repeat: int = 3, seed: int = 0, log: Optional[Callable[[str], None]] = None) -> dict:
+    """Run every size and return the results document written by `--output`."""
+    results = []
+    for n in sizes:
+        if log:
+            log(f"{n:,} rows...")
+        results += run_size(n, repeat, seed)
+    return {"version": 1, "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "environment": environment(), "repeat": repeat, "seed": seed, "results": results}
+
+
+def compare(current: dict, baseline: dict, tolerance: float = TOLERANCE,
+            min_delta: float = MIN_DELTA) -> List[dict]:
+    """
+    Match results to the baseline by (rows, op) and flag regressions.
+
+    Returns:
+        list: One entry per matched result with `ratio` (current / baseline
+        median) and `regression` set when it is over `tolerance` and at
+        least `min_delta` seconds slower
+    """
+    before = {(result["rows"], result["op"]): result for result in baseline["results"]}
+    comparisons = []
+    for result in current["results"]:
+        base = before.get((result["rows"], result["op"]))
+        if base is None:
+            continue
+        ratio = result["median_s"] / base["median_s"] if base["median_s"] else math.inf
+        delta = result["median_s"] - base["median_s"]
+        comparisons.append({"rows": result["rows"], "op": result["op"], "median_s": result["median_s"],
+                            "baseline_s": base["median_s"], "ratio": ratio,
+                            "regression": ratio > 1 + tolerance and delta >= min_delta})
+    return comparisons
+
+
+def scaling(results: List[dict]) -> Dict[str, float]:
+    """Fitted exponent k of time ~ rows^k per op, between its smallest and largest size."""
+    by_op: Dict[str, List[dict]] = {}
+    for result in results:
+        by_op.setdefault(result["op"], []).append(result)
+    exponents = {}
+    for op, runs in by_op.items():
+        runs = sorted(runs, key=lambda result: result["rows"])
+        small, large = runs[0], runs[-1]
+        if large["rows"] > small["rows"] and small["median_s"] > 0:
+            exponents[op] = (math.log(large["median_s"] / small["median_s"])
+                             / math.log(large["rows"] / small["rows"]))
+    return exponents
+
+
+def format_time(seconds: float) -> str:
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.0f} µs"
+    if seconds < 1:
+        return f"{seconds * 1e3:.1f} ms"
+    return f"{seconds:.2f} s"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the parks data path on synthetic datasets.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES), help="Dataset sizes in rows")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per step (median reported)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=DEFAULT_RESULTS, help="Where to write the JSON results")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE,
+                        help="Slowdown over the baseline counted as a regression (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    # Keep benchmark runs out of the app's span log
+    perf_trace.ENABLED = False
+    current = run(args.sizes, args.repeat, args.seed, log=lambda message: print(message, file=sys.stderr))
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(current, f, indent=2)
+
+    baseline = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    comparisons = {(c["rows"], c["op"]): c for c in compare(current, baseline, args.tolerance)} if baseline else {}
+
+    exponents = scaling(current["results"])
+    print(f"{'op':<18} {'rows':>10} {'median':>10} {'ns/row':>10}" + (f" {'baseline':>10} {'change':>8}" if baseline else ""))
+    for result in current["results"]:
+        line = (f"{result['op']:<18} {result['rows']:>10,} {format_time(result['median_s']):>10} "
+                f"{result['ns_per_row']:>10,.1f}")
+        comparison = comparisons.get((result["rows"], result["op"]))
+        if comparison:
+            line += f" {format_time(comparison['baseline_s']):>10} {comparison['ratio'] - 1:>+8.0%}"
+            if comparison["regression"]:
+                line += "  REGRESSION"
+        print(line)
+    print("Scaling (time ~ rows^k): " + ", ".join(f"{op} {k:.2f}" for op, k in exponents.items()))
+    # Index builds are not per-rerun costs, but the first render after the
+    # data changes waits for them, so state what they cost at the largest size
+    largest = {}
+    for result in current["results"]:
+        if result["op"].endswith(".build") and result["rows"] >= largest.get(result["op"], {}).get("rows", 0):
+            largest[result["op"]] = result
+    if largest:
+        print("One-off builds on the first render after a data change: " + ", ".join(
+            f"{op} {format_time(result['median_s'])} at {result['rows']:,} rows"
+            + (f" (k={exponents[op]:.2f})" if op in exponents else "")
+            for op, result in largest.items()))
+    print(f"Results written to {args.output}")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+    elif baseline is None:
+        print(f"No baseline at {args.baseline}; run with --save-baseline to store one")
+    else:
+        regressions = [c for c in comparisons.values() if c["regression"]]
+        print(f"{len(regressions)} regression(s) against the baseline from {baseline.get('created')}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
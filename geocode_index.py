@@ -0,0 +1,331 @@
+import argparse
+import csv
+import hashlib
+import os
+import threading
+import time
+from functools import lru_cache
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+
+import pandas as pd
+
+import perf_trace
+from parks_data import PARKS_CSV, load_parks
+from response_cache import CACHE_DIR
+
+COORDINATES_CSV = os.path.join(CACHE_DIR, "park_coordinates.csv")
+
+# Used when neither the address nor the city can be resolved
+COUNTY_CENTROID = (37.2333, -121.6953)  # Santa Clara County
+
+# Approximate city centres, used by LocalGeocoder
+CITY_CENTROIDS = {
+    "Campbell": (37.2872, -121.9500),
+    "Cupertino": (37.3230, -122.0322),
+    "Gilroy": (37.0058, -121.5683),
+    "Los Altos": (37.3852, -122.1141),
+    "Los Altos Hills": (37.3797, -122.1375),
+    "Los Gatos": (37.2358, -121.9624),
+    "Milpitas": (37.4323, -121.8996),
+    "Monte Sereno": (37.2363, -121.9927),
+    "Morgan Hill": (37.1305, -121.6544),
+    "Mountain View": (37.3861, -122.0839),
+    "Palo Alto": (37.4419, -122.1430),
+    "San Jose": (37.3382, -121.8863),
+    "Santa Clara": (37.3541, -121.9552),
+    "Saratoga": (37.2638, -122.0230),
+    "Sunnyvale": (37.3688, -122.0363),
+    "Watsonville": (36.9102, -121.7569),
+}
+
+COLUMNS = ["objectid", "lat", "lng", "source", "query"]
+
+# Values of the `source` column: a real geocode of the street address, an
+# offline estimate near the address's city (LocalGeocoder), or a fallback
+ADDRESS = "address"
+ESTIMATED = "estimated"
+CITY_CENTROID = "city_centroid"
+COUNTY_CENTROID_SOURCE = "county_centroid"
+
+# A geocoder takes a free-form query and returns (lat, lng), or None if it has no match.
+# Geocoders whose street-level results are not real positions set `precise = False`.
+Geocoder = Callable[[str], Optional[Tuple[float, float]]]
+
+
+class Coordinate(NamedTuple):
+    lat: float
+    lng: float
+    source: str
+
+    @property
+    def exact(self) -> bool:
+        """Whether this is a real geocode of the park's street address."""
+        return self.source == ADDRESS
+
+
+class RateLimitError(Exception):
+    """Raised by a geocoder when the upstream service asks us to slow down."""
+
+
+class GoogleGeocoder:
+    """Geocoder backed by the Google Maps Geocoding API."""
+
+    precise = True
+
+    def __init__(self, key: str, queries_per_second: int = 10):
+        import googlemaps
+        # GOOGLE_MAPS_BASE_URL points the client at a stand-in (see api_stubs.py)
+        base_url = os.environ.get("GOOGLE_MAPS_BASE_URL", "https://maps.googleapis.com")
+        self.client = googlemaps.Client(key=key, queries_per_second=queries_per_second, base_url=base_url)
+
+    def __call__(self, query: str) -> Optional[Tuple[float, float]]:
+        import googlemaps
+        try:
+            with perf_trace.span("geocode.google"):
+                result = self.client.geocode(query)
+        except googlemaps.exceptions.ApiError as e:
+            if e.status == "OVER_QUERY_LIMIT":
+                raise RateLimitError(str(e)) from e
+            raise
+        except googlemaps.exceptions.Timeout as e:
+            raise RateLimitError(str(e)) from e
+        if not result:
+            return None
+        location = result[0]["geometry"]["location"]
+        return location["lat"], location["lng"]
+
+
+class LocalGeocoder:
+    """
+    Offline stand-in geocoder for tests and development.
+
+    Resolves "City, CA" to the city centre and street addresses to a stable
+    point within a couple of kilometres of their city, without any network.
+    Those street-level points are made up, so `build_index` records them as
+    ESTIMATED rather than ADDRESS.
+    """
+
+    precise = False
+
+    def __init__(self, centroids: Dict[str, Tuple[float, float]] = CITY_CENTROIDS):
+        self.centroids = centroids
+
+    def __call__(self, query: str) -> Optional[Tuple[float, float]]:
+        parts = [part.strip() for part in query.split(",")]
+        city = next((part for part in parts if part in self.centroids), None)
+        if city is None:
+            return None
+        lat, lng = self.centroids[city]
+        if parts[0] == city:
+            return lat, lng
+        digest = hashlib.sha1(query.encode("utf-8")).digest()
+        return (lat + (digest[0] - 128) / 128 * 0.02,
+                lng + (digest[1] - 128) / 128 * 0.02)
+
+
+def _is_blank(value) -> bool:
+    return value is None or pd.isna(value) or str(value).strip() == ""
+
+
+def address_query(row: dict) -> Optional[str]:
+    """Build the geocoding query for a park row, or None if it has no street address."""
+    if _is_blank(row.get("address")):
+        return None
+    parts = [str(row["address"]).strip()]
+    if not _is_blank(row.get("city")):
+        parts.append(str(row["city"]).strip())
+    parts.append("CA")
+    if not _is_blank(row.get("zip code")):
+        parts[-1] = f"CA {str(row['zip code']).strip()}"
+    return ", ".join(parts)
+
+
+def geocode_with_retry(geocoder: Geocoder, query: str, retries: int = 5,
+                       backoff: float = 1.0) -> Optional[Tuple[float, float]]:
+    """Call the geocoder, backing off exponentially while it is rate limited."""
+    for attempt in range(retries):
+        try:
+            return geocoder(query)
+        except RateLimitError:
+            if attempt == retries - 1:
+                raise
+            time.sleep(backoff * 2 ** attempt)
+
+
+def load_coordinate_table(path: str = COORDINATES_CSV) -> Dict[int, Coordinate]:
+    """Read the sidecar coordinate table into a dict keyed by OBJECTID."""
+    if not os.path.exists(path):
+        return {}
+    coordinates = {}
+    with perf_trace.span("geocode.load", bytes_in=os.path.getsize(path)) as span, \
+            open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            coordinates[int(row["objectid"])] = Coordinate(
+                float(row["lat"]), float(row["lng"]), row["source"]
+            )
+        span.attrs["rows"] = len(coordinates)
+    return coordinates
+
+
+def build_index(parks_csv: str = PARKS_CSV, output: str = COORDINATES_CSV,
+                geocoder: Optional[Geocoder] = None, refresh: bool = False,
+                min_interval: float = 0.0) -> Dict[int, Coordinate]:
+    """
+    Resolve every park row to a coordinate and write the sidecar table.
+
+    Rows already present in `output` are skipped unless `refresh` is set, and
+    each new row is appended as soon as it is resolved, so an interrupted run
+    (e.g. after exhausting rate-limit retries) resumes where it stopped.
+
+    Rows without a street address, or whose address does not resolve, fall
+    back to their city centre and then to the county centroid; the `source`
+    column records which one was used. Addresses resolved by a geocoder with
+    `precise = False` are recorded as ESTIMATED.
+    """
+    geocoder = geocoder or LocalGeocoder()
+    address_source = ADDRESS if getattr(geocoder, "precise", True) else ESTIMATED
+    df = load_parks(parks_csv)
+
+    if refresh and os.path.exists(output):
+        os.remove(output)
+    done = load_coordinate_table(output)
+    city_cache: Dict[str, Optional[Tuple[float, float]]] = {}
+
+    write_header = not os.path.exists(output)
+    with open(output, "a", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        if write_header:
+            writer.writerow(COLUMNS)
+
+        for row in df.to_dict("records"):
+            objectid = int(row["objectid"])
+            if objectid in done:
+                continue
+
+            query = address_query(row)
+            location, source = None, address_source
+            if query is not None:
+                location = geocode_with_retry(geocoder, query)
+                time.sleep(min_interval)
+
+            if location is None and not _is_blank(row.get("city")):
+                city = str(row["city"]).strip()
+                if city not in city_cache:
+                    city_cache[city] = geocode_with_retry(geocoder, f"{city}, CA")
+                    time.sleep(min_interval)
+                location, source, query = city_cache[city], CITY_CENTROID, f"{city}, CA"
+
+            if location is None:
+                location, source, query = COUNTY_CENTROID, COUNTY_CENTROID_SOURCE, ""
+
+            writer.writerow([objectid, location[0], location[1], source, query])
+            f.flush()
+            done[objectid] = Coordinate(location[0], location[1], source)
+
+    return done
+
+
+def forget(objectids, path: str = COORDINATES_CSV) -> int:
+    """
+    Drop parks from the coordinate table so the next `build_index` resolves them again.
+
+    Returns the number of rows removed. The table is rewritten to a
+    temporary file and swapped in, so readers never see a partial one.
+    """
+    objectids = {int(objectid) for objectid in objectids}
+    if not objectids or not os.path.exists(path):
+        return 0
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    keep = [row for row in rows if int(row["objectid"]) not in objectids]
+    if len(keep) == len(rows):
+        return 0
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        writer.writeheader()
+        writer.writerows(keep)
+    os.replace(tmp_path, path)
+    return len(rows) - len(keep)
+
+
+_build_lock = threading.Lock()
+
+
+def ensure_table(path: str = COORDINATES_CSV, parks_csv: str = PARKS_CSV) -> None:
+    """
+    Build the default coordinate table with LocalGeocoder if it does not exist yet.
+
+    Lets a fresh checkout (or a fresh TRAIL_CACHE_DIR) show parks on the map
+    and search by distance without a separate setup step. The street-level
+    positions in that table are made up near each park's city and are
+    recorded as ESTIMATED, so pages label them approximate. Map positions
+    can only be trusted after `python geocode_index.py --refresh` with
+    GOOGLE_MAPS_API_KEY set. The table is built next to its final path and
+    swapped in, so readers never see a partial one. Tables at other paths
+    are left alone.
+    """
+    if path != COORDINATES_CSV or os.path.exists(path) or not os.path.exists(parks_csv):
+        return
+    with _build_lock:
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        with perf_trace.span("geocode.build"):
+            build_index(parks_csv, tmp_path, LocalGeocoder())
+        os.replace(tmp_path, path)
+
+
+@lru_cache(maxsize=4)
+def _cached_table(path: str, mtime: float) -> Dict[int, Coordinate]:
+    return load_coordinate_table(path)
+
+
+def get_coordinates(path: str = COORDINATES_CSV) -> Dict[int, Coordinate]:
+    """
+    Return the in-process coordinate lookup, reloading it if the file changed.
+
+    The default table is built offline on first use (see ensure_table).
+    """
+    ensure_table(path)
+    mtime = os.path.getmtime(path) if os.path.exists(path) else 0.0
+    return _cached_table(path, mtime)
+
+
+def lookup(objectid, path: str = COORDINATES_CSV) -> Optional[Coordinate]:
+    """Return the stored coordinate for a park, or None if it has not been indexed."""
+    if _is_blank(objectid):
+        return None
+    with perf_trace.span("geocode.lookup") as span:
+        coordinate = get_coordinates(path).get(int(objectid))
+        span.attrs["found"] = coordinate is not None
+    return coordinate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Geocode every park in Parks.csv into a coordinate table.")
+    parser.add_argument("--parks", default=PARKS_CSV, help="Parks CSV to index")
+    parser.add_argument("--output", default=COORDINATES_CSV, help="Coordinate table to write")
+    parser.add_argument("--local", action="store_true", help="Use the offline stand-in geocoder")
+    parser.add_argument("--refresh", action="store_true", help="Re-geocode rows that are already indexed")
+    parser.add_argument("--min-interval", type=float, default=0.0, help="Seconds to wait between requests")
+    args = parser.parse_args()
+
+    if args.local:
+        geocoder = LocalGeocoder()
+    else:
+        geocoder = GoogleGeocoder(os.environ["GOOGLE_MAPS_API_KEY"])
+
+    coordinates = build_index(args.parks, args.output, geocoder,
+                              refresh=args.refresh, min_interval=args.min_interval)
+    sources = pd.Series([c.source for c in coordinates.values()]).value_counts()
+    print(f"Indexed {len(coordinates)} parks into {args.output}")
+    for source, count in sources.items():
+        print(f"  {source}: {count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+import argparse
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from response_cache import CACHE_DIR
+
+DEFAULT_STORE_DIR = os.path.join(CACHE_DIR, "illustrations")
+
+
+def image_key(model: str, prompt: str, size: str) -> str:
+    """Content address of a generated image: a hash of everything that determines it."""
+    payload = json.dumps([model, prompt, size], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class IllustrationStore:
+    """
+    Content-addressed store for generated illustrations, shared by every session.
+
+    Images live at `<root>/<key[:2]>/<key>.png`, where the key is
+    `image_key(model, prompt, size)`, so a repeat request finds its image
+    without another paid generation. A SQLite index records each image's
+    prompt, size on disk and last access; once the images exceed `max_bytes`
+    the least-recently-used ones are deleted. Downscaled thumbnails are kept
+    in memory for the most recently viewed images.
+    """
+
+    def __init__(self, root: str = DEFAULT_STORE_DIR, max_bytes: int = 200 * 1024 * 1024,
+                 thumbnail_size: int = 512, max_thumbnails: int = 64):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.thumbnail_size = thumbnail_size
+        self.max_thumbnails = max_thumbnails
+        self._lock = threading.Lock()
+        self._thumbnails: "OrderedDict[str, bytes]" = OrderedDict()
+        os.makedirs(root, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS images (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    prompt TEXT NOT NULL,
+                    size TEXT NOT NULL,
+                    bytes INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS images_lru ON images (last_access)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(os.path.join(self.root, "index.sqlite3"), timeout=10)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def path(self, key: str) -> str:
+        """Where the image for `key` is (or would be) stored."""
+        return os.path.join(self.root, key[:2], f"{key}.png")
+
+    def temp_path(self) -> str:
+        """A fresh path to download into before `put`; on the same disk as the store."""
+        return os.path.join(self.root, f"tmp-{uuid.uuid4().hex}.part")
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the stored image's path and mark it recently used, or None if missing."""
+        path = self.path(key)
+        with self._lock, self._connect() as conn:
+            found = conn.execute("SELECT 1 FROM images WHERE key = ?", (key,)).fetchone()
+            if found is None:
+                return None
+            if not os.path.exists(path):
+                # Deleted behind our back; forget it
+                conn.execute("DELETE FROM images WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE images SET last_access = ? WHERE key = ?", (time.time(), key))
+        return path
+
+    def put(self, key: str, model: str, prompt: str, size: str, source: str) -> str:
+        """
+        Move the downloaded file at `source` into the store under `key`.
+
+        Least-recently-used images are evicted afterwards if the store is over
+        its disk budget; the image just added is never evicted.
+
+        Returns:
+            str: Path of the stored image
+        """
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(source, path)
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO images (key, model, prompt, size, bytes, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model, prompt, size, os.path.getsize(path), now, now)
+            )
+            self._evict(conn, keep=key)
+        return path
+
+    def _evict(self, conn: sqlite3.Connection, keep: Optional[str] = None) -> None:
+        """Delete least-recently-used images until the store is within its budget."""
+        total = conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM images").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        doomed = []
+        for key, size in conn.execute("SELECT key, bytes FROM images ORDER BY last_access ASC").fetchall():
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            doomed.append((key,))
+            total -= size
+        for (key,) in doomed:
+            try:
+                os.remove(self.path(key))
+            except FileNotFoundError:
+                pass
+            self._thumbnails.pop(key, None)
+        conn.executemany("DELETE FROM images WHERE key = ?", doomed)
+
+    def thumbnail(self, key: str) -> Optional[bytes]:
+        """Return a downscaled JPEG of the stored image, or None if it is not stored."""
+        # Looked up even when the thumbnail is cached, so viewing counts as a use
+        path = self.get(key)
+        with self._lock:
+            if path is None:
+                self._thumbnails.pop(key, None)
+                return None
+            cached = self._thumbnails.get(key)
+            if cached is not None:
+                self._thumbnails.move_to_end(key)
+                return cached
+
+        from PIL import Image
+
+        with Image.open(path) as image:
+            image = image.convert("RGB")
+            image.thumbnail((self.thumbnail_size, self.thumbnail_size))
+            buffer = io.BytesIO()
+            image.save(buffer, format="JPEG", quality=85)
+        data = buffer.getvalue()
+        with self._lock:
+            self._thumbnails[key] = data
+            while len(self._thumbnails) > self.max_thumbnails:
+                self._thumbnails.popitem(last=False)
+        return data
+
+    def clear(self) -> None:
+        """Delete every stored image."""
+        with self._lock, self._connect() as conn:
+            keys = [key for (key,) in conn.execute("SELECT key FROM images").fetchall()]
+            for key in keys:
+                try:
+                    os.remove(self.path(key))
+                except FileNotFoundError:
+                    pass
+            conn.execute("DELETE FROM images")
+            self._thumbnails.clear()
+
+    def stats(self) -> dict:
+        """Return the image count, bytes on disk and budget."""
+        with self._lock, self._connect() as conn:
+            count, total = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM images"
+            ).fetchone()
+        return {"images": count, "bytes": total, "max_bytes": self.max_bytes,
+                "thumbnails": len(self._thumbnails)}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> IllustrationStore:
+    """Return the process-wide illustration store, creating it on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = IllustrationStore()
+        return _store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the generated illustration store.")
+    parser.add_argument("command", choices=["stats", "clear"])
+    args = parser.parse_args()
+
+    store = get_store()
+    if args.command == "clear":
+        store.clear()
+    print(store.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+import argparse
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import openai_client
+import perf_trace
+from illustration_store import get_store, image_key
+
+IMAGE_MODEL = "dall-e-3"
+IMAGE_SIZE = "1024x1024"
+
+# Generations running at once; image requests are slow and rate limited per minute
+MAX_WORKERS = 4
+
+# Finished jobs are forgotten after this many seconds, or sooner, oldest first,
+# once more than MAX_FINISHED_JOBS are kept; their images stay in the store
+FINISHED_JOB_TTL = 60 * 60
+MAX_FINISHED_JOBS = 1000
+
+# Seconds to wait for the image host to connect and between received bytes
+DOWNLOAD_TIMEOUT = (5, 30)
+
+# Job states, in the order a job moves through them
+QUEUED = "queued"
+GENERATING = "generating"
+DOWNLOADING = "downloading"
+DONE = "done"
+FAILED = "failed"
+
+
+def illustration_prompt(species: str, category: str) -> str:
+    """Build the full image prompt for a species."""
+    if category == "Plant":
+        base_prompt = "Detailed botanical illustration of"
+    else:
+        base_prompt = "Detailed wildlife illustration of"
+    return f"{base_prompt} {species} in its natural creek trail habitat, photorealistic style"
+
+
+def make_session(pool_size: int = MAX_WORKERS) -> requests.Session:
+    """HTTP session with pooled keep-alive connections and retries on transient errors."""
+    session = requests.Session()
+    retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                  allowed_methods=("GET",))
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class IllustrationJob:
+    """One illustration request and its progress, updated by a worker thread."""
+
+    def __init__(self, job_id: int, species: str, category: str, model: str):
+        self.id = job_id
+        self.species = species
+        self.category = category
+        self.model = model
+        self.prompt = illustration_prompt(species, category)
+        self.key = image_key(model, self.prompt, IMAGE_SIZE)
+        self.status = QUEUED
+        self.progress = 0.0
+        self.path: Optional[str] = None
+        self.error: Optional[str] = None
+        self.submitted = time.time()
+        self.finished: Optional[float] = None
+
+    @property
+    def pending(self) -> bool:
+        return self.status not in (DONE, FAILED)
+
+
+class IllustrationQueue:
+    """
+    Background queue generating species illustrations with bounded concurrency.
+
+    `submit` returns immediately with a job; pages poll `get` for its status
+    and progress instead of blocking a rerun on the generation. Images
+    already in the illustration store are returned as finished jobs right
+    away, jobs for a prompt that is already queued or running are shared
+    rather than generated twice, and all downloads reuse one pooled HTTP
+    session. Finished jobs are kept for FINISHED_JOB_TTL seconds, up to
+    MAX_FINISHED_JOBS of them, after which `get` returns None for them.
+    """
+
+    def __init__(self, max_workers: int = MAX_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="illustration")
+        self._session = make_session(max_workers)
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._jobs: "OrderedDict[int, IllustrationJob]" = OrderedDict()
+        self._active: Dict[str, IllustrationJob] = {}
+
+    def submit(self, species: str, category: str, model: str = IMAGE_MODEL) -> IllustrationJob:
+        """Queue an illustration of `species`, reusing a stored image or a pending job."""
+        job = IllustrationJob(0, species, category, model)
+        stored = get_store().get(job.key)
+        with self._lock:
+            self._evict_finished(time.time())
+            job.id = next(self._ids)
+            if stored is not None:
+                job.status, job.progress, job.path = DONE, 1.0, stored
+                job.finished = time.time()
+                self._jobs[job.id] = job
+                return job
+            active = self._active.get(job.key)
+            if active is not None and active.pending:
+                return active
+            self._jobs[job.id] = job
+            self._active[job.key] = job
+        self._executor.submit(self._run, job)
+        return job
+
+    def submit_batch(self, species: Iterable[str], category: str,
+                     model: str = IMAGE_MODEL) -> List[IllustrationJob]:
+        """Queue illustrations of several species; they are generated in parallel."""
+        return [self.submit(name, category, model) for name in species]
+
+    def get(self, job_id: int) -> Optional[IllustrationJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _evict_finished(self, now: float) -> None:
+        """Forget expired finished jobs, then the oldest ones beyond the cap; the lock is held."""
+        finished = [job for job in self._jobs.values() if job.finished is not None]
+        excess = len(finished) - MAX_FINISHED_JOBS
+        for i, job in enumerate(finished):
+            if i < excess or now - job.finished > FINISHED_JOB_TTL:
+                del self._jobs[job.id]
+
+    def _run(self, job: IllustrationJob) -> None:
+        try:
+            job.status, job.progress = GENERATING, 0.1
+            response = openai_client.generate_image(
+                prompt=job.prompt,
+                model=job.model,
+                n=1,
+                size=IMAGE_SIZE
+            )
+            job.status, job.progress = DOWNLOADING, 0.6
+            store = get_store()
+            temp_path = store.temp_path()
+            try:
+                self._download(job, response.data[0].url, temp_path)
+                job.path = store.put(job.key, job.model, job.prompt, IMAGE_SIZE, temp_path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+            job.status, job.progress = DONE, 1.0
+        except Exception as e:
+            job.status, job.error = FAILED, str(e)
+        finally:
+            job.finished = time.time()
+            with self._lock:
+                if self._active.get(job.key) is job:
+                    del self._active[job.key]
+
+    def _download(self, job: IllustrationJob, url: str, filename: str) -> None:
+        """Stream an image to `filename`, advancing the job's progress as bytes arrive."""
+        with perf_trace.span("illustration.download") as span, \
+                self._session.get(url, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+            response.raise_for_status()
+            total = int(response.headers.get("Content-Length") or 0)
+            received = 0
+            with open(filename, "wb") as file:
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    file.write(chunk)
+                    received += len(chunk)
+                    if total:
+                        job.progress = 0.6 + 0.4 * min(received / total, 1.0)
+            span.attrs["bytes_in"] = received
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue() -> IllustrationQueue:
+    """Return the process-wide illustration queue, shared by every session."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = IllustrationQueue()
+        return _queue
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate species illustrations in parallel.")
+    parser.add_argument("species", nargs="+", help="Species to illustrate")
+    parser.add_argument("--category", choices=["Plant", "Animal"], default="Plant")
+    parser.add_argument("--model", default=IMAGE_MODEL)
+    args = parser.parse_args()
+
+    jobs = get_queue().submit_batch(args.species, args.category, args.model)
+    while any(job.pending for job in jobs):
+        time.sleep(0.5)
+    for job in jobs:
+        result = job.path if job.status == DONE else f"failed: {job.error}"
+        print(f"{job.species} ({job.finished - job.submitted:.1f}s): {result}")
+
+
+if __name__ == "__main__":
+    main()
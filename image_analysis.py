@@ -0,0 +1,167 @@
+import argparse
+import contextvars
+import csv
+import io
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import openai_client
+from image_prep import IMAGE_ERRORS, PreparedImage, prepare_image
+
+ANALYSIS_MODEL = "gpt-4o-mini"
+
+DESCRIBE_PROMPT = ("What is in this image? Please identify and describe any plants, animals, "
+                   "and natural features.")
+
+SPECIES_PROMPT = """Identify the plants and animals in this trail photo.
+Respond with JSON only, in this form:
+{"species": [{"name": "<common name>", "kind": "plant" or "animal", "confidence": "high", "medium" or "low"}],
+ "summary": "<one sentence describing the scene>"}
+Use an empty list if no plants or animals are visible."""
+
+# Photos analyzed at once; request rate and retries are handled by openai_client
+MAX_WORKERS = 4
+
+
+class AnalysisResult(NamedTuple):
+    name: str
+    species: List[dict]
+    summary: str
+    seconds: float
+    attempts: int
+    error: Optional[str] = None
+
+
+def image_message(image: PreparedImage, prompt: str) -> list:
+    """Build the chat messages asking about one prepared image."""
+    return [{
+        "role": "user",
+        "content": [
+            {"type": "text", "text": prompt},
+            {"type": "image_url", "image_url": {"url": image.data_url()}}
+        ]
+    }]
+
+
+def describe_image(image: PreparedImage) -> str:
+    """Free-text description of the plants, animals and features in an image."""
+    response = openai_client.chat(
+        model=ANALYSIS_MODEL,
+        messages=image_message(image, DESCRIBE_PROMPT)
+    )
+    return response.choices[0].message.content
+
+
+def identify_species(image: PreparedImage, on_retry=None) -> Tuple[List[dict], str]:
+    """
+    Ask the model for the species in an image as structured data.
+
+    Returns:
+        tuple: (list of {"name", "kind", "confidence"} dicts, scene summary)
+    """
+    response = openai_client.chat(
+        on_retry=on_retry,
+        model=ANALYSIS_MODEL,
+        messages=image_message(image, SPECIES_PROMPT),
+        response_format={"type": "json_object"}
+    )
+    content = response.choices[0].message.content
+    try:
+        result = json.loads(content)
+    except json.JSONDecodeError:
+        return [], content
+    species = [item for item in result.get("species", []) if isinstance(item, dict) and item.get("name")]
+    return species, str(result.get("summary", ""))
+
+
+def analyze_photo(name: str, data: bytes) -> AnalysisResult:
+    """Prepare and analyze one photo; transient API errors are retried by the shared client."""
+    start = time.perf_counter()
+    try:
+        image = prepare_image(data)
+    except IMAGE_ERRORS as e:
+        return AnalysisResult(name, [], "", time.perf_counter() - start, 0, str(e))
+
+    attempts = 1
+
+    def count_retry(attempt: int, error: Exception) -> None:
+        nonlocal attempts
+        attempts = attempt + 1
+
+    try:
+        species, summary = identify_species(image, on_retry=count_retry)
+        return AnalysisResult(name, species, summary, time.perf_counter() - start, attempts)
+    except Exception as e:
+        return AnalysisResult(name, [], "", time.perf_counter() - start, attempts, str(e))
+
+
+def analyze_batch(photos: Iterable[Tuple[str, bytes]],
+                  max_workers: int = MAX_WORKERS) -> Iterator[AnalysisResult]:
+    """
+    Analyze (name, bytes) photos on a bounded thread pool.
+
+    Results are yielded as each photo finishes, not in input order. Closing
+    the generator early (e.g. on a Streamlit rerun) cancels photos that
+    have not started yet. Each photo runs in a copy of the caller's context,
+    so its timing spans join the caller's trace (see perf_trace.py).
+    """
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis")
+    futures = [executor.submit(contextvars.copy_context().run, analyze_photo, name, data)
+               for name, data in photos]
+    try:
+        for future in as_completed(futures):
+            yield future.result()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def species_rows(results: Iterable[AnalysisResult]) -> List[dict]:
+    """Flatten results to one row per identified species (or per photo if none)."""
+    rows = []
+    for result in results:
+        base = {"image": result.name, "seconds": round(result.seconds, 2),
+                "attempts": result.attempts, "error": result.error or ""}
+        if not result.species:
+            rows.append({**base, "species": "", "kind": "", "confidence": "", "summary": result.summary})
+        for item in result.species:
+            rows.append({**base, "species": item.get("name", ""), "kind": item.get("kind", ""),
+                         "confidence": item.get("confidence", ""), "summary": result.summary})
+    return rows
+
+
+def to_csv(results: Iterable[AnalysisResult]) -> str:
+    """Species table as CSV text."""
+    rows = species_rows(results)
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=["image", "species", "kind", "confidence",
+                                                "summary", "seconds", "attempts", "error"])
+    writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+
+def to_json(results: Iterable[AnalysisResult]) -> str:
+    """Per-photo results as JSON text."""
+    return json.dumps([result._asdict() for result in results], indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Identify species in a batch of trail photos.")
+    parser.add_argument("images", nargs="+", help="Photo files to analyze")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+    parser.add_argument("--json", action="store_true", help="Print JSON instead of CSV")
+    args = parser.parse_args()
+
+    def photos():
+        for path in args.images:
+            with open(path, "rb") as file:
+                yield path, file.read()
+
+    results = list(analyze_batch(photos(), args.workers))
+    print(to_json(results) if args.json else to_csv(results), end="")
+
+
+if __name__ == "__main__":
+    main()
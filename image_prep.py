@@ -0,0 +1,118 @@
+import argparse
+import base64
+import io
+from typing import NamedTuple, Tuple
+
+from PIL import Image, ImageOps
+
+import perf_trace
+
+# The vision model scales images to fit 2048x2048 and then to 768px on the
+# short side, so anything larger only costs upload time and memory
+MAX_LONG_SIDE = 2048
+MAX_SHORT_SIDE = 768
+
+# What prepare_image can raise for a bad upload. Failures opening the file are
+# wrapped as ValueError, but decoding is lazy, so truncated or oversized data
+# can still surface from Pillow as OSError or DecompressionBombError later on
+IMAGE_ERRORS = (ValueError, OSError, Image.DecompressionBombError)
+
+FORMATS = {
+    "JPEG": "image/jpeg",
+    "WEBP": "image/webp",
+}
+
+
+class PreparedImage(NamedTuple):
+    data: bytes
+    mime_type: str
+    width: int
+    height: int
+    original_bytes: int
+
+    @property
+    def saved_bytes(self) -> int:
+        return self.original_bytes - len(self.data)
+
+    def data_url(self) -> str:
+        """The image as a `data:` URL for the chat completions API."""
+        return f"data:{self.mime_type};base64,{base64.b64encode(self.data).decode('ascii')}"
+
+
+def target_size(width: int, height: int) -> Tuple[int, int]:
+    """Largest size within the model's useful resolution, never upscaling."""
+    scale = min(1.0, MAX_LONG_SIDE / max(width, height), MAX_SHORT_SIDE / min(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def prepare_image(data: bytes, image_format: str = "JPEG", quality: int = 85) -> PreparedImage:
+    """
+    Decode an uploaded photo once and re-encode it for vision analysis.
+
+    The image is rotated upright according to its EXIF orientation, scaled
+    down to the model's useful resolution and re-encoded as JPEG or WebP.
+    Metadata (EXIF, GPS, ICC profiles) is dropped.
+
+    Args:
+        data (bytes): The uploaded file's contents
+        image_format (str): "JPEG" or "WEBP"
+        quality (int): Encoder quality, 1-95
+
+    Returns:
+        PreparedImage: The encoded image, its MIME type, size and the original byte count
+
+    Raises:
+        ValueError: If the data is not a readable image
+        OSError, DecompressionBombError: If Pillow fails while converting or
+            resizing (see IMAGE_ERRORS)
+    """
+    with perf_trace.span("image.prepare", bytes_in=len(data)) as span:
+        try:
+            image = Image.open(io.BytesIO(data))
+            # For JPEGs, decode straight at a reduced scale instead of full resolution
+            image.draft("RGB", target_size(*image.size))
+            image = ImageOps.exif_transpose(image)
+        except Exception as e:
+            raise ValueError(f"Could not read image: {e}") from e
+
+        if image.mode not in ("RGB", "RGBA") or (image_format == "JPEG" and image.mode == "RGBA"):
+            image = image.convert("RGBA")
+            if image_format == "JPEG":
+                # JPEG has no alpha channel; flatten onto white
+                background = Image.new("RGB", image.size, "white")
+                background.paste(image, mask=image.getchannel("A"))
+                image = background
+
+        size = target_size(*image.size)
+        if size != image.size:
+            image = image.resize(size, Image.LANCZOS)
+
+        buffer = io.BytesIO()
+        image.save(buffer, format=image_format, quality=quality, optimize=image_format == "JPEG")
+        span.attrs["bytes_out"] = buffer.tell()
+        return PreparedImage(buffer.getvalue(), FORMATS[image_format], image.width, image.height, len(data))
+
+
+def format_bytes(n: int) -> str:
+    """Human-readable byte count, e.g. "1.4 MB"."""
+    for unit in ("B", "KB", "MB"):
+        if abs(n) < 1024 or unit == "MB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show how uploads are shrunk before vision analysis.")
+    parser.add_argument("images", nargs="+", help="Image files to prepare")
+    parser.add_argument("--format", choices=list(FORMATS), default="JPEG")
+    args = parser.parse_args()
+
+    for path in args.images:
+        with open(path, "rb") as file:
+            prepared = prepare_image(file.read(), args.format)
+        print(f"{path}: {format_bytes(prepared.original_bytes)} -> {format_bytes(len(prepared.data))} "
+              f"({prepared.width}x{prepared.height} {prepared.mime_type})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,402 @@
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+import uuid
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CHAT_QUESTIONS = [
+    "Which parks in San Jose are open?",
+    "Any large county parks near Gilroy?",
+    "What should I bring on a summer hike?",
+]
+
+# Longest a single script run may take before it counts as failed
+RUN_TIMEOUT = 120.0
+
+# Seconds between memory samples of the server
+RSS_INTERVAL = 0.25
+
+
+def rss_bytes(pid: int) -> Optional[int]:
+    """Resident set size of process `pid`, or None where /proc is unavailable."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+def make_photo(width: int = 2400, height: int = 1800) -> bytes:
+    """A phone-sized noisy JPEG to upload (noise keeps it from compressing to nothing)."""
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.effect_noise((width, height), 48).convert("RGB").save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def start_server(port: int, env: dict) -> subprocess.Popen:
+    """Run `streamlit run Main.py` headless on `port` and wait until it is healthy."""
+    server = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", os.path.join(APP_DIR, "Main.py"),
+         "--server.headless", "true", "--server.port", str(port),
+         "--server.enableXsrfProtection", "false", "--server.fileWatcherType", "none",
+         "--browser.gatherUsageStats", "false"],
+        cwd=APP_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Streamlit exited: {server.stderr.read().decode()[-500:]}")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1) as response:
+                if response.status == 200:
+                    return server
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError("Streamlit did not become healthy within 60 seconds")
+
+
+class Recorder:
+    """Every script run as (action, seconds, error)."""
+
+    def __init__(self):
+        self.runs: List[tuple] = []
+
+    def add(self, action: str, seconds: float, error: Optional[str] = None) -> None:
+        self.runs.append((action, seconds, error))
+
+
+class Session:
+    """
+    One headless browser session speaking Streamlit's websocket protocol.
+
+    Widgets are found by label in the elements the server sends; the states
+    of widgets the session has set are sent with every rerun of that page,
+    as the browser does, and buttons and chat messages fire once.
+    """
+
+    def __init__(self, base_url: str, recorder: Recorder, photo: bytes, seed: int):
+        self.base_url = base_url
+        self.recorder = recorder
+        self.photo = photo
+        self.random = random.Random(seed)
+        self.websocket = None
+        self.session_id: Optional[str] = None
+        self.pages: Dict[str, str] = {}
+        self.page_hash = ""
+        self.widgets: Dict[str, object] = {}
+        self.tree = None
+
+    async def connect(self) -> None:
+        import websockets
+
+        url = self.base_url.replace("http", "ws", 1) + "/_stcore/stream"
+        self.websocket = await websockets.connect(url, subprotocols=["streamlit"], max_size=None)
+
+    async def close(self) -> None:
+        if self.websocket is not None:
+            await self.websocket.close()
+
+    async def _rerun(self, action: str, triggers: List[object] = ()) -> bool:
+        """Send a rerun with the current widget states and wait for the script to finish."""
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+        from streamlit.testing.v1.element_tree import parse_tree_from_messages
+
+        message = BackMsg()
+        message.rerun_script.query_string = ""
+        message.rerun_script.page_script_hash = self.page_hash
+        message.rerun_script.widget_states.widgets.extend(list(self.widgets.values()) + list(triggers))
+
+        start = time.perf_counter()
+        error = None
+        messages = []
+        try:
+            await self.websocket.send(message.SerializeToString())
+            while True:
+                forward = ForwardMsg()
+                forward.ParseFromString(await asyncio.wait_for(self.websocket.recv(), RUN_TIMEOUT))
+                kind = forward.WhichOneof("type")
+                if kind == "new_session":
+                    self.session_id = forward.new_session.initialize.session_id
+                    messages = []
+                elif kind == "navigation":
+                    self.pages = {page.page_name: page.page_script_hash for page in forward.navigation.app_pages}
+                messages.append(forward)
+                if kind == "script_finished":
+                    if forward.script_finished == ForwardMsg.FINISHED_WITH_COMPILE_ERROR:
+                        error = "script failed to compile"
+                    break
+            self.tree = parse_tree_from_messages(messages)
+            if error is None and len(self.tree.exception):
+                error = self.tree.exception[0].message.strip().splitlines()[-1][:200]
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"[:200]
+        self.recorder.add(action, time.perf_counter() - start, error)
+        return error is None
+
+    def _find(self, kind: str, label: str):
+        if self.tree is None:
+            return None
+        return next((widget for widget in getattr(self.tree, kind) if widget.label == label), None)
+
+    async def open(self, page: str, name: str) -> bool:
+        """Navigate to a page; widget states from the previous page are dropped."""
+        self.page_hash = self.pages.get(page, "")
+        self.widgets = {}
+        return await self._rerun(f"{name}:open")
+
+    async def main_page(self) -> None:
+        if not await self.open("Main", "main") or not len(self.tree.chat_input):
+            return
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        chat = WidgetState(id=self.tree.chat_input[0].id)
+        chat.chat_input_value.data = self.random.choice(CHAT_QUESTIONS)
+        await self._rerun("main:chat", [chat])
+
+    async def trail_finder(self) -> None:
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        if not await self.open("trail finder", "finder"):
+            return
+        cities = self._find("multiselect", "Select Cities")
+        if cities is not None and cities.options:
+            state = WidgetState(id=cities.id)
+            state.string_array_value.data[:] = self.random.sample(cities.options, k=min(2, len(cities.options)))
+            self.widgets[cities.id] = state
+            if not await self._rerun("finder:city_filter"):
+                return
+        trails = self._find("selectbox", "Select a trail for detailed information")
+        if trails is not None and trails.options:
+            self.widgets[trails.id] = WidgetState(id=trails.id, string_value=self.random.choice(trails.options))
+            if not await self._rerun("finder:trail_select"):
+                return
+        summary = self._find("button", "Generate Trail Summary")
+        if summary is not None:
+            await self._rerun("finder:summary", [WidgetState(id=summary.id, trigger_value=True)])
+
+    async def trail_guide(self) -> None:
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        if not await self.open("trail info", "guide"):
+            return
+        topics = self._find("selectbox", "Choose your topic of interest")
+        if topics is not None and topics.options:
+            self.widgets[topics.id] = WidgetState(id=topics.id, string_value=self.random.choice(topics.options))
+            await self._rerun("guide:topic")
+
+    async def upload(self, filename: str, data: bytes, mime_type: str) -> str:
+        """Upload a file for this session the way the browser does; returns its file id."""
+        file_id = uuid.uuid4().hex
+        boundary = uuid.uuid4().hex
+        body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{filename}\"\r\n"
+                f"Content-Type: {mime_type}\r\n\r\n").encode() + data + f"\r\n--{boundary}--\r\n".encode()
+        request = urllib.request.Request(
+            f"{self.base_url}/_stcore/upload_file/{self.session_id}/{file_id}", data=body, method="PUT",
+            headers={"Content-Type": f"multipart/form-data; boundary={boundary}"})
+        await asyncio.to_thread(lambda: urllib.request.urlopen(request, timeout=RUN_TIMEOUT).close())
+        return file_id
+
+    async def visualizer(self) -> None:
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        if not await self.open("trail visualizer", "visualizer"):
+            return
+        uploader = self._find("file_uploader", "Upload a trail image")
+        if uploader is None:
+            return
+        start = time.perf_counter()
+        try:
+            file_id = await self.upload("trail.jpg", self.photo, "image/jpeg")
+        except OSError as e:
+            self.recorder.add("visualizer:upload", time.perf_counter() - start, f"upload failed: {e}"[:200])
+            return
+        state = WidgetState(id=uploader.id)
+        info = state.file_uploader_state_value.uploaded_file_info.add()
+        info.file_id, info.name, info.size = file_id, "trail.jpg", len(self.photo)
+        self.widgets[uploader.id] = state
+        if not await self._rerun("visualizer:upload"):
+            return
+        analyze = self._find("button", "🔍 Analyze Image")
+        if analyze is not None:
+            await self._rerun("visualizer:analyze", [WidgetState(id=analyze.id, trigger_value=True)])
+
+    async def iteration(self) -> None:
+        await self.main_page()
+        await self.trail_finder()
+        await self.trail_guide()
+        await self.visualizer()
+
+
+async def run_level(base_url: str, server_pid: int, sessions: int, duration: float, photo: bytes,
+                    ramp: float = 2.0, seed: int = 0) -> dict:
+    """
+    Drive `sessions` concurrent sessions for `duration` seconds.
+
+    Sessions connect spread over `ramp` seconds; each completes at least one
+    pass through the pages, finishing the one it is in when time runs out.
+    The server's memory is sampled throughout.
+    """
+    recorder = Recorder()
+    failures: List[str] = []
+    rss_before = rss_bytes(server_pid)
+    peak = [rss_before or 0]
+    start = time.monotonic()
+    deadline = start + ramp + duration
+
+    async def sample() -> None:
+        while True:
+            await asyncio.sleep(RSS_INTERVAL)
+            peak[0] = max(peak[0], rss_bytes(server_pid) or 0)
+
+    async def user(i: int) -> None:
+        await asyncio.sleep(ramp * i / max(sessions, 1))
+        session = Session(base_url, recorder, photo, seed * 1000 + i)
+        try:
+            await session.connect()
+            while True:
+                await session.iteration()
+                if time.monotonic() >= deadline:
+                    break
+        except Exception as e:
+            failures.append(f"{type(e).__name__}: {e}"[:200])
+        finally:
+            await session.close()
+
+    sampler = asyncio.ensure_future(sample())
+    await asyncio.gather(*(user(i) for i in range(sessions)))
+    elapsed = time.monotonic() - start
+    sampler.cancel()
+    peak[0] = max(peak[0], rss_bytes(server_pid) or 0)
+
+    seconds = [run[1] for run in recorder.runs]
+    by_action = defaultdict(list)
+    errors = defaultdict(int)
+    for action, took, error in recorder.runs:
+        by_action[action].append(took)
+        if error:
+            errors[error] += 1
+    for failure in failures:
+        errors[failure] += 1
+    mb = 2 ** 20
+    return {
+        "sessions": sessions,
+        "seconds": elapsed,
+        "runs": len(recorder.runs),
+        "throughput": len(recorder.runs) / elapsed if elapsed else 0.0,
+        "p50": percentile(seconds, 50),
+        "p95": percentile(seconds, 95),
+        "p99": percentile(seconds, 99),
+        "errors": sum(errors.values()),
+        "error_samples": sorted(errors.items(), key=lambda item: -item[1])[:5],
+        "rss_before_mb": rss_before / mb if rss_before else None,
+        "rss_peak_mb": peak[0] / mb if rss_before else None,
+        "rss_per_session_mb": (peak[0] - rss_before) / mb / sessions if rss_before else None,
+        "actions": {action: {"count": len(took), "p50": percentile(took, 50), "p95": percentile(took, 95),
+                             "p99": percentile(took, 99)}
+                    for action, took in sorted(by_action.items())},
+    }
+
+
+def format_mb(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.0f}MB"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Load-test a local Streamlit server with concurrent headless sessions and API stubs.")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 5, 10, 20],
+                        help="Concurrent sessions per level, run one level after another")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds per level (after ramp-up)")
+    parser.add_argument("--ramp", type=float, default=2.0, help="Seconds over which sessions connect")
+    parser.add_argument("--port", type=int, default=8599, help="Port for the Streamlit server under test")
+    parser.add_argument("--latency", type=float, default=0.5, help="Stub API latency in seconds")
+    parser.add_argument("--chunk-interval", type=float, default=0.02, help="Stub seconds between streamed chunks")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of stub API calls failing with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share failing with 429")
+    parser.add_argument("--cache-dir", help="Cache directory for the server (default: a fresh temporary one)")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    import api_stubs
+
+    config = api_stubs.StubConfig(args.latency, 0.5, args.chunk_interval, args.error_rate,
+                                  args.rate_limit_rate, seed=args.seed)
+    stubs = api_stubs.start(0, config)
+    host, port = stubs.server_address
+
+    # The server writes to a scratch cache, never the real one: responses,
+    # summaries, the parks snapshot, coordinates, boundaries and metrics all
+    # live under it (see response_cache.CACHE_DIR), so a fresh run starts cold
+    cache_dir = args.cache_dir or tempfile.mkdtemp(prefix="trail-load-")
+    env = dict(os.environ, OPENAI_BASE_URL=f"http://{host}:{port}/v1", OPENAI_API_KEY="stub",
+               GOOGLE_MAPS_BASE_URL=f"http://{host}:{port}", TRAIL_CACHE_DIR=cache_dir)
+    server = start_server(args.port, env)
+    base_url = f"http://127.0.0.1:{args.port}"
+    print(f"Server pid {server.pid} on {base_url}; stub APIs on {host}:{port} "
+          f"({args.latency:.2f}s latency, {args.error_rate:.0%} errors, {args.rate_limit_rate:.0%} rate limited); "
+          f"cache in {cache_dir}", file=sys.stderr)
+
+    photo = make_photo()
+    levels = []
+    try:
+        # One untimed pass first, so levels measure a warm server
+        asyncio.run(run_level(base_url, server.pid, 1, 0.0, photo, ramp=0.0, seed=args.seed))
+        print(f"{'sessions':>8} {'runs':>6} {'runs/s':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'errors':>7} "
+              f"{'RSS peak':>9} {'MB/session':>10}")
+        for sessions in args.sessions:
+            level = asyncio.run(run_level(base_url, server.pid, sessions, args.duration, photo,
+                                          args.ramp, args.seed))
+            levels.append(level)
+            per_session = level["rss_per_session_mb"]
+            print(f"{sessions:>8} {level['runs']:>6} {level['throughput']:>7.2f} {level['p50']:>7.2f}s "
+                  f"{level['p95']:>7.2f}s {level['p99']:>7.2f}s {level['errors']:>7} "
+                  f"{format_mb(level['rss_peak_mb']):>9} {'-' if per_session is None else f'{per_session:.1f}':>10}")
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+        stubs.shutdown()
+
+    last = levels[-1]
+    print(f"\nPer action at {last['sessions']} sessions:")
+    for action, stats in last["actions"].items():
+        print(f"  {action:<22} {stats['count']:>5}  p50 {stats['p50']:6.2f}s  p95 {stats['p95']:6.2f}s  "
+              f"p99 {stats['p99']:6.2f}s")
+    for level in levels:
+        for message, count in level["error_samples"]:
+            print(f"  [{level['sessions']} sessions] {count}x {message}")
+    print(f"\nStub served {config.requests} API requests ({config.failures} failed on purpose); "
+          f"server spans are in {os.path.join(cache_dir, 'metrics')} (python perf_trace.py report --log ...)")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "levels": levels,
+                       "stub": {"requests": config.requests, "failures": config.failures}}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
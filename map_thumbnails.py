@@ -0,0 +1,296 @@
+import argparse
+import glob
+import hashlib
+import io
+import json
+import math
+import os
+import threading
+import time
+import urllib.request
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+import geocode_index
+import park_boundaries
+import perf_trace
+from parks_data import load_parks
+from response_cache import CACHE_DIR
+
+THUMBNAIL_DIR = os.path.join(CACHE_DIR, "map_thumbnails")
+
+# Raster tiles as <TILE_DIR>/<z>/<x>/<y>.png, filled by `python map_thumbnails.py tiles`
+TILE_DIR = os.path.join(CACHE_DIR, "tiles")
+TILE_URL = os.environ.get("MAP_TILE_URL", "https://tile.openstreetmap.org/{z}/{x}/{y}.png")
+TILE_ATTRIBUTION = "© OpenStreetMap contributors"
+TILE_SIZE = park_boundaries.TILE_SIZE
+
+WIDTH, HEIGHT = 480, 270
+
+# Matches the interactive map's starting zoom; zoomed out when a park's outline is larger
+ZOOM = 13
+
+# Bump whenever drawing changes so stored thumbnails are re-rendered
+STYLE_VERSION = "1"
+
+# "vector" draws the map from local data only; "tiles" puts it over cached raster
+# tiles, falling back to the vector basemap where tiles are missing
+STYLES = {"vector": "png", "tiles": "jpg"}
+
+LAND_COLOR = (242, 239, 233)
+CITY_COLOR = (120, 120, 120)
+PARK_COLORS = {"open": (39, 174, 96), "closed/land bank": (127, 140, 141)}
+DEFAULT_PARK_COLOR = (41, 128, 185)
+SELECTED_COLOR = (231, 76, 60)
+
+
+def world_pixel(lat: float, lng: float, zoom: float) -> Tuple[float, float]:
+    """Web Mercator pixel position of a point on the whole world map at `zoom`."""
+    scale = TILE_SIZE * 2 ** zoom
+    sin_lat = min(max(math.sin(math.radians(lat)), -0.9999), 0.9999)
+    return ((lng + 180) / 360 * scale,
+            (0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)) * scale)
+
+
+def fit_zoom(bbox, width: int = WIDTH, height: int = HEIGHT, max_zoom: int = ZOOM) -> int:
+    """The closest zoom, up to `max_zoom`, at which a (west, south, east, north) box fits."""
+    west, south, east, north = bbox
+    for zoom in range(max_zoom, 0, -1):
+        left, bottom = world_pixel(south, west, zoom)
+        right, top = world_pixel(north, east, zoom)
+        if right - left <= width * 0.9 and bottom - top <= height * 0.9:
+            return zoom
+    return 1
+
+
+class Frame:
+    """Maps lat/lng to pixels of a `width` x `height` image centred on a point."""
+
+    def __init__(self, lat: float, lng: float, zoom: int, width: int = WIDTH, height: int = HEIGHT):
+        self.zoom, self.width, self.height = zoom, width, height
+        center_x, center_y = world_pixel(lat, lng, zoom)
+        self.left, self.top = center_x - width / 2, center_y - height / 2
+
+    def __call__(self, lat: float, lng: float) -> Tuple[float, float]:
+        x, y = world_pixel(lat, lng, self.zoom)
+        return x - self.left, y - self.top
+
+    def tiles(self) -> List[Tuple[int, int, int]]:
+        """(z, x, y) of every tile under the image."""
+        first_x, first_y = int(self.left // TILE_SIZE), int(self.top // TILE_SIZE)
+        last_x = int((self.left + self.width) // TILE_SIZE)
+        last_y = int((self.top + self.height) // TILE_SIZE)
+        return [(self.zoom, x, y) for x in range(first_x, last_x + 1) for y in range(first_y, last_y + 1)]
+
+
+def tile_path(z: int, x: int, y: int) -> str:
+    return os.path.join(TILE_DIR, str(z), str(x), f"{y}.png")
+
+
+def _draw_tiles(image, frame: Frame) -> bool:
+    """Paste cached tiles under the frame; False (leaving the image alone) if any is missing."""
+    from PIL import Image
+
+    tiles = frame.tiles()
+    if not all(os.path.exists(tile_path(*tile)) for tile in tiles):
+        return False
+    for z, x, y in tiles:
+        with Image.open(tile_path(z, x, y)) as tile:
+            image.paste(tile.convert("RGB"), (round(x * TILE_SIZE - frame.left), round(y * TILE_SIZE - frame.top)))
+    return True
+
+
+def _draw_outline(draw, frame: Frame, objectid: int, color: Tuple[int, int, int]) -> None:
+    """Draw a park's outline at the detail level for the frame's zoom, if boundaries were built."""
+    index = park_boundaries.get_index()
+    position = None if index is None else index.position(objectid)
+    if position is None:
+        return
+    for feature in index.geojson(np.array([position]), frame.zoom)["features"]:
+        for polygon in feature["geometry"]["coordinates"]:
+            for i, ring in enumerate(polygon):
+                points = [frame(lat, lng) for lng, lat in ring]
+                if i == 0:
+                    draw.polygon(points, fill=color + (50,), outline=color + (255,), width=2)
+                else:
+                    draw.polygon(points, outline=color + (255,))
+
+
+def thumbnail_zoom(objectid: int, width: int = WIDTH, height: int = HEIGHT) -> int:
+    """ZOOM, or less if the park's outline would not fit."""
+    index = park_boundaries.get_index()
+    position = None if index is None else index.position(objectid)
+    if position is None:
+        return ZOOM
+    return fit_zoom(index.bbox[position], width, height)
+
+
+def render(objectid: int, style: str = "vector", width: int = WIDTH, height: int = HEIGHT,
+           coordinates: Optional[Dict[int, geocode_index.Coordinate]] = None) -> Optional[bytes]:
+    """
+    Draw a static map of one park, or return None if it has no coordinate.
+
+    The selected park is marked in red over its outline (when boundaries
+    were built), with the other parks as small status-coloured dots and the
+    nearby cities labelled. Nothing is fetched from the network.
+    """
+    from PIL import Image, ImageDraw, ImageFont
+
+    coordinates = geocode_index.get_coordinates() if coordinates is None else coordinates
+    point = coordinates.get(objectid)
+    if point is None:
+        return None
+
+    frame = Frame(point.lat, point.lng, thumbnail_zoom(objectid, width, height), width, height)
+
+    image = Image.new("RGB", (width, height), LAND_COLOR)
+    on_tiles = style == "tiles" and _draw_tiles(image, frame)
+    overlay = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(overlay)
+    font = ImageFont.load_default(11)
+
+    if not on_tiles:
+        for city, (lat, lng) in geocode_index.CITY_CENTROIDS.items():
+            x, y = frame(lat, lng)
+            if 0 <= x < width and 0 <= y < height:
+                draw.text((x, y), city, fill=CITY_COLOR + (255,), font=font, anchor="mm")
+
+    parks = load_parks()
+    statuses = dict(zip(parks["objectid"].tolist(), parks["status"].astype("string").fillna("").tolist()))
+    for other, coordinate in coordinates.items():
+        if other == objectid:
+            continue
+        x, y = frame(coordinate.lat, coordinate.lng)
+        if -4 <= x < width + 4 and -4 <= y < height + 4:
+            color = PARK_COLORS.get(statuses.get(other), DEFAULT_PARK_COLOR)
+            draw.ellipse((x - 3, y - 3, x + 3, y + 3), fill=color + (220,), outline=(255, 255, 255, 255))
+
+    _draw_outline(draw, frame, objectid, PARK_COLORS.get(statuses.get(objectid), DEFAULT_PARK_COLOR))
+    x, y = width / 2, height / 2
+    draw.ellipse((x - 6, y - 6, x + 6, y + 6), fill=SELECTED_COLOR + (255,), outline=(255, 255, 255, 255), width=2)
+    if on_tiles:
+        draw.text((width - 3, height - 2), TILE_ATTRIBUTION, fill=(60, 60, 60, 255), font=font, anchor="rd")
+
+    image = Image.alpha_composite(image.convert("RGBA"), overlay).convert("RGB")
+    buffer = io.BytesIO()
+    if STYLES[style] == "jpg":
+        image.save(buffer, format="JPEG", quality=80, optimize=True)
+    else:
+        # Flat colours quantize to a small palette without visible loss
+        image.quantize(64).save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def _data_version(path: str) -> Optional[float]:
+    return os.path.getmtime(path) if os.path.exists(path) else None
+
+
+def thumbnail_key(objectid: int, style: str, coordinate: geocode_index.Coordinate) -> str:
+    """Hash of everything a park's thumbnail is drawn from, besides the park itself."""
+    payload = json.dumps([STYLE_VERSION, style, WIDTH, HEIGHT, round(coordinate.lat, 6), round(coordinate.lng, 6),
+                          _data_version(geocode_index.COORDINATES_CSV),
+                          _data_version(park_boundaries.BOUNDARIES_PATH)])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def thumbnail_path(objectid: int, style: str, key: str) -> str:
+    return os.path.join(THUMBNAIL_DIR, style, f"{int(objectid)}-{key}.{STYLES[style]}")
+
+
+_render_lock = threading.Lock()
+
+
+def get_thumbnail(objectid, style: str = "vector") -> Optional[bytes]:
+    """
+    Return a park's static map thumbnail, rendering and storing it on first use.
+
+    Thumbnails are stored per park and style and re-rendered when the park's
+    coordinate, the coordinate table or the boundaries change; the
+    superseded file is removed. Returns None if the park has no coordinate.
+    """
+    coordinate = geocode_index.lookup(objectid)
+    if coordinate is None:
+        return None
+    objectid = int(objectid)
+    path = thumbnail_path(objectid, style, thumbnail_key(objectid, style, coordinate))
+    with perf_trace.span("map.thumbnail", style=style, cached=True) as span:
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                data = f.read()
+            span.attrs["bytes_out"] = len(data)
+            return data
+
+        span.attrs["cached"] = False
+        with _render_lock:
+            data = render(objectid, style)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            for stale in glob.glob(thumbnail_path(objectid, style, "*")):
+                os.remove(stale)
+            tmp_path = f"{path}.{uuid.uuid4().hex}.part"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        span.attrs["bytes_out"] = len(data)
+    return data
+
+
+def fetch_tiles(objectids, min_interval: float = 1.0) -> int:
+    """
+    Download the tiles under the given parks' thumbnails into TILE_DIR.
+
+    Tiles already cached are skipped and requests are spaced by
+    `min_interval` seconds, as public tile servers ask. Returns the number
+    of tiles downloaded.
+    """
+    coordinates = geocode_index.get_coordinates()
+    needed = set()
+    for objectid in objectids:
+        point = coordinates.get(objectid)
+        if point is not None:
+            needed.update(Frame(point.lat, point.lng, thumbnail_zoom(objectid)).tiles())
+
+    fetched = 0
+    for z, x, y in sorted(needed):
+        path = tile_path(z, x, y)
+        if os.path.exists(path):
+            continue
+        request = urllib.request.Request(TILE_URL.format(z=z, x=x, y=y),
+                                         headers={"User-Agent": "creekside-trail-explorer/1.0 (map thumbnails)"})
+        with urllib.request.urlopen(request, timeout=30) as response:
+            data = response.read()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+        fetched += 1
+        time.sleep(min_interval)
+    return fetched
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-render static map thumbnails for every park.")
+    parser.add_argument("command", choices=["build", "tiles"],
+                        help="build: render thumbnails; tiles: download the raster tiles they need")
+    parser.add_argument("--style", choices=list(STYLES), default="vector")
+    parser.add_argument("--min-interval", type=float, default=1.0, help="tiles: seconds between downloads")
+    args = parser.parse_args()
+
+    objectids = [int(objectid) for objectid in load_parks()["objectid"].tolist()]
+    if args.command == "tiles":
+        print(f"Downloaded {fetch_tiles(objectids, args.min_interval)} tiles into {TILE_DIR}")
+        return
+
+    start = time.perf_counter()
+    sizes = []
+    for objectid in objectids:
+        data = get_thumbnail(objectid, args.style)
+        if data is not None:
+            sizes.append(len(data))
+    print(f"{len(sizes)} of {len(objectids)} parks have a {args.style} thumbnail in "
+          f"{os.path.join(THUMBNAIL_DIR, args.style)} ({time.perf_counter() - start:.1f}s, "
+          f"{sum(sizes) / max(len(sizes), 1) / 1024:.1f} KB average)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+import os
+import random
+import threading
+import time
+from typing import Callable, Iterator, Optional
+
+import openai
+
+import perf_trace
+
+# Calls in flight at once across the whole process (streams hold their slot
+# until they finish)
+MAX_CONCURRENT = 8
+
+# Token bucket: sustained request rate and how many may start back to back
+REQUESTS_PER_MINUTE = 120
+BURST = 10
+
+# Seconds a call may take in total, including waiting for a slot and retries
+DEFAULT_DEADLINE = 60.0
+CONNECT_TIMEOUT = 5.0
+
+# Longest wait between two chunks of a streamed response
+STREAM_READ_TIMEOUT = 30.0
+
+MAX_ATTEMPTS = 4
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 8.0
+
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APITimeoutError,
+                    openai.APIConnectionError, openai.InternalServerError)
+
+
+class ClientBusyError(RuntimeError):
+    """Raised when no request slot frees up before the call's deadline."""
+
+    def __init__(self, message: str = "The AI service is busy right now; please try again in a moment."):
+        super().__init__(message)
+
+
+class TokenBucket:
+    """Thread-safe token bucket allowing `rate` requests per second with bursts of `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout: float) -> bool:
+        """Take one token, waiting up to `timeout` seconds; False if none came."""
+        end = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if now + wait > end:
+                return False
+            time.sleep(wait)
+
+
+_slots = threading.BoundedSemaphore(MAX_CONCURRENT)
+_bucket = TokenBucket(REQUESTS_PER_MINUTE / 60, BURST)
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def _timeout(seconds: float, read: Optional[float] = None) -> openai.Timeout:
+    return openai.Timeout(seconds, connect=min(CONNECT_TIMEOUT, seconds), read=read or seconds)
+
+
+def get_client() -> openai.OpenAI:
+    """
+    Return the process-wide OpenAI client.
+
+    All calls share its pool of keep-alive connections. Retries are done by
+    `call` rather than the SDK, so they count against the call's deadline.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            limits = type(openai.DEFAULT_CONNECTION_LIMITS)(
+                max_connections=MAX_CONCURRENT * 2,
+                max_keepalive_connections=MAX_CONCURRENT
+            )
+            _client = openai.OpenAI(
+                api_key=openai.api_key or os.environ.get("OPENAI_API_KEY"),
+                max_retries=0,
+                timeout=_timeout(DEFAULT_DEADLINE),
+                http_client=openai.DefaultHttpxClient(limits=limits)
+            )
+        return _client
+
+
+def get_async_client() -> openai.AsyncOpenAI:
+    """A pooled async client for batch jobs; it retries 429/5xx itself with jittered backoff."""
+    return openai.AsyncOpenAI(
+        api_key=openai.api_key or os.environ.get("OPENAI_API_KEY"),
+        max_retries=MAX_ATTEMPTS - 1,
+        timeout=_timeout(DEFAULT_DEADLINE)
+    )
+
+
+def backoff_delay(attempt: int, error: Exception) -> float:
+    """The server's Retry-After if it sent one, else full-jitter exponential backoff."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+
+def _acquire(end: float) -> None:
+    """Wait for a rate-limit token and a concurrency slot, or raise ClientBusyError."""
+    if not _bucket.acquire(max(0.0, end - time.monotonic())):
+        raise ClientBusyError()
+    if not _slots.acquire(timeout=max(0.0, end - time.monotonic())):
+        raise ClientBusyError()
+
+
+def call(create: Callable, deadline: float = DEFAULT_DEADLINE,
+         on_retry: Optional[Callable[[int, Exception], None]] = None,
+         read_timeout: Optional[float] = None, hold: bool = False, **kwargs):
+    """
+    Make an API call within the shared rate and concurrency limits.
+
+    Rate-limit, timeout, connection and 5xx errors are retried with
+    jittered exponential backoff (or the server's Retry-After) for up to
+    `MAX_ATTEMPTS` attempts, as long as the whole call fits in `deadline`
+    seconds.
+
+    Args:
+        create: The SDK method to call, e.g. `get_client().chat.completions.create`
+        deadline (float): Seconds the call may take in total
+        on_retry: Called with (attempt, error) before each retry
+        read_timeout (float): Per-read timeout, for streams
+        hold (bool): Keep the concurrency slot after returning; the caller
+            must `release()` it (used for streams)
+        **kwargs: Arguments for `create`
+
+    Raises:
+        ClientBusyError: If no slot frees up before the deadline
+    """
+    end = time.monotonic() + deadline
+    queued = 0.0
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        waited = time.monotonic()
+        _acquire(end)
+        queued += time.monotonic() - waited
+        success = False
+        try:
+            remaining = max(0.1, end - time.monotonic())
+            result = create(timeout=_timeout(remaining, read_timeout), **kwargs)
+            success = True
+            perf_trace.annotate(attempts=attempt, queued_ms=round(queued * 1000, 1))
+            return result
+        except RETRYABLE_ERRORS as e:
+            delay = backoff_delay(attempt, e)
+            if attempt == MAX_ATTEMPTS or time.monotonic() + delay >= end:
+                raise
+            if on_retry is not None:
+                on_retry(attempt, e)
+        finally:
+            if not (success and hold):
+                _slots.release()
+        time.sleep(delay)
+
+
+def release() -> None:
+    """Give back a slot kept with `call(..., hold=True)`."""
+    _slots.release()
+
+
+def record_usage(span: perf_trace.Span, usage) -> None:
+    """Copy a response's token counts onto its timing span."""
+    if usage is not None:
+        span.attrs.update(prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens)
+
+
+def chat(deadline: float = DEFAULT_DEADLINE, on_retry: Optional[Callable] = None, **kwargs):
+    """Create a chat completion (see `call`)."""
+    with perf_trace.span("openai.chat", model=kwargs.get("model")) as span:
+        response = call(get_client().chat.completions.create, deadline, on_retry, **kwargs)
+        record_usage(span, getattr(response, "usage", None))
+        return response
+
+
+def generate_image(deadline: float = 120.0, on_retry: Optional[Callable] = None, **kwargs):
+    """Generate an image (see `call`); image models are slow, so the default deadline is longer."""
+    with perf_trace.span("openai.image", model=kwargs.get("model")):
+        return call(get_client().images.generate, deadline, on_retry, **kwargs)
+
+
+def stream_chat(deadline: float = DEFAULT_DEADLINE, **kwargs) -> Iterator:
+    """
+    Yield the chunks of a streamed chat completion.
+
+    Opening the stream is retried like any call; once chunks flow, each
+    read may take up to `STREAM_READ_TIMEOUT`. The concurrency slot is
+    held until the stream ends or the generator is closed.
+
+    The timing span covers the whole stream and records the time to the
+    first chunk and the token usage the API reports in the final chunk.
+    """
+    with perf_trace.span("openai.stream", model=kwargs.get("model")) as span:
+        stream = call(get_client().chat.completions.create, deadline, read_timeout=STREAM_READ_TIMEOUT,
+                      hold=True, stream=True, stream_options={"include_usage": True}, **kwargs)
+        try:
+            for chunk in stream:
+                if "first_chunk_ms" not in span.attrs:
+                    span.attrs["first_chunk_ms"] = round((time.perf_counter() - span.start) * 1000, 1)
+                record_usage(span, getattr(chunk, "usage", None))
+                yield chunk
+        finally:
+            stream.close()
+            release()
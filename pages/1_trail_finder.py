@@ -1,114 +1,98 @@
 import streamlit as st
-import requests
-import openai
-import os
 import pandas as pd
 import numpy as np
-from datetime import datetime
-import folium
-from streamlit_folium import st_folium
-import googlemaps
-import logging 
+import app_shell
+import geocode_index
+import map_thumbnails
+import park_boundaries
+import park_search
+import park_spatial
+import park_stats
+import park_table
+import parks_data
+import perf_trace
+import trail_summary
+from trail_summary import SummaryFormatter, format_summary
+from streaming import render_stream
 
-# Configure OpenAI API key
-openai.api_key = os.environ["OPENAI_API_KEY"]
+# Custom CSS matching main page theme
+TRAIL_FINDER_CSS = app_shell.PAGE_CSS + """
+    .trail-info {
+        color: black !important;
+        margin-bottom: 0.5rem;
+    }
+"""
 
 # Configure page
-st.set_page_config(
-    page_title="Trail Finder - Creekside Trail Explorer",
-    page_icon="🏝️",
-    layout="wide"
-)
+app_shell.setup_page(TRAIL_FINDER_CSS, title="Trail Finder - Creekside Trail Explorer", icon="🏝️")
 
-# Custom CSS matching main page theme
-st.markdown("""
-    <style>
-        .stApp {
-            background-color: #f5f7f9;
-        }
-        
-        .main-header {
-            color: #2c3e50;
-            font-family: 'Helvetica Neue', sans-serif;
-            padding: 1.5rem 0;
-            text-align: center;
-            background: linear-gradient(90deg, #a8e6cf 0%, #dcedc1 100%);
-            border-radius: 10px;
-            margin-bottom: 2rem;
-        }
-        
-        h1, h2, h3, h4 {
-            color: black !important;
-            font-family: 'Helvetica Neue', sans-serif;
-            margin-bottom: 1rem;
-        }
-        
-        .trail-info {
-            color: black !important;
-            margin-bottom: 0.5rem;
-        }
-        
-        .stButton>button {
-            border-radius: 20px;
-            background-color: #3498db;
-            color: white;
-        }
-        
-        .stButton>button:hover {
-            background-color: #2980b9;
-        }
-    </style>
-""", unsafe_allow_html=True)
+def stream_trail_summary(trail_data, placeholder) -> str:
+    """
+    Render the AI summary for a trail into `placeholder`.
 
-# Initialize Google Maps client
-gmaps = googlemaps.Client(key='API-KEY') # Replace with your Google Maps API key
+    Summaries precomputed by `python trail_summary.py` are shown instantly;
+    otherwise the summary is streamed as it is generated and then stored.
+    """
+    stored = trail_summary.get_stored_summary(trail_data)
+    if stored is not None:
+        placeholder.markdown(f'<div class="trail-info">{format_summary(stored)}</div>', unsafe_allow_html=True)
+        return stored
 
-def get_trail_summary(trail_data):
+    formatter = SummaryFormatter()
     try:
-        # Initialize the client
-        client = openai()
-        
-        # Format trail info
-        trail_info = "\n".join([f"{key}: {value}" for key, value in trail_data.items()])
-        
-        # System message to set the context
-        system_msg = "You are a knowledgeable park ranger. Provide a concise summary of the trail information."
-        
-        # User message with the trail data and request
-        user_msg = f"""Analyze the following trail information and provide a structured summary with these sections:
-        - Trail Highlights
-        - Key Features
-        - Best Times to Visit
-        - Notable Information
-        
-        Present each section's content without bullet points or dashes.
-        
-        Trail Data:
-        {trail_info}"""
-
-        try:
-            # Make the API call
-            response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": system_msg},
-                    {"role": "user", "content": user_msg}
-                ],
-                temperature=0.7,
-                max_tokens=500
-            )
-            
-            # Get and format the response
-            raw_summary = str(response.choices[0].message.content)
-            formatted_summary = format_summary(raw_summary)
-            
-            return formatted_summary
-                
-        except Exception as api_error:
-            return f"API Error: {str(api_error)}"
-            
+        summary = render_stream(placeholder, trail_summary.stream_trail_summary(trail_data),
+                                render=lambda text: f'<div class="trail-info">{formatter(text)}</div>')
+        trail_summary.get_store().put(trail_data['objectid'], trail_summary.row_hash(trail_data), summary)
+        return summary
     except Exception as e:
-        return f"Error in get_trail_summary: {str(e)}"
+        placeholder.markdown(f'<div class="trail-info">API Error: {str(e)}</div>', unsafe_allow_html=True)
+        return None
+
+def paginated_table(table_filter: park_table.TableFilter) -> None:
+    """
+    Draw the filtered parks one page at a time (see park_table.py).
+
+    Only the visible page of the chosen columns is sent to the browser, and
+    pages are cached across reruns and sessions.
+    """
+    col1, col2, col3, col4 = st.columns([4, 2, 1, 1])
+    with col1:
+        columns = st.multiselect("Columns", list(df.columns), default=list(park_table.DEFAULT_COLUMNS),
+                                 key="table_columns")
+    with col2:
+        sort = st.selectbox("Sort by", [None, *df.columns], key="table_sort",
+                            format_func=lambda column: "Default order" if column is None else column)
+    with col3:
+        order = st.selectbox("Order", ["Ascending", "Descending"], key="table_order")
+    with col4:
+        page_size = st.selectbox("Rows", park_table.PAGE_SIZES, index=1, key="table_page_size")
+
+    # Start from the first page whenever the rows or their order change
+    view = (table_filter, sort, order, page_size)
+    if st.session_state.get("table_view") != view:
+        st.session_state.table_view = view
+        st.session_state.table_page = 1
+
+    if table_filter.distances is not None:
+        columns = [*columns, park_table.DISTANCE_COLUMN]
+    table = park_table.get_page(table_filter, columns, sort, order == "Ascending",
+                                page=st.session_state.get("table_page", 1) - 1, page_size=page_size)
+    st.dataframe(table.frame, hide_index=True, use_container_width=True)
+
+    # Clamped before the widget is drawn, so it never holds a page that no longer exists
+    st.session_state.table_page = table.page + 1
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        st.number_input("Page", min_value=1, max_value=table.pages, step=1, key="table_page")
+    with col2:
+        shown = f"{table.start + 1:,}–{table.start + len(table.frame):,}" if table.total else "0"
+        st.caption(f"Rows {shown} of {table.total:,} · page {table.page + 1} of {table.pages}")
+
+def trail_label(trail) -> str:
+    """Selectbox label for a park row: its name, plus the city when known."""
+    if pd.isna(trail['city']):
+        return str(trail['park name'])
+    return f"{trail['park name']} ({trail['city']})"
 
 # Main header
 st.markdown("""
@@ -122,13 +106,8 @@ st.markdown("""
 
 # Load data
 try:
-    df = pd.read_csv("Parks.csv")
-    
-    # Ensure consistent column naming
-    df.columns = df.columns.str.strip().str.lower()
-    
-    st.subheader("Data Preview")
-    st.dataframe(df.head(), height=200)
+    # Parsed once per process and shared across reruns and sessions
+    df = parks_data.load_parks()
 except Exception as e:
     st.error(f"Error loading CSV file: {e}")
     st.stop()
@@ -141,33 +120,66 @@ with st.sidebar:
         </div>
     """, unsafe_allow_html=True)
     
+    filter_mode = st.radio("Filter trails by", ["City", "Distance"], horizontal=True)
+    selected_cities = []
+    nearby = None
+
     # Find city column
     city_column = next((col for col in df.columns if col.lower() in ['city', 'location']), None)
-    if city_column:
+    if filter_mode == "City" and city_column:
         cities = sorted(df[city_column].dropna().unique())
         selected_cities = st.multiselect("Select Cities", cities)
-    
-    st.markdown("<h3 style='color: black;'>Data Preview:</h3>", unsafe_allow_html=True)
-    st.dataframe(df.head(), height=200)
+
+    if filter_mode == "Distance":
+        # Answered by the spatial index over geocoded parks (see park_spatial.py)
+        location_text = st.text_input("ZIP code or \"lat, lng\"", value="95014")
+        location = park_spatial.resolve_location(df, location_text)
+        if location is None:
+            st.warning("Enter a ZIP code with a mapped park, or coordinates like \"37.33, -121.89\".")
+        else:
+            distance_mode = st.radio("Show", ["Within a radius", "Nearest parks"], horizontal=True)
+            if distance_mode == "Within a radius":
+                radius = st.slider("Radius (miles)", 1, 50, 10)
+                nearby = park_spatial.get_index().within(*location, radius)
+            else:
+                count = st.number_input("Number of parks", min_value=1, max_value=50, value=5)
+                nearby = park_spatial.get_index().nearest(*location, int(count))
 
 # Filter dataframe
-filtered_df = df[df[city_column].isin(selected_cities)] if selected_cities else df
+if nearby is not None:
+    nearby_rows, nearby_miles = nearby
+    filtered_df = df.iloc[nearby_rows].assign(**{park_table.DISTANCE_COLUMN: np.round(nearby_miles, 2)})
+    filter_mask = np.zeros(len(df), dtype=bool)
+    filter_mask[nearby_rows] = True
+    table_filter = park_table.TableFilter(rows=tuple(nearby_rows.tolist()),
+                                          distances=tuple(nearby_miles.tolist()))
+elif selected_cities:
+    filter_mask = df[city_column].isin(selected_cities).to_numpy()
+    filtered_df = df[filter_mask]
+    table_filter = park_table.TableFilter(cities=tuple(sorted(selected_cities)))
+else:
+    filter_mask = None
+    filtered_df = df
+    table_filter = park_table.TableFilter()
 
 # Main content
 st.markdown("<h3 style='color: black;'>Filtered Trails</h3>", unsafe_allow_html=True)
-st.dataframe(filtered_df)
+paginated_table(table_filter)
 
 if not filtered_df.empty:
     st.markdown("<h3 style='color: black;'>Trail Details</h3>", unsafe_allow_html=True)
     
-    # Trail selector
-    trail_name_column = next((col for col in df.columns 
-                            if col.lower() in ['park_name', 'trail_name', 'name']), df.columns[0])
-    trail_names = sorted(filtered_df[trail_name_column].unique())
-    selected_trail = st.selectbox("Select a trail for detailed information", trail_names)
+    # Trail selector backed by the prebuilt search index (see park_search.py)
+    search_query = st.text_input("Search trails by name, address or city",
+                                 placeholder="e.g. Stevens Creek")
+    matches = park_search.get_index().search(search_query, limit=50, allowed=filter_mask)
+    if not matches:
+        st.info(f"No trails match \"{search_query}\".")
+    selected_trail = st.selectbox("Select a trail for detailed information", matches,
+                                  format_func=lambda row: trail_label(df.iloc[row]))
     
-    if selected_trail:
-        trail_data = filtered_df[filtered_df[trail_name_column] == selected_trail].iloc[0].to_dict()
+    if selected_trail is not None:
+        trail_data = df.iloc[selected_trail].to_dict()
         
         col1, col2 = st.columns([2, 1])
         with col1:
@@ -182,32 +194,52 @@ if not filtered_df.empty:
         with col2:
             st.markdown("<h4 style='color: black;'>AI Trail Summary</h4>", unsafe_allow_html=True)
             if st.button("Generate Trail Summary"):
-                with st.spinner("Generating summary..."):
-                    summary = get_trail_summary(trail_data)
-                    st.markdown(f'<div class="trail-info">{summary}</div>', unsafe_allow_html=True)
-
-    # Map visualization using Google Maps API
-    if 'address' in trail_data and 'zip code' in trail_data:
-        selected_address = f"{trail_data['address']}, {trail_data['city']}, {trail_data['zip code']}"
-        geocode_result = gmaps.geocode(selected_address)
-        if geocode_result:
-            lat = geocode_result[0]['geometry']['location']['lat']
-            lng = geocode_result[0]['geometry']['location']['lng']
+                # Streams into the placeholder; picking another trail cancels it
+                stream_trail_summary(trail_data, st.empty())
+
+        # Map visualization from the offline coordinate index (see geocode_index.py)
+        coordinate = geocode_index.lookup(trail_data.get('objectid'))
+        if coordinate:
+            lat, lng = coordinate.lat, coordinate.lng
+            if coordinate.source == geocode_index.ESTIMATED:
+                st.info("This park's street address has not been geocoded yet; showing an estimated location near its city.")
+            elif not coordinate.exact:
+                st.info("This park has no mapped street address; showing an approximate location.")
         else:
-            st.warning(f"Could not geocode address: {selected_address}")
-            lat, lng = 37.7749, -122.4194  # Default to San Francisco coordinates
-    else:
-        st.warning("Selected trail does not have a valid address or zip code.")
-        lat, lng = 37.7749, -122.4194  # Default to San Francisco coordinates
+            st.warning("Selected trail has not been geocoded yet. Run `python geocode_index.py` to build the index.")
+            lat, lng = geocode_index.COUNTY_CENTROID
 
-    # Create Folium map with hardcoded coordinates or geocoded coordinates
-    m = folium.Map(location=[lat, lng], zoom_start=15, 
-                   tiles="OpenStreetMap", 
-                   attr="Map tiles by OpenStreetMap contributors.")
-    folium.Marker([lat, lng], popup="Test Location").add_to(m)
+        # A static thumbnail (see map_thumbnails.py) stands in for the map until the
+        # interactive one is asked for, which costs a folium iframe and its scripts
+        if not st.toggle("Interactive map", key="interactive_map"):
+            if thumbnail := map_thumbnails.get_thumbnail(trail_data.get('objectid')):
+                st.image(thumbnail, caption=f"{trail_data['park name']} and nearby parks")
+        else:
+            # Map of every filtered park (see park_map.py). The base map stays mounted
+            # across reruns; only the marker layers are swapped when they change, and
+            # no interaction data is sent back to the server. Folium is only loaded
+            # once a map is drawn.
+            import park_map
+            from streamlit_folium import st_folium
 
-    # Display the map in Streamlit
-    st_folium(m, width="100%", height=500)
+            # Park outlines follow the view, so the map then reports its bounds and
+            # zoom, rerunning the page when the user pans or zooms
+            show_boundaries = (park_boundaries.get_index() is not None
+                               and st.toggle("Show park boundaries", key="show_boundaries"))
+
+            with perf_trace.span("map.build", rows=len(filtered_df)):
+                base_map = park_map.build_base_map()
+                layers = [park_map.park_layer(filtered_df),
+                          park_map.selected_layer(lat, lng, trail_data['park name'])]
+                if show_boundaries:
+                    layers.insert(0, park_map.boundary_layer(filtered_df, st.session_state.get("trail_map"),
+                                                             (lat, lng), 13))
+            with perf_trace.span("map.render"):
+                st_folium(base_map, key="trail_map",
+                          center=(lat, lng), zoom=13,
+                          feature_group_to_add=layers,
+                          returned_objects=["bounds", "zoom"] if show_boundaries else [],
+                          use_container_width=True, height=500)
 
 # Trail statistics
 st.markdown("<h3 style='color: black;'>Trail Statistics</h3>", unsafe_allow_html=True)
@@ -228,13 +260,37 @@ with col1:
 
 with col2:
     st.markdown("<h4 style='color: black;'>Analytics</h4>", unsafe_allow_html=True)
-    numeric_cols = filtered_df.select_dtypes(include=[np.number]).columns
-    if len(numeric_cols) > 0:
-        selected_metric = st.selectbox("Select metric to analyze", numeric_cols, 
-            key="metric_selector")
-        avg_value = filtered_df[selected_metric].mean()
-        st.markdown(f"""
-            <div style='color: black; font-size: 1.1em;'>
-                <p><strong>Average {selected_metric.replace('_', ' ').title()}:</strong> {avg_value:,.2f}</p>
-            </div>
-        """, unsafe_allow_html=True)
+    selected_metric = st.selectbox("Select metric to analyze", list(park_stats.METRICS),
+        format_func=park_stats.METRICS.get, key="metric_selector")
+    cube = park_stats.get_cube()
+    selected_statuses = st.multiselect("Status", cube.members["status"], key="stats_status")
+    selected_suffixes = st.multiselect("Suffix", cube.members["suffix"], key="stats_suffix")
+
+    if nearby is not None:
+        # Distance results are an arbitrary set of rows, so summarize them directly
+        subset = filtered_df
+        if selected_statuses:
+            subset = subset[subset["status"].isin(selected_statuses)]
+        if selected_suffixes:
+            subset = subset[subset["suffix"].isin(selected_suffixes)]
+        stats = park_stats.summarize(subset[selected_metric])
+    else:
+        # Rolled up from the precomputed City x Status x Suffix cube (see park_stats.py)
+        stats = cube.query(selected_metric, city=selected_cities,
+                           status=selected_statuses, suffix=selected_suffixes)
+
+    metric_label = park_stats.METRICS[selected_metric]
+    st.markdown(f"""
+        <div style='color: black; font-size: 1.1em;'>
+            <p><strong>Average {metric_label}:</strong> {stats['mean']:,.2f}</p>
+        </div>
+    """, unsafe_allow_html=True)
+    st.dataframe(
+        pd.DataFrame({metric_label: stats}).rename(index={
+            "count": "Count", "sum": "Total", "mean": "Mean", "min": "Min", "max": "Max",
+            **{f"p{p}": f"{p}th percentile" for p in park_stats.PERCENTILES}
+        }),
+        use_container_width=True
+    )
+
+app_shell.perf_panel()
@@ -1,142 +1,72 @@
-
-import os
-import openai
-import base64
-from typing import List, Optional
 import streamlit as st
-import requests
-import pandas as pd
-import numpy as np
-from datetime import datetime
-import folium
-from streamlit_folium import st_folium
-import googlemaps
 
+import app_shell
+import illustration_store
+import illustrations
+import image_analysis
+from image_prep import IMAGE_ERRORS, PreparedImage, format_bytes, prepare_image
+
+#Alvin Liu UI work
+# Enhanced CSS with nature theme
+VISUALIZER_CSS = app_shell.PAGE_CSS + """
+    .stTabs [data-baseweb="tab"] {
+        color: black !important;
+        font-weight: 500;
+    }
+
+    .stTabs [data-baseweb="tab-list"] {
+        background-color: #ffffff;
+        border-radius: 10px;
+        padding: 0.5rem;
+        margin-bottom: 1rem;
+    }
 
-# Initialize OpenAI client
-openai.api_key = os.environ["OPENAI_API_KEY"]
+    .upload-text, .stMarkdown p {
+        color: black !important;
+        margin: 1rem 0;
+    }
+
+    .analysis-result {
+        color: black !important;
+        background-color: #ffffff;
+        padding: 1rem;
+        border-radius: 10px;
+        margin-top: 1rem;
+    }
+
+    .stSelectbox {
+        color: black;
+    }
+
+    .stTextInput>div>div {
+        color: black;
+    }
+
+    .stInfo {
+        background-color: rgba(168, 230, 207, 0.2);
+        border: 1px solid #a8e6cf;
+    }
+
+    .stFileUploader {
+        background-color: white;
+        padding: 1rem;
+        border-radius: 10px;
+        border: 2px dashed #a8e6cf;
+    }
+
+    .caption {
+        color: black !important;
+        font-style: italic;
+        text-align: center;
+        margin-top: 0.5rem;
+    }
+"""
 
 # Configure page
-st.set_page_config(
-    page_title="Plant and Animal Visualizer - Creekside Trail Explorer",
-    page_icon="🏞️",
-    layout="wide"
-)
+app_shell.setup_page(VISUALIZER_CSS, title="Plant and Animal Visualizer - Creekside Trail Explorer")
 
 # Sidebar Enhancement
-with st.sidebar:
-    st.markdown("""
-    <div style='text-align: center; padding: 1rem;'>
-        <h2 style='color: #ffffff;'>💭 Trail Chat Assistant</h2>
-    </div>
-    """, unsafe_allow_html=True)
-    
-    if "chat_history" not in st.session_state:
-        st.session_state.chat_history = []
-    
-    # Chat container
-    messages = st.container()
-    with messages:
-        for message in st.session_state.chat_history:
-            if message["role"] == "user":
-                with st.chat_message("user"):
-                    st.write(message["content"])
-    
-    # Chat input with styling
-    prompt = st.chat_input("Ask about trails...")
-    if prompt:
-        st.session_state.chat_history.append({"role": "user", "content": prompt})
-
-#Alvin Liu UI work
-# Enhanced CSS with nature theme
-st.markdown("""
-    <style>
-        .stApp {
-            background-color: #f5f7f9;
-        }
-        
-        .main-header {
-            color: #2c3e50;
-            font-family: 'Helvetica Neue', sans-serif;
-            padding: 1.5rem 0;
-            text-align: center;
-            background: linear-gradient(90deg, #a8e6cf 0%, #dcedc1 100%);
-            border-radius: 10px;
-            margin-bottom: 2rem;
-        }
-        
-        h1, h2, h3, h4 {
-            color: black !important;
-            font-family: 'Helvetica Neue', sans-serif;
-            margin-bottom: 1rem;
-        }
-        
-        .stButton>button {
-            border-radius: 20px;
-            background-color: #3498db;
-            color: white;
-            border: none;
-            padding: 0.5rem 1rem;
-            transition: background-color 0.3s;
-        }
-        
-        .stButton>button:hover {
-            background-color: #2980b9;
-        }
-        
-        .stTabs [data-baseweb="tab"] {
-            color: black !important;
-            font-weight: 500;
-        }
-        
-        .stTabs [data-baseweb="tab-list"] {
-            background-color: #ffffff;
-            border-radius: 10px;
-            padding: 0.5rem;
-            margin-bottom: 1rem;
-        }
-        
-        .upload-text, .stMarkdown p {
-            color: black !important;
-            margin: 1rem 0;
-        }
-        
-        .analysis-result {
-            color: black !important;
-            background-color: #ffffff;
-            padding: 1rem;
-            border-radius: 10px;
-            margin-top: 1rem;
-        }
-        
-        .stSelectbox {
-            color: black;
-        }
-        
-        .stTextInput>div>div {
-            color: black;
-        }
-        
-        .stInfo {
-            background-color: rgba(168, 230, 207, 0.2);
-            border: 1px solid #a8e6cf;
-        }
-        
-        .stFileUploader {
-            background-color: white;
-            padding: 1rem;
-            border-radius: 10px;
-            border: 2px dashed #a8e6cf;
-        }
-        
-        .caption {
-            color: black !important;
-            font-style: italic;
-            text-align: center;
-            margin-top: 0.5rem;
-        }
-    </style>
-""", unsafe_allow_html=True)
+app_shell.chat_sidebar()
 
 
 # Creek Trail Species Data
@@ -156,67 +86,80 @@ CREEK_TRAIL_SPECIES = {
 }
 
 # Helper Functions
-def encode_uploaded_image(uploaded_file) -> str:
-    """Encode uploaded image to base64 string."""
-    return base64.b64encode(uploaded_file.getbuffer()).decode('utf-8')
+def prepare_upload(uploaded_file) -> PreparedImage:
+    """
+    Shrink an upload for analysis, once per file.
+
+    Only the current upload's prepared copy is kept in the session, so reruns
+    neither re-decode the photo nor hold on to earlier ones.
+    """
+    cached = st.session_state.get("prepared_upload")
+    if cached is None or cached[0] != uploaded_file.file_id:
+        cached = (uploaded_file.file_id, prepare_image(uploaded_file.getvalue()))
+        st.session_state.prepared_upload = cached
+    return cached[1]
 
-def analyze_image(uploaded_file) -> str:
-    """Analyze uploaded image using OpenAI's GPT-4 Vision."""
+def analyze_image(image: PreparedImage) -> str:
+    """Analyze a prepared image using OpenAI's GPT-4 Vision."""
     try:
-        base64_image = encode_uploaded_image(uploaded_file)
-        response = openai.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": "What is in this image? Please identify and describe any plants, animals, and natural features."},
-                    {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}}
-                ]
-            }]
-        )
-        return response.choices[0].message.content
+        return image_analysis.describe_image(image)
     except Exception as e:
         return f"Error analyzing image: {str(e)}"
 
-def download_image(filename: str, url: str) -> None:
-    """Download image from URL and save to file."""
-    response = requests.get(url)
-    if response.status_code == 200:
-        with open(filename, 'wb') as file:
-            file.write(response.content)
-    else:
-        st.error(f"Error downloading image from URL: {url}")
+def show_batch_results(placeholder, results) -> None:
+    """Draw the species table for the batch results received so far."""
+    import pandas as pd
+
+    rows = image_analysis.species_rows(results)
+    placeholder.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
 
-def filename_from_input(prompt: str) -> str:
-    """Generate filename from input prompt."""
-    alphanum = "".join(char if char.isalnum() or char == " " else "" for char in prompt)
-    return "_".join(alphanum.split()[:3])
+def analyze_batch(uploaded_files) -> list:
+    """Analyze several uploads in parallel, filling in the results table as each finishes."""
+    progress = st.progress(0.0, text=f"Analyzing {len(uploaded_files)} images...")
+    table = st.empty()
+    results = []
+    photos = ((uploaded_file.name, uploaded_file.getvalue()) for uploaded_file in uploaded_files)
+    for result in image_analysis.analyze_batch(photos):
+        results.append(result)
+        progress.progress(len(results) / len(uploaded_files),
+                          text=f"Analyzed {len(results)} of {len(uploaded_files)} images")
+        show_batch_results(table, results)
+    progress.empty()
+    return results
 
-def get_image(prompt: str, category: str, model: str = "dall-e-3") -> Optional[List[str]]:
-    """Generate image using OpenAI's DALL-E."""
-    if category == "Plant":
-        base_prompt = "Detailed botanical illustration of"
+def show_illustration(job) -> None:
+    """Render one illustration job: its images when done, otherwise its progress."""
+    if job.status == illustrations.DONE:
+        # In-memory thumbnail; None if the image has since been evicted from the store
+        if thumbnail := illustration_store.get_store().thumbnail(job.key):
+            st.image(thumbnail, use_container_width=True)
+            st.markdown(
+                f"<p class='caption'>AI-generated illustration of {job.species} in its natural habitat</p>",
+                unsafe_allow_html=True
+            )
+        else:
+            st.warning("Could not generate illustration. Please try again.")
+    elif job.status == illustrations.FAILED:
+        st.error(f"Error generating image of {job.species}: {job.error}")
     else:
-        base_prompt = "Detailed wildlife illustration of"
-        
-    full_prompt = f"{base_prompt} {prompt} in its natural creek trail habitat, photorealistic style"
-    
-    try:
-        images = openai.Image.create(
-            prompt=full_prompt,
-            model=model,
-            n=1,
-            size="1024x1024"
-        )
-        filenames = []
-        for i, image_data in enumerate(images.data):
-            filename = f"{filename_from_input(prompt)}_{i + 1}.png"
-            download_image(filename, image_data.url)
-            filenames.append(filename)
-        return filenames
-    except Exception as e:
-        st.error(f"Error generating image: {e}")
-        return None
+        st.progress(job.progress, text=f"{job.species}: {job.status}...")
+
+def show_illustrations(jobs) -> None:
+    """Lay out illustration jobs in a grid, newest first."""
+    columns = st.columns(3)
+    for i, job in enumerate(reversed(jobs)):
+        with columns[i % 3]:
+            show_illustration(job)
+
+@st.fragment(run_every=1.0)
+def poll_illustrations() -> None:
+    """Redraw pending jobs every second without rerunning the whole page."""
+    queue = illustrations.get_queue()
+    jobs = [job for job in map(queue.get, st.session_state.illustration_jobs) if job]
+    if not any(job.pending for job in jobs):
+        # Switch back to the static view once everything has finished
+        st.rerun()
+    show_illustrations(jobs)
 
 def main():
     # Main header with enhanced nature theme
@@ -264,19 +207,30 @@ def main():
             else:
                 species_description = species_selection
 
-        if st.button("🎨 Generate Illustration", type="primary") and species_description:
-            with st.spinner(f"Creating illustration of {species_description}..."):
-                if image_filenames := get_image(species_description, category):
-                    st.markdown(f"<h4 style='color: black;'>Your {category} Illustration:</h4>", unsafe_allow_html=True)
-                    for filename in image_filenames:
-                        if os.path.exists(filename):
-                            st.image(filename, use_container_width=True)
-                            st.markdown(
-                                f"<p class='caption'>AI-generated illustration of {species_description} in its natural habitat</p>",
-                                unsafe_allow_html=True
-                            )
-                        else:
-                            st.warning("Could not generate illustration. Please try again.")
+        if "illustration_jobs" not in st.session_state:
+            st.session_state.illustration_jobs = []
+        queue = illustrations.get_queue()
+
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("🎨 Generate Illustration", type="primary") and species_description:
+                job = queue.submit(species_description, category)
+                st.session_state.illustration_jobs.append(job.id)
+        with col2:
+            if st.button(f"🎨 Generate all {subcategory}"):
+                for job in queue.submit_batch(CREEK_TRAIL_SPECIES[category][subcategory], category):
+                    st.session_state.illustration_jobs.append(job.id)
+
+        # Generation runs in the background; drop duplicates of shared jobs
+        job_ids = list(dict.fromkeys(st.session_state.illustration_jobs))
+        st.session_state.illustration_jobs = job_ids
+        jobs = [job for job in map(queue.get, job_ids) if job]
+        if jobs:
+            st.markdown("<h4 style='color: black;'>Your Illustrations:</h4>", unsafe_allow_html=True)
+            if any(job.pending for job in jobs):
+                poll_illustrations()
+            else:
+                show_illustrations(jobs)
 #Alvin Liu (Image Analysis)
     with tab2:
         st.markdown("<h3 style='color: black;'>Analyze Trail Images</h3>", unsafe_allow_html=True)
@@ -288,18 +242,60 @@ def main():
             </p>
         """, unsafe_allow_html=True)
         
-        uploaded_file = st.file_uploader(
-            "Upload a trail image",
-            type=['jpg', 'jpeg', 'png'],
-            help="Upload a clear photo of plants, animals, or landscapes from your trail adventures"
-        )
+        mode = st.radio("Mode", ["Single image", "Batch"], horizontal=True,
+                        help="Batch mode identifies the species in many photos at once")
+
+        if mode == "Batch":
+            uploaded_files = st.file_uploader(
+                "Upload trail images",
+                type=['jpg', 'jpeg', 'png'],
+                accept_multiple_files=True,
+                help="Upload all the photos from a survey; they are analyzed in parallel"
+            )
+            if uploaded_files and st.button(f"🔍 Analyze {len(uploaded_files)} Images", type="primary"):
+                st.session_state.batch_results = analyze_batch(uploaded_files)
+            elif st.session_state.get("batch_results"):
+                show_batch_results(st.empty(), st.session_state.batch_results)
+
+            if results := st.session_state.get("batch_results"):
+                failed = sum(1 for result in results if result.error)
+                total = sum(result.seconds for result in results)
+                st.caption(f"{len(results)} images, {failed} failed, "
+                           f"{total / len(results):.1f}s average per image")
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.download_button("Download CSV", image_analysis.to_csv(results),
+                                       file_name="trail_species.csv", mime="text/csv")
+                with col2:
+                    st.download_button("Download JSON", image_analysis.to_json(results),
+                                       file_name="trail_species.json", mime="application/json")
+                st.info("💡 Analysis powered by AI. Always verify findings with local expertise.")
+            uploaded_file = None
+        else:
+            uploaded_file = st.file_uploader(
+                "Upload a trail image",
+                type=['jpg', 'jpeg', 'png'],
+                help="Upload a clear photo of plants, animals, or landscapes from your trail adventures"
+            )
         
         if uploaded_file:
-            st.image(uploaded_file, caption="Your uploaded image", use_container_width=True)
+            try:
+                prepared = prepare_upload(uploaded_file)
+            except IMAGE_ERRORS as e:
+                st.error(str(e))
+                prepared = None
+
+        if uploaded_file and prepared:
+            st.image(prepared.data, caption="Your uploaded image", use_container_width=True)
+            st.caption(
+                f"Resized to {prepared.width}×{prepared.height} for analysis: "
+                f"{format_bytes(len(prepared.data))} instead of {format_bytes(prepared.original_bytes)} "
+                f"({format_bytes(max(prepared.saved_bytes, 0))} saved)"
+            )
             
             if st.button("🔍 Analyze Image", type="primary"):
                 with st.spinner("Analyzing your image..."):
-                    if analysis_result := analyze_image(uploaded_file):
+                    if analysis_result := analyze_image(prepared):
                         st.markdown("<h4 style='color: black;'>Analysis Results</h4>", unsafe_allow_html=True)
                         st.markdown(
                             f"<div class='analysis-result'>{analysis_result}</div>",
@@ -317,3 +313,4 @@ def main():
 
 if __name__ == "__main__":
     main()
+    app_shell.perf_panel()
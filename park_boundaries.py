@@ -0,0 +1,313 @@
+import argparse
+import json
+import math
+import os
+import time
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+import geocode_index
+from parks_data import load_parks
+from response_cache import CACHE_DIR
+
+BOUNDARIES_PATH = os.path.join(CACHE_DIR, "park_boundaries.npz")
+
+# Map zoom levels that get their own simplified geometry; each is simplified
+# to about one screen pixel at that zoom. Zooms past the last one use it.
+LEVEL_ZOOMS = (8, 10, 12, 14, 16)
+
+TILE_SIZE = 256
+
+# Bumped when the stored arrays change shape or meaning
+FORMAT_VERSION = 1
+
+# A park's rings, outer ring first, as (n, 2) arrays of [lng, lat]
+Polygon = List[np.ndarray]
+
+
+def pixel_degrees(zoom: float) -> float:
+    """Degrees of longitude covered by one screen pixel at a Web Mercator zoom level."""
+    return 360.0 / (TILE_SIZE * 2 ** zoom)
+
+
+def level_for_zoom(zoom: float) -> int:
+    """The coarsest stored level that is still within a pixel at `zoom`."""
+    for level in LEVEL_ZOOMS:
+        if level >= zoom:
+            return level
+    return LEVEL_ZOOMS[-1]
+
+
+def decimals_for_zoom(zoom: int) -> int:
+    """Coordinate decimals that keep rounding under half a pixel."""
+    return max(0, math.ceil(-math.log10(pixel_degrees(zoom) / 2)))
+
+
+def simplify_ring(ring: np.ndarray, tolerance: float) -> Optional[np.ndarray]:
+    """
+    Douglas-Peucker simplification of a closed [lng, lat] ring.
+
+    Distances are measured in Web Mercator terms (latitude scaled by
+    1 / cos(lat)), so `tolerance` is in degrees of longitude like
+    `pixel_degrees`. Returns None when the ring collapses below a triangle.
+    """
+    n = len(ring)
+    if n < 4:
+        return None
+    points = np.column_stack([ring[:, 0], ring[:, 1] / math.cos(math.radians(float(ring[:, 1].mean())))])
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    # The ends of a closed ring coincide, so split it at the point farthest from them
+    far = int(np.argmax(((points - points[0]) ** 2).sum(axis=1)))
+    keep[far] = True
+
+    stack = [(0, far), (far, n - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        a, b = points[start], points[end]
+        between = points[start + 1:end]
+        ab = b - a
+        length2 = float(ab @ ab)
+        t = np.clip((between - a) @ ab / length2, 0.0, 1.0) if length2 else np.zeros(len(between))
+        distance = np.hypot(*(between - (a + t[:, None] * ab)).T)
+        i = int(np.argmax(distance))
+        if distance[i] > tolerance:
+            keep[start + 1 + i] = True
+            stack.extend([(start, start + 1 + i), (start + 1 + i, end)])
+
+    simplified = ring[keep]
+    return simplified if len(simplified) >= 4 else None
+
+
+def _polygons(geometry: dict) -> Iterator[Polygon]:
+    if geometry is None:
+        return
+    if geometry["type"] == "Polygon":
+        yield [np.asarray(ring, dtype=float)[:, :2] for ring in geometry["coordinates"]]
+    elif geometry["type"] == "MultiPolygon":
+        for polygon in geometry["coordinates"]:
+            yield [np.asarray(ring, dtype=float)[:, :2] for ring in polygon]
+
+
+def _objectid(properties: dict) -> Optional[int]:
+    for name, value in (properties or {}).items():
+        if name.strip().lower() == "objectid" and value not in (None, ""):
+            return int(value)
+    return None
+
+
+def read_features(path: str) -> Iterator[Tuple[Optional[int], List[Polygon]]]:
+    """
+    Yield (OBJECTID, polygons) for each feature of a GeoJSON file or shapefile.
+
+    Coordinates must be WGS84 longitude/latitude, as ArcGIS exports them
+    with outSR=4326. Reading shapefiles needs the `pyshp` package.
+    """
+    if path.lower().endswith(".shp"):
+        import shapefile
+
+        with shapefile.Reader(path) as reader:
+            for shape_record in reader.iterShapeRecords():
+                yield (_objectid(shape_record.record.as_dict()),
+                       list(_polygons(shape_record.shape.__geo_interface__)))
+        return
+
+    with open(path, encoding="utf-8") as f:
+        collection = json.load(f)
+    for feature in collection.get("features", []):
+        yield _objectid(feature.get("properties")), list(_polygons(feature.get("geometry")))
+
+
+def synthetic_features(df, coordinates: Dict[int, geocode_index.Coordinate], vertices: int = 400,
+                       seed: int = 0) -> Iterator[Tuple[int, List[Polygon]]]:
+    """
+    Irregular outlines around each geocoded park with about its real area.
+
+    For trying the map and measuring payloads before a boundary export is
+    available; `vertices` per outline mimics surveyed boundaries.
+    """
+    rng = np.random.default_rng(seed)
+    angles = np.linspace(0, 2 * np.pi, vertices, endpoint=False)
+    for objectid, acres in zip(df["objectid"].tolist(), df["acres"].tolist()):
+        point = coordinates.get(objectid)
+        if point is None or not acres or np.isnan(acres):
+            continue
+        radius_m = math.sqrt(acres * 4046.86 / math.pi)
+        wobble = 1 + 0.25 * np.sin(angles * rng.integers(2, 6) + rng.uniform(0, 6)) \
+            + 0.03 * rng.standard_normal(vertices)
+        lat = point.lat + radius_m * wobble * np.sin(angles) / 111_320
+        lng = point.lng + radius_m * wobble * np.cos(angles) / (111_320 * math.cos(math.radians(point.lat)))
+        ring = np.column_stack([lng, lat])
+        yield objectid, [[np.vstack([ring, ring[:1]])]]
+
+
+def _bbox(polygons: List[Polygon]) -> List[float]:
+    points = np.vstack([ring for polygon in polygons for ring in polygon])
+    return [*points.min(axis=0), *points.max(axis=0)]
+
+
+def build_store(features: Iterable[Tuple[Optional[int], List[Polygon]]],
+                output: str = BOUNDARIES_PATH) -> dict:
+    """
+    Simplify every park outline at each level and write them with their bounding boxes.
+
+    Each level is stored as flat coordinate, ring-offset, polygon-offset and
+    feature-offset arrays (features in OBJECTID order), so a query slices
+    arrays instead of parsing geometry. Features without an OBJECTID are
+    skipped. Returns counts of features, skipped features and vertices per level.
+    """
+    parks: Dict[int, List[Polygon]] = {}
+    skipped = 0
+    for objectid, polygons in features:
+        if objectid is None or not polygons:
+            skipped += 1
+            continue
+        parks.setdefault(objectid, []).extend(polygons)
+
+    objectids = np.array(sorted(parks), dtype=np.int64)
+    bbox = np.array([_bbox(parks[objectid]) for objectid in objectids.tolist()], dtype=float).reshape(-1, 4)
+    arrays = {"format": np.array(FORMAT_VERSION), "levels": np.array(LEVEL_ZOOMS),
+              "objectid": objectids, "bbox": bbox}
+    counts = {"features": len(objectids), "skipped": skipped}
+
+    for zoom in LEVEL_ZOOMS:
+        tolerance = pixel_degrees(zoom)
+        coords, ring_offsets, polygon_offsets, feature_offsets = [], [0], [0], [0]
+        for objectid in objectids.tolist():
+            for polygon in parks[objectid]:
+                outer = simplify_ring(polygon[0], tolerance)
+                if outer is None:
+                    continue
+                for ring in [outer] + [simplify_ring(hole, tolerance) for hole in polygon[1:]]:
+                    if ring is not None:
+                        coords.append(ring)
+                        ring_offsets.append(ring_offsets[-1] + len(ring))
+                polygon_offsets.append(len(ring_offsets) - 1)
+            feature_offsets.append(len(polygon_offsets) - 1)
+        arrays[f"coords_{zoom}"] = np.vstack(coords) if coords else np.empty((0, 2))
+        arrays[f"rings_{zoom}"] = np.array(ring_offsets, dtype=np.int64)
+        arrays[f"polygons_{zoom}"] = np.array(polygon_offsets, dtype=np.int64)
+        arrays[f"features_{zoom}"] = np.array(feature_offsets, dtype=np.int64)
+        counts[f"vertices_{zoom}"] = ring_offsets[-1]
+
+    tmp_path = f"{output}.tmp.npz"
+    np.savez_compressed(tmp_path, **arrays)
+    os.replace(tmp_path, output)
+    return counts
+
+
+class BoundaryIndex:
+    """Stored park outlines, queried by viewport and zoom."""
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        if int(arrays["format"]) != FORMAT_VERSION:
+            raise ValueError("Park boundaries were built by another version; rebuild them")
+        self.objectid = arrays["objectid"]
+        self.bbox = arrays["bbox"]
+        self.levels = {int(zoom): tuple(arrays[f"{name}_{zoom}"]
+                                        for name in ("coords", "rings", "polygons", "features"))
+                       for zoom in arrays["levels"]}
+
+    def position(self, objectid: int) -> Optional[int]:
+        """Where a park is stored, or None if it has no outline."""
+        i = int(np.searchsorted(self.objectid, objectid))
+        return i if i < len(self.objectid) and self.objectid[i] == objectid else None
+
+    def visible(self, west: float, south: float, east: float, north: float,
+                objectids: Optional[Iterable[int]] = None) -> np.ndarray:
+        """Positions of parks whose bounding box overlaps the viewport, optionally limited to `objectids`."""
+        overlaps = ((self.bbox[:, 0] <= east) & (self.bbox[:, 2] >= west)
+                    & (self.bbox[:, 1] <= north) & (self.bbox[:, 3] >= south))
+        if objectids is not None:
+            overlaps &= np.isin(self.objectid, np.fromiter(objectids, dtype=np.int64))
+        return np.flatnonzero(overlaps)
+
+    def geojson(self, positions: np.ndarray, zoom: float, properties: Optional[Dict[int, dict]] = None) -> dict:
+        """
+        A GeoJSON FeatureCollection of the parks at `positions`, at the level for `zoom`.
+
+        Coordinates are rounded to what the level can show; parks smaller
+        than a pixel at that level have no geometry there and are left out.
+        """
+        level = level_for_zoom(zoom)
+        coords, rings, polygons, features = self.levels[level]
+        decimals = decimals_for_zoom(level)
+        collection = []
+        for position in positions.tolist():
+            parts = []
+            for polygon in range(features[position], features[position + 1]):
+                parts.append([np.round(coords[rings[ring]:rings[ring + 1]], decimals).tolist()
+                              for ring in range(polygons[polygon], polygons[polygon + 1])])
+            if not parts:
+                continue
+            objectid = int(self.objectid[position])
+            collection.append({"type": "Feature", "id": objectid,
+                               "properties": (properties or {}).get(objectid, {}),
+                               "geometry": {"type": "MultiPolygon", "coordinates": parts}})
+        return {"type": "FeatureCollection", "features": collection}
+
+
+def viewport(lat: float, lng: float, zoom: float, width: int = 800, height: int = 500) -> Tuple[float, ...]:
+    """Approximate (west, south, east, north) of a map of `width` x `height` pixels."""
+    half_lng = pixel_degrees(zoom) * width / 2
+    half_lat = pixel_degrees(zoom) * height / 2 * math.cos(math.radians(lat))
+    return lng - half_lng, lat - half_lat, lng + half_lng, lat + half_lat
+
+
+def snap_to_tiles(west: float, south: float, east: float, north: float, zoom: float) -> Tuple[float, ...]:
+    """
+    Grow a viewport outwards to whole map tiles.
+
+    Small pans then ask for the same area, so they produce the same layer
+    and nothing is resent to the browser.
+    """
+    tile = pixel_degrees(round(zoom)) * TILE_SIZE
+    return (math.floor(west / tile) * tile, math.floor(south / tile) * tile,
+            math.ceil(east / tile) * tile, math.ceil(north / tile) * tile)
+
+
+@lru_cache(maxsize=2)
+def _cached_index(path: str, mtime: float) -> BoundaryIndex:
+    with np.load(path) as arrays:
+        return BoundaryIndex(dict(arrays))
+
+
+def get_index(path: str = BOUNDARIES_PATH) -> Optional[BoundaryIndex]:
+    """Return the boundary index, reloading it if the file changed, or None if none was built."""
+    if not os.path.exists(path):
+        return None
+    return _cached_index(path, os.path.getmtime(path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build multi-resolution park boundaries for the map.")
+    parser.add_argument("source", nargs="?", help="GeoJSON or shapefile export of park boundaries")
+    parser.add_argument("--synthetic", action="store_true",
+                        help="Generate outlines from park coordinates and acreage instead")
+    parser.add_argument("--output", default=BOUNDARIES_PATH)
+    args = parser.parse_args()
+    if not args.source and not args.synthetic:
+        parser.error("give a boundary export or --synthetic")
+
+    start = time.perf_counter()
+    if args.synthetic:
+        features = synthetic_features(load_parks(), geocode_index.get_coordinates())
+    else:
+        features = read_features(args.source)
+    counts = build_store(features, args.output)
+    print(f"Stored {counts['features']} parks in {args.output} ({counts['skipped']} features skipped, "
+          f"{time.perf_counter() - start:.1f}s)")
+
+    index = get_index(args.output)
+    everything = np.arange(len(index.objectid))
+    for zoom in LEVEL_ZOOMS:
+        payload = len(json.dumps(index.geojson(everything, zoom), separators=(",", ":")))
+        print(f"  zoom {zoom:>2}: {counts[f'vertices_{zoom}']:>9,} vertices, {payload:>11,} bytes for every park")
+
+
+if __name__ == "__main__":
+    main()
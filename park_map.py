@@ -0,0 +1,134 @@
+import html
+from typing import Dict, Optional, Tuple
+
+import folium
+import numpy as np
+import pandas as pd
+from folium.plugins import FastMarkerCluster
+
+import geocode_index
+import park_boundaries
+
+# Marker colour per park status
+STATUS_COLORS = {
+    "open": "#27ae60",
+    "closed/land bank": "#7f8c8d",
+}
+DEFAULT_COLOR = "#2980b9"
+
+# Draws one status-coloured circle per park; rows are [lat, lng, popup, color]
+MARKER_CALLBACK = """
+function (row) {
+    var marker = L.circleMarker(new L.LatLng(row[0], row[1]), {
+        radius: 7, color: row[3], fillColor: row[3], fillOpacity: 0.8, weight: 1
+    });
+    marker.bindPopup(row[2]);
+    return marker;
+};
+"""
+
+
+def build_base_map(center=geocode_index.COUNTY_CENTROID, zoom: int = 10) -> folium.Map:
+    """
+    Build the base map shared by every rerun.
+
+    The map gets a fixed id so its rendered HTML is identical on every rerun;
+    together with a `key` on st_folium this keeps the same map mounted in the
+    browser, and only the marker layers passed as `feature_group_to_add`
+    are swapped when they change.
+    """
+    m = folium.Map(location=list(center), zoom_start=zoom,
+                   tiles="OpenStreetMap",
+                   attr="Map tiles by OpenStreetMap contributors.")
+    m._id = "trail_finder"
+    return m
+
+
+def marker_data(df: pd.DataFrame, coordinates: Optional[Dict[int, geocode_index.Coordinate]] = None) -> list:
+    """
+    Return [lat, lng, popup, color] for every geocoded park in `df`.
+
+    `coordinates` defaults to the coordinate index (see geocode_index.py).
+    """
+    if coordinates is None:
+        coordinates = geocode_index.get_coordinates()
+    points = [coordinates.get(objectid) for objectid in df["objectid"].tolist()]
+    has_point = np.array([point is not None for point in points], dtype=bool)
+    if not has_point.any():
+        return []
+
+    names = df["park name"].astype("string").fillna("").to_numpy()[has_point]
+    statuses = df["status"].astype("string").fillna("").to_numpy()[has_point]
+    points = [point for point in points if point is not None]
+    return [
+        [point.lat, point.lng,
+         f"<b>{html.escape(name)}</b><br>{html.escape(status)}",
+         STATUS_COLORS.get(status, DEFAULT_COLOR)]
+        for point, name, status in zip(points, names, statuses)
+    ]
+
+
+def park_layer(df: pd.DataFrame) -> folium.FeatureGroup:
+    """
+    Build a clustered, status-coloured marker layer for the parks in `df`.
+
+    Markers are created in the browser from a compact data array rather than
+    one folium object per park, and ids are fixed so an unchanged filter
+    produces an identical layer that st_folium does not resend to the map.
+    """
+    layer = folium.FeatureGroup(name="Parks")
+    cluster = FastMarkerCluster(marker_data(df), callback=MARKER_CALLBACK)
+    cluster._id = "parks"
+    cluster.add_to(layer)
+    return layer
+
+
+def selected_layer(lat: float, lng: float, name: str) -> folium.FeatureGroup:
+    """Build the layer highlighting the currently selected park."""
+    layer = folium.FeatureGroup(name="Selected park")
+    marker = folium.Marker([lat, lng], popup=html.escape(str(name)),
+                           icon=folium.Icon(color="red", icon="star"))
+    marker._id = "selected"
+    marker.add_to(layer)
+    return layer
+
+
+def _boundary_style(feature: dict) -> dict:
+    color = STATUS_COLORS.get(feature["properties"].get("status"), DEFAULT_COLOR)
+    return {"color": color, "weight": 2, "fillColor": color, "fillOpacity": 0.15}
+
+
+def boundary_layer(df: pd.DataFrame, view: Optional[dict], center: Tuple[float, float],
+                   zoom: int) -> Optional[folium.FeatureGroup]:
+    """
+    Build the outlines of the parks in `df` that are in view (see park_boundaries.py).
+
+    `view` is the map state st_folium last returned, with Leaflet "bounds" and
+    "zoom"; before the map reports one, the view around `center` at `zoom`
+    is assumed. Only parks overlapping the view, grown to whole tiles, are
+    included, at the detail level for the zoom. Returns None if no
+    boundaries have been built.
+    """
+    index = park_boundaries.get_index()
+    if index is None:
+        return None
+    view = view or {}
+    zoom = view.get("zoom") or zoom
+    south_west = (view.get("bounds") or {}).get("_southWest") or {}
+    north_east = (view.get("bounds") or {}).get("_northEast") or {}
+    if south_west.get("lat") is not None and north_east.get("lat") is not None:
+        extent = (south_west["lng"], south_west["lat"], north_east["lng"], north_east["lat"])
+    else:
+        extent = park_boundaries.viewport(*center, zoom)
+
+    positions = index.visible(*park_boundaries.snap_to_tiles(*extent, zoom), df["objectid"].dropna().tolist())
+    shown = df[df["objectid"].isin(index.objectid[positions])]
+    properties = {int(objectid): {"name": str(name), "status": str(status)}
+                  for objectid, name, status in zip(shown["objectid"], shown["park name"], shown["status"])}
+
+    layer = folium.FeatureGroup(name="Park boundaries")
+    outlines = folium.GeoJson(index.geojson(positions, zoom, properties), style_function=_boundary_style,
+                              tooltip=folium.GeoJsonTooltip(["name"], labels=False))
+    outlines._id = "boundaries"
+    outlines.add_to(layer)
+    return layer
@@ -0,0 +1,316 @@
+import math
+import os
+import re
+import time
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import trail_guide
+from park_search import normalize
+from parks_data import PARKS_CSV, load_parks
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+STOPWORDS = frozenset("""
+a about an and any are as at be best by can do does for from good have how i in is it me
+my near of on or park show that the there this to trail we what where which who with you your
+""".split())
+
+# Longest Trail Guide passage injected into a prompt, in characters
+PASSAGE_CHARS = 600
+
+_acre_bound = re.compile(
+    r"\b(over|more than|greater than|above|at least|larger than|bigger than|"
+    r"under|less than|below|at most|smaller than)\s+(\d[\d,]*(?:\.\d+)?)\s*(?:acres?|ac)\b"
+)
+_acre_range = re.compile(r"\bbetween\s+(\d[\d,]*(?:\.\d+)?)\s+and\s+(\d[\d,]*(?:\.\d+)?)\s*(?:acres?|ac)\b")
+_zip_code = re.compile(r"\b(9[45]\d{3})\b")
+_lower_bounds = ("over", "more than", "greater than", "above", "at least", "larger than", "bigger than")
+
+
+def singular(word: str) -> str:
+    """Crude plural stripping, so "parks" and "properties" match "park" and "property"."""
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "os")):
+        return word[:-1]
+    return word
+
+
+def words(text: str) -> str:
+    """Normalized text with every word made singular."""
+    return " ".join(singular(word) for word in normalize(text).split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Singular normalized words of `text`, without stopwords."""
+    return [word for word in words(text).split() if word not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    Okapi BM25 over a list of documents.
+
+    Postings are stored flat (CSR style) per term, so scoring a query is a
+    handful of numpy operations over the documents containing its terms.
+    """
+
+    def __init__(self, texts: List[str]):
+        doc_tokens = [tokenize(text) for text in texts]
+        self.size = len(texts)
+        self.vocabulary: Dict[str, int] = {}
+        term_docs: List[Dict[int, int]] = []
+        for doc, tokens in enumerate(doc_tokens):
+            for token in tokens:
+                term = self.vocabulary.setdefault(token, len(term_docs))
+                if term == len(term_docs):
+                    term_docs.append({})
+                term_docs[term][doc] = term_docs[term].get(doc, 0) + 1
+
+        lengths = np.asarray([len(tokens) for tokens in doc_tokens], dtype=float)
+        average = lengths.mean() if len(lengths) and lengths.mean() > 0 else 1.0
+        self.norm = K1 * (1 - B + B * lengths / average)
+
+        self.ptr = np.zeros(len(term_docs) + 1, dtype=np.int64)
+        self.ptr[1:] = np.cumsum([len(docs) for docs in term_docs])
+        self.docs = np.fromiter((doc for docs in term_docs for doc in docs), dtype=np.int32, count=self.ptr[-1])
+        self.tf = np.fromiter((tf for docs in term_docs for tf in docs.values()), dtype=float, count=self.ptr[-1])
+        self.idf = np.asarray([math.log(1 + (self.size - len(docs) + 0.5) / (len(docs) + 0.5))
+                               for docs in term_docs])
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every document for `query` (0 where no term matches)."""
+        scores = np.zeros(self.size)
+        for token in set(tokenize(query)):
+            term = self.vocabulary.get(token)
+            if term is None:
+                continue
+            start, end = self.ptr[term], self.ptr[term + 1]
+            docs, tf = self.docs[start:end], self.tf[start:end]
+            scores[docs] += self.idf[term] * tf * (K1 + 1) / (tf + self.norm[docs])
+        return scores
+
+
+class Filters(NamedTuple):
+    cities: Tuple[str, ...] = ()
+    statuses: Tuple[str, ...] = ()
+    suffixes: Tuple[str, ...] = ()
+    zip_codes: Tuple[int, ...] = ()
+    min_acres: Optional[float] = None
+    max_acres: Optional[float] = None
+
+    def __bool__(self) -> bool:
+        return any(value not in ((), None) for value in self)
+
+    def describe(self) -> str:
+        parts = []
+        if self.cities:
+            parts.append("city " + " or ".join(self.cities))
+        if self.statuses:
+            parts.append("status " + " or ".join(self.statuses))
+        if self.suffixes:
+            parts.append("type " + " or ".join(self.suffixes))
+        if self.zip_codes:
+            parts.append("ZIP " + " or ".join(map(str, self.zip_codes)))
+        if self.min_acres is not None:
+            parts.append(f"at least {self.min_acres:g} acres")
+        if self.max_acres is not None:
+            parts.append(f"at most {self.max_acres:g} acres")
+        return ", ".join(parts)
+
+
+class Passage(NamedTuple):
+    topic: str
+    text: str
+
+
+def topic_passages() -> List[Passage]:
+    """
+    Trail Guide content to retrieve from: each topic's title, plus its cached
+    answer split into short passages if it has been generated.
+    """
+    passages = []
+    for topic in trail_guide.TOPICS:
+        passages.append(Passage(topic, topic))
+        try:
+            answer = trail_guide.get_cache().get(trail_guide.CACHE_NAMESPACE, topic,
+                                                 trail_guide.DEFAULT_MODEL, trail_guide.PROMPT_VERSION)
+        except Exception:
+            answer = None
+        for block in re.split(r"\n\s*\n|\n(?=#)", answer or ""):
+            block = block.strip()
+            if block:
+                passages.append(Passage(topic, block[:PASSAGE_CHARS]))
+    return passages
+
+
+class ParkRetriever:
+    """
+    Finds the parks and Trail Guide passages relevant to a chat question.
+
+    Structured constraints in the question (cities, open/closed, park type,
+    ZIP codes, acreage bounds) are extracted and applied as exact filters;
+    the remaining words are ranked with BM25 over each park's name, address,
+    city, status and type. Only the few best rows are put in the prompt.
+    """
+
+    def __init__(self, df: pd.DataFrame, passages: Optional[List[Passage]] = None):
+        self.df = df
+        columns = ["park name", "address", "city", "status", "suffix"]
+        text = df[columns].astype("string").fillna("").agg(" ".join, axis=1).tolist()
+        self.parks = BM25Index(text)
+        self.passages = topic_passages() if passages is None else passages
+        self.passage_index = BM25Index([f"{p.topic} {p.text}" for p in self.passages])
+
+        self.city = df["city"].astype("string").fillna("").to_numpy()
+        self.status = df["status"].astype("string").fillna("").to_numpy()
+        self.suffix = df["suffix"].astype("string").fillna("").to_numpy()
+        self.zip_code = df["zip code"].to_numpy(dtype=float, na_value=np.nan)
+        self.acres = df["acres"].to_numpy(dtype=float, na_value=np.nan)
+
+        # Phrases recognised as filters, longest first so "heritage county park" beats "county park"
+        city_phrases = sorted(((words(city), city) for city in set(self.city) if city),
+                              key=lambda pair: -len(pair[0]))
+        self.city_patterns = [(re.compile(rf" (in|near|around) {re.escape(phrase)} "), city)
+                              for phrase, city in city_phrases]
+        suffix_phrases = sorted({words(suffix) for suffix in self.suffix
+                                 if suffix and words(suffix) != "park"}, key=len, reverse=True)
+        self.suffix_patterns = [(re.compile(rf" {re.escape(phrase)} "),
+                                 sorted({s for s in self.suffix if s and phrase in words(s)}))
+                                for phrase in suffix_phrases]
+
+    def extract_filters(self, question: str) -> Tuple[Filters, str]:
+        """
+        Pull structured constraints out of a question.
+
+        Returns:
+            tuple: (Filters, the question with the matched phrases removed)
+        """
+        text = f" {words(question.replace(',', ''))} "
+        cities, suffixes, statuses = [], [], []
+        # Only "in <city>" is a filter; "Los Gatos Creek" is a park in Campbell
+        for pattern, city in self.city_patterns:
+            match = pattern.search(text)
+            if match:
+                cities.append(city)
+                text = text[:match.start()] + " " + text[match.end():]
+        for pattern, members in self.suffix_patterns:
+            match = pattern.search(text)
+            if match:
+                suffixes.extend(member for member in members if member not in suffixes)
+                text = text[:match.start()] + " " + text[match.end():]
+        if re.search(r" open ", text):
+            statuses.append("open")
+            text = re.sub(r" open ", " ", text)
+        if re.search(r" (closed|land bank) ", text):
+            statuses.extend(sorted({s for s in self.status if s != "open" and s}))
+            text = re.sub(r" (closed|land bank) ", " ", text)
+
+        min_acres = max_acres = None
+        raw = question.lower().replace(",", "")
+        for bound, value in _acre_bound.findall(raw):
+            if bound in _lower_bounds:
+                min_acres = float(value)
+            else:
+                max_acres = float(value)
+        for low, high in _acre_range.findall(raw):
+            min_acres, max_acres = sorted((float(low), float(high)))
+        text = re.sub(r"\b(over|more than|greater than|above|at least|larger than|bigger than|under|less than|"
+                      r"below|at most|smaller than|between)\b|\d+(\.\d+)?|\bacres?\b|\band\b", " ", text)
+        zip_codes = tuple(int(z) for z in _zip_code.findall(raw))
+
+        filters = Filters(tuple(cities), tuple(statuses), tuple(suffixes), zip_codes, min_acres, max_acres)
+        return filters, " ".join(text.split())
+
+    def mask(self, filters: Filters) -> np.ndarray:
+        """Boolean mask of the rows satisfying every filter."""
+        mask = np.ones(len(self.df), dtype=bool)
+        if filters.cities:
+            mask &= np.isin(self.city, filters.cities)
+        if filters.statuses:
+            mask &= np.isin(self.status, filters.statuses)
+        if filters.suffixes:
+            mask &= np.isin(self.suffix, filters.suffixes)
+        if filters.zip_codes:
+            mask &= np.isin(self.zip_code, filters.zip_codes)
+        if filters.min_acres is not None:
+            mask &= self.acres >= filters.min_acres
+        if filters.max_acres is not None:
+            mask &= self.acres <= filters.max_acres
+        return mask
+
+    def retrieve(self, question: str, k: int = 5) -> Tuple[Filters, np.ndarray, int, List[Passage]]:
+        """
+        Find the rows and passages relevant to `question`.
+
+        Returns:
+            tuple: (extracted filters, up to `k` row positions best first,
+                    number of rows matching, up to 2 Trail Guide passages)
+        """
+        filters, remainder = self.extract_filters(question)
+        scores = self.parks.scores(remainder)
+        mask = self.mask(filters)
+        if not filters:
+            # Without filters only rows that match some words are relevant
+            mask &= scores > 0
+        candidates = np.flatnonzero(mask)
+        # Best text match first; ties (e.g. filter-only questions) by size
+        acres = np.nan_to_num(self.acres[candidates], nan=-1.0)
+        order = np.lexsort((-acres, -scores[candidates]))
+        rows = candidates[order[:k]]
+
+        passage_scores = self.passage_index.scores(question)
+        best = np.argsort(-passage_scores, kind="stable")[:2]
+        passages = [self.passages[i] for i in best if passage_scores[i] > 0]
+        return filters, rows, len(candidates), passages
+
+    def context(self, question: str, k: int = 5) -> str:
+        """The retrieved rows and passages, formatted for a system message ("" if none)."""
+        filters, rows, total, passages = self.retrieve(question, k)
+        lines = []
+        if filters or len(rows):
+            heading = f"Parks in the county dataset matching the question ({total} found"
+            heading += f", filtered by {filters.describe()})" if filters else ")"
+            lines.append(heading + ":" if len(rows) else heading + ".")
+            for row in self.df.iloc[rows].to_dict("records"):
+                address = ", ".join(str(part) for part in (row["address"], row["city"], row["zip code"])
+                                    if not pd.isna(part))
+                lines.append(f"- {row['park name']} {'' if pd.isna(row['suffix']) else row['suffix']}".rstrip()
+                             + f" | {address or 'no address'} | status: {row['status']}"
+                             + f" | {row['acres']:,.1f} acres")
+        for passage in passages:
+            lines.append(f"Trail Guide ({passage.topic}): {passage.text}")
+        return "\n".join(lines)
+
+
+@lru_cache(maxsize=2)
+def _cached_retriever(path: str, mtime: Optional[float]) -> ParkRetriever:
+    return ParkRetriever(load_parks(path))
+
+
+def get_retriever(path: str = PARKS_CSV) -> ParkRetriever:
+    """Return the retriever for the parks dataset, rebuilding it if the file changed."""
+    mtime = os.path.getmtime(path) if os.path.exists(path) else None
+    return _cached_retriever(path, mtime)
+
+
+if __name__ == "__main__":
+    import sys
+
+    start = time.perf_counter()
+    retriever = get_retriever()
+    print(f"Built retrieval index in {(time.perf_counter() - start) * 1000:.1f} ms")
+    for question in sys.argv[1:] or ["which open county parks in Campbell are over 100 acres",
+                                     "parks near almaden with a creek",
+                                     "closed land bank properties in San Jose",
+                                     "what should I do if I meet a mountain lion"]:
+        start = time.perf_counter()
+        for _ in range(100):
+            retriever.retrieve(question)
+        elapsed = (time.perf_counter() - start) / 100 * 1e6
+        print(f"\n{question!r} ({elapsed:.0f} µs)\n{retriever.context(question)}")
@@ -0,0 +1,252 @@
+import os
+import re
+import time
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from parks_data import PARKS_CSV, load_parks
+
+# Searched columns, in ranking order, and how much a fuzzy match in each counts
+SEARCH_FIELDS = {
+    "park name": 1.0,
+    "address": 0.8,
+    "city": 0.6,
+}
+
+# Share of the query's trigrams a value must contain to count as a match
+MIN_SIMILARITY = 0.45
+
+_non_alnum = re.compile(r"[^a-z0-9]+")
+
+
+def normalize(text: str) -> str:
+    """Lower-case text and collapse punctuation and whitespace to single spaces."""
+    return _non_alnum.sub(" ", str(text).lower()).strip()
+
+
+def normalize_series(values: pd.Series) -> pd.Series:
+    """`normalize` applied to every value of a string Series at once."""
+    return values.str.lower().str.replace(_non_alnum, " ", regex=True).str.strip()
+
+
+def trigrams(text: str) -> set:
+    """Return the padded trigrams of every word in normalized text."""
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class ParkSearchIndex:
+    """
+    Prefix and trigram index over the park name, address and city of every row.
+
+    Distinct field values ("terms") are indexed rather than rows, so a city
+    shared by thousands of parks is stored once. Matches are ranked in tiers,
+    stopping as soon as `limit` rows are found:
+
+    1. values that start with the query (name first, then address, then city)
+    2. values with a later word that starts with the query
+    3. values sharing most of the query's trigrams, which tolerates typos
+
+    Tiers 1 and 2 are binary searches over sorted prefix arrays, so the common
+    as-you-type case never touches more than `limit` terms.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.size = len(df)
+        term_text: List[str] = []
+        term_field: List[np.ndarray] = []
+        entry_terms: List[np.ndarray] = []
+        entry_rows: List[np.ndarray] = []
+
+        for field_id, field in enumerate(SEARCH_FIELDS):
+            values = df[field]
+            if not isinstance(values.dtype, pd.CategoricalDtype):
+                values = values.astype("category")
+
+            # Several raw values can normalize to the same text; they share a
+            # term, numbered in order of first appearance among the categories
+            texts = normalize_series(pd.Series(values.cat.categories.astype(str)))
+            texts = texts.where(texts != "")
+            codes, uniques = pd.factorize(texts)
+            term_of_code = np.where(codes >= 0, codes + len(term_text), -1)
+            term_text.extend(uniques.tolist())
+            term_field.append(np.full(len(uniques), field_id, dtype=np.int8))
+
+            # Missing values have code -1, which picks the trailing -1
+            row_terms = np.append(term_of_code, -1)[values.cat.codes.to_numpy()]
+            rows = np.flatnonzero(row_terms >= 0)
+            entry_terms.append(row_terms[rows])
+            entry_rows.append(rows)
+
+        # Rows of each term, stored flat (CSR style): rows of term t are
+        # row_ids[row_ptr[t]:row_ptr[t + 1]], ascending
+        entry_terms_all = np.concatenate(entry_terms)
+        order = np.argsort(entry_terms_all, kind="stable")
+        self.term_text = term_text
+        self.term_field = np.concatenate(term_field)
+        self.term_weight = np.asarray(list(SEARCH_FIELDS.values()))[self.term_field]
+        self.row_ptr = np.zeros(len(term_text) + 1, dtype=np.int64)
+        self.row_ptr[1:] = np.cumsum(np.bincount(entry_terms_all, minlength=len(term_text)))
+        self.row_ids = np.concatenate(entry_rows)[order].astype(np.int32)
+        self.term_length = np.fromiter(map(len, term_text), dtype=np.int64, count=len(term_text))
+
+        # Sorted (text, term) arrays per field: whole values, and word-aligned suffixes
+        starts, words = [], []
+        for field_id in range(len(SEARCH_FIELDS)):
+            terms = np.flatnonzero(self.term_field == field_id)
+            field_text = [term_text[term] for term in terms.tolist()]
+            starts.append(self._sorted_keys(field_text, terms))
+            suffixes, suffix_terms = self._word_suffixes(field_text, terms)
+            words.append(self._sorted_keys(suffixes, suffix_terms))
+        self.prefix_tiers = starts + words
+        self.postings = self._trigram_postings(term_text)
+
+        # Rows ordered by park name, for listing parks before anything is typed
+        names = df["park name"].astype("string").fillna("").str.lower()
+        self.name_order = names.argsort(kind="stable").to_numpy().astype(np.int32)
+
+    @staticmethod
+    def _sorted_keys(texts: List[str], terms: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Sort by text; `terms` ascend, so a stable sort keeps ties in term order."""
+        # Normalized text is ASCII, so byte strings sort the same and much faster
+        order = np.argsort(np.asarray(texts, dtype=bytes), kind="stable")
+        return np.asarray(texts, dtype=object)[order], terms[order].astype(np.int32)
+
+    @staticmethod
+    def _word_suffixes(texts: List[str], terms: np.ndarray) -> Tuple[List[str], np.ndarray]:
+        """Every suffix of each text that starts after a space, with its term."""
+        if not texts:
+            return [], terms[:0]
+        # One string of all texts, each followed by a space; a space marks a
+        # suffix start unless it is the separator that ends a text
+        joined = " ".join(texts) + " "
+        ends = np.cumsum([len(text) + 1 for text in texts]) - 1
+        spaces = np.flatnonzero(np.frombuffer(joined.encode("ascii"), dtype=np.uint8) == ord(" "))
+        owner = np.searchsorted(ends, spaces)
+        inner = spaces != ends[owner]
+        spaces, owner = spaces[inner], owner[inner]
+        suffixes = [joined[start + 1:end] for start, end in zip(spaces.tolist(), ends[owner].tolist())]
+        return suffixes, terms[owner]
+
+    @staticmethod
+    def _trigram_postings(texts: List[str]) -> Dict[str, np.ndarray]:
+        """Map each trigram (see `trigrams`) to the ascending terms containing it."""
+        if not texts:
+            return {}
+        # Pad each word as `trigrams` does: "  a b " -> "  a   b ". The grams
+        # spanning two words end in two spaces ("a  ", "   ") and are dropped
+        padded = [f"  {text.replace(' ', '   ')} " for text in texts]
+        lengths = np.fromiter(map(len, padded), dtype=np.int64, count=len(padded))
+        chars = np.frombuffer("".join(padded).encode("ascii"), dtype=np.uint8).astype(np.int64)
+        owner = np.repeat(np.arange(len(texts), dtype=np.int64), lengths)
+        grams = chars[:-2] << 16 | chars[1:-1] << 8 | chars[2:]
+        space = ord(" ")
+        keep = (owner[:-2] == owner[2:]) & ~((chars[1:-1] == space) & (chars[2:] == space))
+
+        # One sorted key per distinct (gram, term) pair, grouped by gram; sorted
+        # and compared with the neighbour, as np.unique hashes and is far slower
+        pairs = np.sort(grams[keep] << 32 | owner[:-2][keep])
+        pairs = pairs[np.concatenate(([True], pairs[1:] != pairs[:-1]))]
+        pair_grams, pair_terms = pairs >> 32, (pairs & 0xFFFFFFFF).astype(np.int32)
+        bounds = np.flatnonzero(np.diff(pair_grams)) + 1
+        starts = np.concatenate(([0], bounds))
+        stops = np.concatenate((bounds, [len(pairs)]))
+        return {int(gram).to_bytes(3, "big").decode("ascii"): pair_terms[start:stop]
+                for gram, start, stop in zip(pair_grams[starts].tolist(), starts.tolist(), stops.tolist())}
+
+    def _fuzzy_terms(self, query: str) -> np.ndarray:
+        """Return terms sharing enough trigrams with the query, best first."""
+        grams = trigrams(query)
+        lists = [self.postings[gram] for gram in grams if gram in self.postings]
+        need = int(np.ceil(MIN_SIMILARITY * len(grams)))
+        if len(query) < 3 or len(lists) < need:
+            return np.empty(0, dtype=np.int32)
+
+        overlap = np.bincount(np.concatenate(lists), minlength=len(self.term_text))
+        ids = np.flatnonzero(overlap >= need)
+        overlap = overlap[ids]
+
+        # Weight by field, then prefer shorter values (fewer unmatched characters)
+        scores = overlap / len(grams) * self.term_weight[ids]
+        return ids[np.lexsort((self.term_length[ids], -scores))]
+
+    def _candidate_terms(self, query: str) -> Iterator[np.ndarray]:
+        """Yield batches of matching terms, in ranking order."""
+        upper = query + "\uffff"
+        for keys, terms in self.prefix_tiers:
+            lo = np.searchsorted(keys, query, side="left")
+            hi = np.searchsorted(keys, upper, side="left")
+            for start in range(lo, hi, 256):
+                yield terms[start:min(start + 256, hi)]
+        yield self._fuzzy_terms(query)
+
+    def search(self, query: str, limit: int = 20,
+               allowed: Optional[np.ndarray] = None) -> List[int]:
+        """
+        Return up to `limit` row positions matching `query`, best first.
+
+        Args:
+            query (str): Free text to match against name, address and city
+            limit (int): Maximum number of rows to return
+            allowed (np.ndarray): Optional boolean mask of rows that may be returned
+
+        Returns:
+            list: Row positions into the indexed frame
+        """
+        query = normalize(query)
+        if not query:
+            return self.browse(limit, allowed)
+
+        results: List[int] = []
+        seen = set()
+        for batch in self._candidate_terms(query):
+            for term in batch.tolist():
+                rows = self.row_ids[self.row_ptr[term]:self.row_ptr[term + 1]]
+                if allowed is not None:
+                    rows = rows[allowed[rows]]
+                for row in rows[:limit].tolist():
+                    if row not in seen:
+                        seen.add(row)
+                        results.append(row)
+                        if len(results) >= limit:
+                            return results
+        return results
+
+    def browse(self, limit: int = 20, allowed: Optional[np.ndarray] = None) -> List[int]:
+        """Return the first `limit` rows in park-name order."""
+        rows = self.name_order
+        if allowed is not None:
+            rows = rows[allowed[rows]]
+        return rows[:limit].tolist()
+
+
+@lru_cache(maxsize=2)
+def _cached_index(path: str, mtime: Optional[float]) -> ParkSearchIndex:
+    return ParkSearchIndex(load_parks(path))
+
+
+def get_index(path: str = PARKS_CSV) -> ParkSearchIndex:
+    """Return the search index for the parks dataset, rebuilding it if the file changed."""
+    mtime = os.path.getmtime(path) if os.path.exists(path) else None
+    return _cached_index(path, mtime)
+
+
+if __name__ == "__main__":
+    import sys
+
+    start = time.perf_counter()
+    index = get_index()
+    print(f"Indexed {index.size} parks in {(time.perf_counter() - start) * 1000:.1f} ms")
+    df = load_parks()
+    for query in sys.argv[1:] or ["almaden", "stevns crek", "san jos", "1250 dell"]:
+        start = time.perf_counter()
+        rows = index.search(query, limit=5)
+        elapsed = (time.perf_counter() - start) * 1000
+        names = ", ".join(str(df["park name"].iloc[row]) for row in rows)
+        print(f"{query!r} ({elapsed:.3f} ms): {names}")
@@ -0,0 +1,256 @@
+import heapq
+import math
+import os
+import time
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import geocode_index
+from parks_data import PARKS_CSV, load_parks
+
+EARTH_RADIUS_MILES = 3958.8
+
+
+def to_unit_vectors(lat, lng) -> np.ndarray:
+    """Convert degrees of latitude/longitude to points on the unit sphere."""
+    lat = np.radians(np.asarray(lat, dtype=float))
+    lng = np.radians(np.asarray(lng, dtype=float))
+    cos_lat = np.cos(lat)
+    return np.stack([cos_lat * np.cos(lng), cos_lat * np.sin(lng), np.sin(lat)], axis=-1)
+
+
+def miles_to_chord(miles: float) -> float:
+    """Straight-line distance through the unit sphere for a great-circle distance."""
+    return 2 * math.sin(min(miles / EARTH_RADIUS_MILES, math.pi) / 2)
+
+
+def chord_to_miles(chord):
+    """Great-circle (haversine) distance in miles for a unit-sphere chord length."""
+    return 2 * np.arcsin(np.clip(np.asarray(chord) / 2, 0, 1)) * EARTH_RADIUS_MILES
+
+
+class SpatialIndex:
+    """
+    KD-tree over park locations for nearest-neighbour and radius queries.
+
+    Points are stored as 3D unit vectors, where straight-line (chord) distance
+    orders points exactly like great-circle distance, so the tree can prune
+    with plain bounding boxes and results are converted to haversine miles at
+    the end. Leaves hold up to `leaf_size` points and are scanned with numpy.
+    """
+
+    def __init__(self, lat, lng, rows=None, leaf_size: int = 32):
+        points = to_unit_vectors(lat, lng).reshape(-1, 3)
+        rows = np.arange(len(points)) if rows is None else np.asarray(rows)
+        order = np.arange(len(points))
+
+        # Each node covers order[start:end]; children are None for leaves
+        self.node_start: List[int] = []
+        self.node_end: List[int] = []
+        self.node_children: List[Optional[Tuple[int, int]]] = []
+        self.node_lo: List[Tuple[float, float, float]] = []
+        self.node_hi: List[Tuple[float, float, float]] = []
+
+        if len(points):
+            self._build(points, order, leaf_size)
+        self.points = points[order]
+        self.rows = rows[order]
+
+    def _build(self, points: np.ndarray, order: np.ndarray, leaf_size: int) -> None:
+        stack = [(0, len(points), self._add_node(0, len(points)))]
+        while stack:
+            start, end, node = stack.pop()
+            block = points[order[start:end]]
+            lo, hi = block.min(axis=0), block.max(axis=0)
+            self.node_lo[node] = tuple(lo.tolist())
+            self.node_hi[node] = tuple(hi.tolist())
+            if end - start <= leaf_size:
+                continue
+
+            # Split at the median of the widest axis
+            axis = int(np.argmax(hi - lo))
+            mid = (start + end) // 2
+            segment = order[start:end]
+            order[start:end] = segment[np.argpartition(block[:, axis], mid - start)]
+            left, right = self._add_node(start, mid), self._add_node(mid, end)
+            self.node_children[node] = (left, right)
+            stack.append((start, mid, left))
+            stack.append((mid, end, right))
+
+    def _add_node(self, start: int, end: int) -> int:
+        self.node_start.append(start)
+        self.node_end.append(end)
+        self.node_children.append(None)
+        self.node_lo.append((0.0, 0.0, 0.0))
+        self.node_hi.append((0.0, 0.0, 0.0))
+        return len(self.node_start) - 1
+
+    def _box_distance(self, node: int, q: Tuple[float, float, float]) -> Tuple[float, float]:
+        """Squared min and max chord distance from q to a node's bounding box."""
+        lo, hi = self.node_lo[node], self.node_hi[node]
+        near = far = 0.0
+        for i in range(3):
+            below, above = lo[i] - q[i], q[i] - hi[i]
+            gap = below if below > 0 else (above if above > 0 else 0.0)
+            near += gap * gap
+            span = max(abs(q[i] - lo[i]), abs(q[i] - hi[i]))
+            far += span * span
+        return near, far
+
+    def within(self, lat: float, lng: float, miles: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the rows within `miles` of a point, nearest first.
+
+        Returns:
+            tuple: (row positions, distances in miles)
+        """
+        if not self.node_start:
+            return np.empty(0, dtype=int), np.empty(0)
+        q_vec = to_unit_vectors(lat, lng)
+        q = tuple(q_vec.tolist())
+        radius2 = miles_to_chord(miles) ** 2
+
+        slices = []
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            near, far = self._box_distance(node, q)
+            if near > radius2:
+                continue
+            start, end = self.node_start[node], self.node_end[node]
+            children = self.node_children[node]
+            if far <= radius2 or children is None:
+                slices.append(np.arange(start, end))
+            else:
+                stack.extend(children)
+
+        if not slices:
+            return np.empty(0, dtype=int), np.empty(0)
+        candidates = np.concatenate(slices)
+        d2 = ((self.points[candidates] - q_vec) ** 2).sum(axis=1)
+        keep = d2 <= radius2
+        candidates, d2 = candidates[keep], d2[keep]
+        order = np.argsort(d2, kind="stable")
+        return self.rows[candidates[order]], chord_to_miles(np.sqrt(d2[order]))
+
+    def nearest(self, lat: float, lng: float, k: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the `k` rows nearest to a point, nearest first.
+
+        Returns:
+            tuple: (row positions, distances in miles)
+        """
+        if not self.node_start or k <= 0:
+            return np.empty(0, dtype=int), np.empty(0)
+        q_vec = to_unit_vectors(lat, lng)
+        q = tuple(q_vec.tolist())
+
+        best_idx = np.empty(0, dtype=int)
+        best_d2 = np.empty(0)
+        kth = math.inf
+        heap = [(self._box_distance(0, q)[0], 0)]
+        while heap:
+            near, node = heapq.heappop(heap)
+            if near > kth:
+                break
+            children = self.node_children[node]
+            if children is not None:
+                for child in children:
+                    child_near = self._box_distance(child, q)[0]
+                    if child_near <= kth:
+                        heapq.heappush(heap, (child_near, child))
+                continue
+
+            # Leaf: merge its points into the running best k
+            start, end = self.node_start[node], self.node_end[node]
+            d2 = ((self.points[start:end] - q_vec) ** 2).sum(axis=1)
+            best_idx = np.concatenate([best_idx, np.arange(start, end)])
+            best_d2 = np.concatenate([best_d2, d2])
+            if len(best_d2) > k:
+                keep = np.argpartition(best_d2, k - 1)[:k]
+                best_idx, best_d2 = best_idx[keep], best_d2[keep]
+            if len(best_d2) == k:
+                kth = best_d2.max()
+
+        order = np.argsort(best_d2, kind="stable")
+        return self.rows[best_idx[order]], chord_to_miles(np.sqrt(best_d2[order]))
+
+
+@lru_cache(maxsize=2)
+def _cached_index(path: str, mtime: Optional[float], coordinates_mtime: float) -> SpatialIndex:
+    df = load_parks(path)
+    coordinates = geocode_index.get_coordinates()
+    rows, lats, lngs = [], [], []
+    for row, objectid in enumerate(df["objectid"].tolist()):
+        coordinate = coordinates.get(objectid)
+        if coordinate is not None:
+            rows.append(row)
+            lats.append(coordinate.lat)
+            lngs.append(coordinate.lng)
+    return SpatialIndex(lats, lngs, rows)
+
+
+def get_index(path: str = PARKS_CSV) -> SpatialIndex:
+    """
+    Return the spatial index over geocoded parks (see geocode_index.py).
+
+    Row positions refer to `load_parks(path)`. The index is rebuilt when the
+    parks file or the coordinate table changes; parks without coordinates are
+    left out.
+    """
+    mtime = os.path.getmtime(path) if os.path.exists(path) else None
+    coordinates_path = geocode_index.COORDINATES_CSV
+    geocode_index.ensure_table(coordinates_path)
+    coordinates_mtime = os.path.getmtime(coordinates_path) if os.path.exists(coordinates_path) else 0.0
+    return _cached_index(path, mtime, coordinates_mtime)
+
+
+def zip_code_location(df: pd.DataFrame, zip_code) -> Optional[Tuple[float, float]]:
+    """
+    Approximate a ZIP code's location as the centre of the geocoded parks in it.
+
+    Only real address geocodes count; estimated and fallback positions are
+    left out. Returns None if no such park carries that ZIP code.
+    """
+    try:
+        zip_code = int(str(zip_code).strip()[:5])
+    except ValueError:
+        return None
+    coordinates = geocode_index.get_coordinates()
+    points = [coordinates[objectid] for objectid in df.loc[df["zip code"] == zip_code, "objectid"].tolist()
+              if objectid in coordinates and coordinates[objectid].exact]
+    if not points:
+        return None
+    return (sum(point.lat for point in points) / len(points),
+            sum(point.lng for point in points) / len(points))
+
+
+def resolve_location(df: pd.DataFrame, text: str) -> Optional[Tuple[float, float]]:
+    """Parse a "lat, lng" pair or a ZIP code into a point, or None if unrecognised."""
+    text = text.strip()
+    if "," in text:
+        try:
+            lat, lng = (float(part) for part in text.split(",", 1))
+        except ValueError:
+            return None
+        if -90 <= lat <= 90 and -180 <= lng <= 180:
+            return lat, lng
+        return None
+    return zip_code_location(df, text)
+
+
+if __name__ == "__main__":
+    # Quick latency check on random points across California
+    rng = np.random.default_rng(0)
+    n = 200_000
+    index = SpatialIndex(rng.uniform(32.5, 42.0, n), rng.uniform(-124.4, -114.1, n))
+    queries = list(zip(rng.uniform(33, 41, 200), rng.uniform(-123, -115, 200)))
+    for name, query in [("nearest(k=10)", lambda lat, lng: index.nearest(lat, lng, 10)),
+                        ("within(5 mi)", lambda lat, lng: index.within(lat, lng, 5))]:
+        start = time.perf_counter()
+        for lat, lng in queries:
+            query(lat, lng)
+        print(f"{name}: {(time.perf_counter() - start) / len(queries) * 1000:.3f} ms per query over {n:,} parks")
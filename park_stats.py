@@ -0,0 +1,163 @@
+import os
+import time
+from functools import lru_cache
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from parks_data import PARKS_CSV, load_parks
+
+DIMENSIONS = ["city", "status", "suffix"]
+
+# Metric columns and their display names
+METRICS = {
+    "acres": "Acres",
+    "shape__area": "Shape Area",
+    "shape__length": "Shape Length",
+}
+
+PERCENTILES = (25, 50, 75, 90)
+
+# Histogram bins per cell, used to estimate percentiles of any roll-up
+N_BINS = 256
+
+
+def summarize(values) -> Dict[str, float]:
+    """Exact statistics for an arbitrary set of values (e.g. a distance filter)."""
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+    stats = {"count": len(values), "sum": float(values.sum())}
+    if len(values) == 0:
+        stats.update({"mean": np.nan, "min": np.nan, "max": np.nan})
+        stats.update({f"p{p}": np.nan for p in PERCENTILES})
+        return stats
+    stats.update({"mean": float(values.mean()), "min": float(values.min()), "max": float(values.max())})
+    stats.update({f"p{p}": float(np.percentile(values, p)) for p in PERCENTILES})
+    return stats
+
+
+class AggregateCube:
+    """
+    Pre-aggregated statistics per City x Status x Suffix cell.
+
+    Each cell stores, for every metric, its count, sum, min, max and a
+    histogram over shared equi-depth bins. A query selects the matching cells
+    and rolls them up, so its cost depends on the number of cells, not rows.
+    Count, sum, mean, min and max are exact; percentiles are interpolated
+    within one histogram bin (about 1/256 of the data).
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.rows = len(df)
+        codes = []
+        self.members: Dict[str, list] = {}
+        for dim in DIMENSIONS:
+            column = df[dim]
+            if not isinstance(column.dtype, pd.CategoricalDtype):
+                column = column.astype("category")
+            self.members[dim] = list(column.cat.categories)
+            codes.append(column.cat.codes.to_numpy().astype(np.int32))
+
+        # One cell per combination that actually occurs; missing values get code -1
+        cells, inverse = np.unique(np.stack(codes, axis=1), axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        self.cell_codes = cells
+        n_cells = len(cells)
+
+        self.count: Dict[str, np.ndarray] = {}
+        self.sum: Dict[str, np.ndarray] = {}
+        self.min: Dict[str, np.ndarray] = {}
+        self.max: Dict[str, np.ndarray] = {}
+        self.edges: Dict[str, np.ndarray] = {}
+        self.hist: Dict[str, np.ndarray] = {}
+        for metric in METRICS:
+            values = df[metric].to_numpy(dtype=float, na_value=np.nan)
+            valid = ~np.isnan(values)
+            cell, values = inverse[valid], values[valid]
+
+            self.count[metric] = np.bincount(cell, minlength=n_cells)
+            self.sum[metric] = np.bincount(cell, weights=values, minlength=n_cells)
+            self.min[metric] = np.full(n_cells, np.inf)
+            self.max[metric] = np.full(n_cells, -np.inf)
+            np.minimum.at(self.min[metric], cell, values)
+            np.maximum.at(self.max[metric], cell, values)
+
+            # Equi-depth bins give even percentile resolution whatever the distribution
+            if len(values):
+                edges = np.unique(np.quantile(values, np.linspace(0, 1, N_BINS + 1)))
+            else:
+                edges = np.array([0.0, 1.0])
+            if len(edges) == 1:
+                edges = np.array([edges[0], edges[0]])
+            bins = np.clip(np.searchsorted(edges, values, side="right") - 1, 0, len(edges) - 2)
+            n_bins = len(edges) - 1
+            self.edges[metric] = edges
+            self.hist[metric] = np.bincount(cell * n_bins + bins,
+                                            minlength=n_cells * n_bins).reshape(n_cells, n_bins)
+
+    def _cell_mask(self, **filters: Optional[Iterable]) -> np.ndarray:
+        mask = np.ones(len(self.cell_codes), dtype=bool)
+        for i, dim in enumerate(DIMENSIONS):
+            selected = filters.get(dim)
+            if not selected:
+                continue
+            wanted = [self.members[dim].index(value) for value in selected
+                      if value in self.members[dim]]
+            mask &= np.isin(self.cell_codes[:, i], wanted)
+        return mask
+
+    def query(self, metric: str, city: Optional[Iterable] = None,
+              status: Optional[Iterable] = None, suffix: Optional[Iterable] = None) -> Dict[str, float]:
+        """
+        Statistics of `metric` over the rows matching every given filter.
+
+        Each filter is a collection of allowed values; None or empty means no
+        filter on that dimension.
+        """
+        mask = self._cell_mask(city=city, status=status, suffix=suffix)
+        count = int(self.count[metric][mask].sum())
+        total = float(self.sum[metric][mask].sum())
+        stats = {"count": count, "sum": total}
+        if count == 0:
+            stats.update({"mean": np.nan, "min": np.nan, "max": np.nan})
+            stats.update({f"p{p}": np.nan for p in PERCENTILES})
+            return stats
+
+        low, high = float(self.min[metric][mask].min()), float(self.max[metric][mask].max())
+        stats.update({"mean": total / count, "min": low, "max": high})
+
+        hist = self.hist[metric][mask].sum(axis=0)
+        cumulative = np.cumsum(hist)
+        edges = self.edges[metric]
+        for p in PERCENTILES:
+            rank = p / 100 * count
+            b = int(np.searchsorted(cumulative, rank, side="left"))
+            b = min(b, len(hist) - 1)
+            before = cumulative[b - 1] if b > 0 else 0
+            fraction = (rank - before) / hist[b] if hist[b] else 0.0
+            estimate = edges[b] + fraction * (edges[b + 1] - edges[b])
+            stats[f"p{p}"] = float(min(max(estimate, low), high))
+        return stats
+
+
+@lru_cache(maxsize=2)
+def _cached_cube(path: str, mtime: Optional[float]) -> AggregateCube:
+    return AggregateCube(load_parks(path))
+
+
+def get_cube(path: str = PARKS_CSV) -> AggregateCube:
+    """Return the aggregate cube for the parks dataset, rebuilding it if the file changed."""
+    mtime = os.path.getmtime(path) if os.path.exists(path) else None
+    return _cached_cube(path, mtime)
+
+
+if __name__ == "__main__":
+    cube = get_cube()
+    print(f"{len(cube.cell_codes)} cells over {cube.rows} parks")
+    for metric, label in METRICS.items():
+        start = time.perf_counter()
+        stats = cube.query(metric, status=["open"])
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"{label} (open parks, {elapsed:.3f} ms): "
+              + ", ".join(f"{name}={value:,.1f}" for name, value in stats.items()))
@@ -0,0 +1,98 @@
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+
+import perf_trace
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+PARKS_CSV = os.path.join(APP_DIR, "Parks.csv")
+
+# Views handed to pages share memory with the cached frame; copy-on-write makes
+# any edit a page makes land on its own copy instead of the shared data.
+# (Always on from pandas 3.0.)
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
+# Expected columns (after normalizing names to lower case) and their dtypes
+SCHEMA = {
+    "objectid": "Int64",
+    "park name": "category",
+    "address": "category",
+    "city": "category",
+    "zip code": "Int64",
+    "status": "category",
+    "suffix": "category",
+    "acres": "float64",
+    "created_date": "datetime64[ns, UTC]",
+    "shape__area": "float64",
+    "shape__length": "float64",
+}
+
+CREATED_DATE_FORMAT = "%m/%d/%Y %I:%M:%S %p %z"
+
+
+class SchemaError(ValueError):
+    """Raised when the parks CSV does not have the expected columns."""
+
+
+def parse_parks(df: pd.DataFrame) -> pd.DataFrame:
+    """Normalize column names and convert a raw parks frame to the typed schema."""
+    df = df.copy()
+    df.columns = df.columns.str.strip().str.lower()
+
+    missing = [column for column in SCHEMA if column not in df.columns]
+    if missing:
+        raise SchemaError(f"Parks data is missing columns: {', '.join(missing)}")
+
+    # ZIP+4 values such as "95035-5439" keep only the five-digit ZIP
+    zip_codes = df["zip code"].astype("string").str.extract(r"^\s*(\d{5})", expand=False)
+    df["zip code"] = pd.to_numeric(zip_codes).astype("Int64")
+    df["objectid"] = pd.to_numeric(df["objectid"]).astype("Int64")
+    df["created_date"] = pd.to_datetime(df["created_date"], format=CREATED_DATE_FORMAT, utc=True)
+    df["created_date"] = df["created_date"].astype(SCHEMA["created_date"])
+    for column, dtype in SCHEMA.items():
+        if column not in ("zip code", "objectid", "created_date"):
+            df[column] = df[column].astype(dtype)
+
+    if df["objectid"].isna().any():
+        raise SchemaError("Parks data has rows without an OBJECTID")
+    if df["objectid"].duplicated().any():
+        raise SchemaError("Parks data has duplicate OBJECTIDs")
+    return df
+
+
+_lock = threading.Lock()
+_frames: Dict[str, Tuple[Optional[float], pd.DataFrame]] = {}
+
+
+def load_parks(path: str = PARKS_CSV) -> pd.DataFrame:
+    """
+    Return the typed parks dataset, parsing the CSV at most once per file version.
+
+    Every caller gets a shallow view of one shared frame, so reruns and new
+    sessions do not re-read the file or grow memory. The frame is re-parsed
+    when the file's modification time changes.
+
+    If an up-to-date columnar snapshot of the file exists (see
+    parks_snapshot.py) it is memory-mapped instead of parsing the CSV.
+    """
+    # Imported here because parks_snapshot builds on this module
+    import parks_snapshot
+
+    path = os.path.abspath(path)
+    mtime = os.path.getmtime(path) if os.path.exists(path) else None
+    with perf_trace.span("parks.load", source="memory") as span, _lock:
+        cached = _frames.get(path)
+        if cached is None or cached[0] != mtime:
+            if parks_snapshot.is_fresh(path):
+                span.attrs["source"] = "snapshot"
+                frame = parks_snapshot.load_snapshot(parks_snapshot.snapshot_dir_for(path))
+            else:
+                span.attrs.update(source="csv", bytes_in=os.path.getsize(path))
+                frame = parse_parks(pd.read_csv(path, dtype={"Zip Code": str}))
+            cached = (mtime, frame)
+            _frames[path] = cached
+        span.attrs["rows"] = len(cached[1])
+    return cached[1].copy(deep=False)
@@ -0,0 +1,204 @@
+import argparse
+import datetime
+import json
+import os
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+import geocode_index
+import parks_data
+import parks_snapshot
+from parks_data import PARKS_CSV
+from response_cache import CACHE_DIR
+
+CHANGES_DIR = os.path.join(CACHE_DIR, "changes")
+
+# Columns a park's geocoding query is built from (see geocode_index.address_query)
+GEOCODE_COLUMNS = ("address", "city", "zip code")
+
+
+class ChangeSet(NamedTuple):
+    """What an ingest changed, by OBJECTID."""
+    added: List[int]
+    changed: Dict[int, List[str]]
+    deleted: List[int]
+    rows: int
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.changed or self.deleted)
+
+    def regeocode(self) -> List[int]:
+        """Parks whose coordinates must be resolved again: new ones and moved ones."""
+        moved = [objectid for objectid, columns in self.changed.items()
+                 if any(column in GEOCODE_COLUMNS for column in columns)]
+        return self.added + moved
+
+    def resummarize(self) -> List[int]:
+        """Parks whose AI summary is missing or out of date; it covers every column."""
+        return self.added + list(self.changed)
+
+    def to_dict(self) -> dict:
+        return {"added": self.added, "changed": {str(k): v for k, v in self.changed.items()},
+                "deleted": self.deleted, "rows": self.rows,
+                "regeocode": self.regeocode(), "resummarize": self.resummarize()}
+
+
+def row_hashes(df: pd.DataFrame) -> pd.Series:
+    """64-bit content hash of each typed park row, indexed by OBJECTID."""
+    hashes = pd.util.hash_pandas_object(df, index=False)
+    hashes.index = pd.Index(df["objectid"].to_numpy(np.int64), name="objectid")
+    return hashes
+
+
+def _same(a, b) -> bool:
+    if pd.isna(a) or pd.isna(b):
+        return bool(pd.isna(a) and pd.isna(b))
+    return bool(a == b)
+
+
+def diff(current: pd.DataFrame, new: pd.DataFrame) -> ChangeSet:
+    """
+    Compare two typed parks frames by OBJECTID and row hash.
+
+    Only rows whose hash differs are compared column by column, to record
+    which columns changed. Columns missing from `current` count as changed.
+    """
+    current = current.reindex(columns=new.columns)
+    old_hashes, new_hashes = row_hashes(current), row_hashes(new)
+    old_ids, new_ids = old_hashes.index, new_hashes.index
+
+    added = new_ids[~new_ids.isin(old_ids)].tolist()
+    deleted = old_ids[~old_ids.isin(new_ids)].tolist()
+    common = new_ids[new_ids.isin(old_ids)]
+    differs = common[old_hashes.loc[common].to_numpy() != new_hashes.loc[common].to_numpy()]
+
+    changed = {}
+    if len(differs):
+        old_rows = current.set_axis(old_ids).loc[differs]
+        new_rows = new.set_axis(new_ids).loc[differs]
+        for objectid in differs:
+            old_row, new_row = old_rows.loc[objectid], new_rows.loc[objectid]
+            changed[int(objectid)] = [column for column in new.columns
+                                      if not _same(old_row[column], new_row[column])]
+    return ChangeSet(added, changed, deleted, len(new))
+
+
+def _replace_csv(raw: pd.DataFrame, path: str) -> None:
+    tmp_path = f"{path}.tmp"
+    raw.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def save_change_set(changes: ChangeSet, source: str, out_dir: str = CHANGES_DIR) -> str:
+    """Write a change set as JSON for tools that maintain derived data; returns its path."""
+    os.makedirs(out_dir, exist_ok=True)
+    created = datetime.datetime.now(datetime.timezone.utc)
+    path = os.path.join(out_dir, f"{created.strftime('%Y%m%dT%H%M%S')}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"created": created.isoformat(timespec="seconds"), "source": os.path.abspath(source),
+                   **changes.to_dict()}, f, indent=2)
+    return path
+
+
+def ingest(export_path: str, parks_csv: str = PARKS_CSV, snapshot_dir: Optional[str] = None,
+           dry_run: bool = False) -> ChangeSet:
+    """
+    Bring the stored parks data up to date with a full county export.
+
+    The export is diffed against the current dataset. If anything changed,
+    the export becomes the new parks CSV, with the export's own text for
+    every row. Surviving parks are written first, in their current order,
+    and new parks follow. The columnar snapshot is then rewritten from the
+    same rows.
+
+    Row positions are still not stable: a deleted park shifts every row
+    after it. Nothing depends on them across an ingest. Derived data is
+    keyed by OBJECTID, and the indexes that hand out positions (search,
+    spatial, table) rebuild when the file's modification time changes.
+
+    If nothing changed, no file is touched, so caches keyed on the files'
+    modification times stay valid.
+    """
+    # Typed rows parsed exactly as load_parks parses the CSV, so unchanged rows hash the same
+    new = parks_data.parse_parks(pd.read_csv(export_path, dtype={"Zip Code": str}))
+    if os.path.exists(parks_csv):
+        current = parks_data.load_parks(parks_csv)
+    else:
+        current = new.iloc[:0]
+    changes = diff(current, new)
+    if dry_run or not changes:
+        return changes
+
+    # Surviving parks keep their relative order and new ones follow in export order
+    position = {objectid: i for i, objectid in enumerate(current["objectid"].tolist())}
+    new_ids = new["objectid"].tolist()
+    keys = [position.get(objectid, len(position) + i) for i, objectid in enumerate(new_ids)]
+    order = np.argsort(keys, kind="stable")
+
+    raw = pd.read_csv(export_path, dtype=str, keep_default_na=False)
+    _replace_csv(raw.iloc[order], parks_csv)
+    parks_snapshot.write_snapshot(new.iloc[order].reset_index(drop=True),
+                                  snapshot_dir or parks_snapshot.snapshot_dir_for(parks_csv), source=parks_csv)
+    return changes
+
+
+def update_derived(changes: ChangeSet, coordinates_csv: str = geocode_index.COORDINATES_CSV) -> dict:
+    """
+    Invalidate derived data for the changed parks only.
+
+    Coordinates of new, moved and deleted parks are dropped, so the next
+    `python geocode_index.py` resolves just those. Summaries of deleted
+    parks are pruned. Stored summaries are keyed by row hash, so changed
+    parks are picked up by the next `python trail_summary.py`. The search,
+    spatial, statistics and retrieval indexes rebuild in process because
+    the files' modification times changed.
+    """
+    import trail_summary
+
+    counts = {"coordinates_dropped": geocode_index.forget(changes.regeocode() + changes.deleted, coordinates_csv)}
+    counts["summaries_pruned"] = 0
+    if changes.deleted:
+        store = trail_summary.get_store()
+        deleted = set(changes.deleted)
+        counts["summaries_pruned"] = store.prune([objectid for objectid in store.hashes()
+                                                  if objectid not in deleted])
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply a new county parks export incrementally.")
+    parser.add_argument("export", help="Full parks export (CSV, same columns as Parks.csv)")
+    parser.add_argument("--parks", default=PARKS_CSV, help="Current parks CSV to update")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would change")
+    parser.add_argument("--geocode", choices=["local", "google"],
+                        help="Also geocode new and moved parks with this geocoder")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    changes = ingest(args.export, args.parks, dry_run=args.dry_run)
+    print(f"{len(changes.added)} added, {len(changes.changed)} changed, {len(changes.deleted)} deleted "
+          f"({changes.rows} parks, {time.perf_counter() - start:.2f}s)")
+    for objectid, columns in list(changes.changed.items())[:20]:
+        print(f"  OBJECTID {objectid}: {', '.join(columns)}")
+    if args.dry_run or not changes:
+        return
+
+    print(f"Change set written to {save_change_set(changes, args.export)}")
+    counts = update_derived(changes)
+    print(f"Dropped {counts['coordinates_dropped']} coordinates and {counts['summaries_pruned']} summaries")
+    if args.geocode:
+        geocoder = (geocode_index.LocalGeocoder() if args.geocode == "local"
+                    else geocode_index.GoogleGeocoder(os.environ["GOOGLE_MAPS_API_KEY"]))
+        geocode_index.build_index(args.parks, geocoder=geocoder)
+        print(f"Geocoded {len(changes.regeocode())} parks")
+    elif changes.regeocode():
+        print(f"Run `python geocode_index.py` to geocode {len(changes.regeocode())} new or moved parks")
+    if changes.resummarize():
+        print(f"Run `python trail_summary.py` to summarize {len(changes.resummarize())} new or changed parks")
+
+
+if __name__ == "__main__":
+    main()
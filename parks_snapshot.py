@@ -0,0 +1,217 @@
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+import parks_data
+from response_cache import CACHE_DIR
+
+SNAPSHOT_ROOT = os.path.join(CACHE_DIR, "snapshots")
+MANIFEST = "manifest.json"
+FORMAT_VERSION = 1
+
+
+def snapshot_dir_for(csv_path: str) -> str:
+    """Return the default snapshot directory for a parks CSV."""
+    name = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(SNAPSHOT_ROOT, name)
+
+
+def _codes_dtype(n_categories: int):
+    # Match the code width pandas itself would pick, so loading does not copy
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_categories < np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def write_snapshot(df: pd.DataFrame, out_dir: str, source: Optional[str] = None) -> None:
+    """
+    Write a typed parks frame as one .npy file per column plus a manifest.
+
+    Categorical columns are dictionary encoded (integer codes + a JSON list of
+    values), nullable integers get a separate boolean mask, and timestamps are
+    stored as int64 nanoseconds. The snapshot is written to a temporary
+    directory and swapped in, so readers never see a half-written one.
+    """
+    parent = os.path.dirname(os.path.abspath(out_dir))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=parent, prefix=".snapshot-")
+
+    columns = []
+    for i, name in enumerate(df.columns):
+        series = df[name]
+        entry = {"name": name, "file": f"col{i:02d}.npy"}
+        path = os.path.join(tmp_dir, entry["file"])
+
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            categories = [str(value) for value in series.cat.categories]
+            entry["kind"] = "category"
+            entry["dictionary"] = f"col{i:02d}.dict.json"
+            np.save(path, series.cat.codes.to_numpy().astype(_codes_dtype(len(categories))))
+            with open(os.path.join(tmp_dir, entry["dictionary"]), "w", encoding="utf-8") as f:
+                json.dump(categories, f)
+        elif isinstance(series.dtype, pd.DatetimeTZDtype):
+            entry["kind"] = "datetime"
+            entry["tz"] = str(series.dt.tz)
+            np.save(path, series.dt.tz_convert("UTC").dt.tz_localize(None)
+                    .to_numpy("datetime64[ns]").view(np.int64))
+        elif isinstance(series.dtype, pd.Int64Dtype):
+            entry["kind"] = "Int64"
+            entry["mask"] = f"col{i:02d}.mask.npy"
+            np.save(path, series.fillna(0).to_numpy(np.int64))
+            np.save(os.path.join(tmp_dir, entry["mask"]), series.isna().to_numpy())
+        elif pd.api.types.is_numeric_dtype(series.dtype):
+            entry["kind"] = "numeric"
+            np.save(path, series.to_numpy())
+        else:
+            raise TypeError(f"Cannot snapshot column {name!r} with dtype {series.dtype}")
+        columns.append(entry)
+
+    manifest = {"format": FORMAT_VERSION, "rows": len(df), "columns": columns}
+    if source is not None:
+        stat = os.stat(source)
+        manifest["source"] = {"path": os.path.abspath(source), "size": stat.st_size,
+                              "mtime": stat.st_mtime}
+    with open(os.path.join(tmp_dir, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    # Readers that already mapped the old files keep their (unlinked) copies
+    if os.path.exists(out_dir):
+        shutil.rmtree(out_dir)
+    os.replace(tmp_dir, out_dir)
+
+
+def build_snapshot(csv_path: str = parks_data.PARKS_CSV, out_dir: Optional[str] = None) -> str:
+    """Parse a parks CSV and write its snapshot, returning the snapshot directory."""
+    out_dir = out_dir or snapshot_dir_for(csv_path)
+    df = parks_data.parse_parks(pd.read_csv(csv_path, dtype={"Zip Code": str}))
+    write_snapshot(df, out_dir, source=csv_path)
+    return out_dir
+
+
+def read_manifest(snapshot_dir: str) -> Optional[dict]:
+    path = os.path.join(snapshot_dir, MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def is_fresh(csv_path: str, snapshot_dir: Optional[str] = None) -> bool:
+    """True if a snapshot exists and was built from the current version of the CSV."""
+    manifest = read_manifest(snapshot_dir or snapshot_dir_for(csv_path))
+    if manifest is None or manifest.get("format") != FORMAT_VERSION:
+        return False
+    if not os.path.exists(csv_path):
+        return True
+    source = manifest.get("source", {})
+    stat = os.stat(csv_path)
+    return source.get("size") == stat.st_size and source.get("mtime") == stat.st_mtime
+
+
+def load_snapshot(snapshot_dir: str) -> pd.DataFrame:
+    """
+    Memory-map a snapshot as a DataFrame.
+
+    Numeric, nullable-integer and categorical-code columns are backed directly
+    by read-only maps of the .npy files, so worker processes share the same
+    physical pages through the OS cache. Timestamps are converted to their
+    time zone, which makes one private copy of that column.
+    """
+    manifest = read_manifest(snapshot_dir)
+    if manifest is None:
+        raise FileNotFoundError(f"No parks snapshot in {snapshot_dir}")
+
+    data = {}
+    for entry in manifest["columns"]:
+        values = np.load(os.path.join(snapshot_dir, entry["file"]), mmap_mode="r")
+        kind = entry["kind"]
+        if kind == "category":
+            with open(os.path.join(snapshot_dir, entry["dictionary"]), encoding="utf-8") as f:
+                categories = json.load(f)
+            data[entry["name"]] = pd.Categorical.from_codes(
+                values, dtype=pd.CategoricalDtype(categories)
+            )
+        elif kind == "datetime":
+            data[entry["name"]] = pd.DatetimeIndex(values.view("datetime64[ns]")).tz_localize(entry["tz"])
+        elif kind == "Int64":
+            mask = np.load(os.path.join(snapshot_dir, entry["mask"]), mmap_mode="r")
+            data[entry["name"]] = pd.arrays.IntegerArray(values, mask)
+        else:
+            data[entry["name"]] = values
+    return pd.DataFrame(data, copy=False)
+
+
+def _scaled_csv(csv_path: str, scale: int, out_path: str) -> None:
+    """Write a copy of the CSV with every row repeated `scale` times under new OBJECTIDs."""
+    df = pd.read_csv(csv_path, dtype=str)
+    big = pd.concat([df] * scale, ignore_index=True)
+    big["OBJECTID"] = np.arange(1, len(big) + 1)
+    big.to_csv(out_path, index=False)
+
+
+def _dir_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def compare(csv_path: str = parks_data.PARKS_CSV, repeat: int = 5) -> dict:
+    """Compare on-disk size and load time of the CSV path against the snapshot path."""
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot_dir = os.path.join(tmp, "snapshot")
+        build_snapshot(csv_path, snapshot_dir)
+
+        csv_times, snapshot_times = [], []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            parks_data.parse_parks(pd.read_csv(csv_path, dtype={"Zip Code": str}))
+            csv_times.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            load_snapshot(snapshot_dir)
+            snapshot_times.append(time.perf_counter() - start)
+
+        return {
+            "rows": read_manifest(snapshot_dir)["rows"],
+            "csv_bytes": os.path.getsize(csv_path),
+            "snapshot_bytes": _dir_size(snapshot_dir),
+            "csv_load_s": min(csv_times),
+            "snapshot_load_s": min(snapshot_times),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or benchmark the columnar parks snapshot.")
+    parser.add_argument("command", choices=["build", "compare"])
+    parser.add_argument("--csv", default=parks_data.PARKS_CSV, help="Parks CSV to convert")
+    parser.add_argument("--output", help="Snapshot directory (default: .cache/snapshots/<csv name>)")
+    parser.add_argument("--scale", type=int, default=1,
+                        help="compare: repeat the CSV rows this many times first")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        out_dir = build_snapshot(args.csv, args.output)
+        print(f"Wrote {read_manifest(out_dir)['rows']} rows to {out_dir}")
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = args.csv
+        if args.scale > 1:
+            csv_path = os.path.join(tmp, "Parks.csv")
+            _scaled_csv(args.csv, args.scale, csv_path)
+        result = compare(csv_path)
+
+    print(f"Rows:      {result['rows']:,}")
+    print(f"CSV:       {result['csv_bytes']:>14,} bytes  {result['csv_load_s'] * 1000:10.2f} ms")
+    print(f"Snapshot:  {result['snapshot_bytes']:>14,} bytes  {result['snapshot_load_s'] * 1000:10.2f} ms")
+    print(f"Speed-up:  {result['csv_load_s'] / result['snapshot_load_s']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,369 @@
+import argparse
+import atexit
+import contextvars
+import glob
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import statistics
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from response_cache import CACHE_DIR
+
+METRICS_DIR = os.path.join(CACHE_DIR, "metrics")
+SPAN_LOG = os.path.join(METRICS_DIR, "spans.jsonl")
+
+# The span log rotates at this size, keeping this many old files
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUPS = 5
+
+# TRAIL_PERF=0 turns recording off; TRAIL_METRICS_PORT serves Prometheus text on that port
+ENABLED = os.environ.get("TRAIL_PERF", "1") != "0"
+METRICS_PORT = os.environ.get("TRAIL_METRICS_PORT")
+
+# Histogram buckets (seconds) for the Prometheus output
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Numeric span attributes that are also summed into counters
+COUNTED_ATTRS = ("rows", "bytes_in", "bytes_out", "prompt_tokens", "completion_tokens")
+
+# Recent durations kept per span name for percentiles in the debug panel
+RECENT_SAMPLES = 1000
+
+
+@dataclass
+class Span:
+    name: str
+    attrs: dict = field(default_factory=dict)
+    depth: int = 0
+    start: float = 0.0
+    seconds: float = 0.0
+    error: Optional[str] = None
+    thread: str = ""
+
+
+@dataclass
+class Trace:
+    """The spans recorded during one script run of one session."""
+    page: str
+    session: str
+    id: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
+    start: float = field(default_factory=time.perf_counter)
+    end: Optional[float] = None
+    spans: List[Span] = field(default_factory=list)
+
+    @property
+    def seconds(self) -> float:
+        return (self.end or time.perf_counter()) - self.start
+
+    def finish(self) -> "Trace":
+        if self.end is None:
+            self.end = time.perf_counter()
+        return self
+
+    def waterfall(self) -> List[dict]:
+        """Spans in start order with their offset from the start of the run, in ms."""
+        return [{
+            "span": span.name,
+            "depth": span.depth,
+            "offset_ms": (span.start - self.start) * 1000,
+            "ms": span.seconds * 1000,
+            "thread": span.thread,
+            "error": span.error or "",
+            **span.attrs,
+        } for span in sorted(self.spans, key=lambda span: span.start)]
+
+
+class Metrics:
+    """Process-wide span statistics: Prometheus histograms and counters plus recent samples."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, List[int]] = defaultdict(lambda: [0] * len(BUCKETS))
+        self._counts: Dict[str, int] = defaultdict(int)
+        self._sums: Dict[str, float] = defaultdict(float)
+        self._errors: Dict[str, int] = defaultdict(int)
+        self._totals: Dict[tuple, float] = defaultdict(float)
+        self._recent: Dict[str, deque] = defaultdict(lambda: deque(maxlen=RECENT_SAMPLES))
+
+    def observe(self, name: str, seconds: float, attrs: dict, error: Optional[str] = None) -> None:
+        with self._lock:
+            self._counts[name] += 1
+            self._sums[name] += seconds
+            buckets = self._buckets[name]
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    buckets[i] += 1
+            if error:
+                self._errors[name] += 1
+            for attr in COUNTED_ATTRS:
+                value = attrs.get(attr)
+                if isinstance(value, (int, float)):
+                    self._totals[(name, attr)] += value
+            self._recent[name].append(seconds)
+
+    def summary(self) -> List[dict]:
+        """Count, error count and recent p50/p95/max (ms) per span name, slowest p95 first."""
+        with self._lock:
+            rows = [{"span": name, "count": self._counts[name], "errors": self._errors[name],
+                     **percentiles(self._recent[name])} for name in self._counts]
+        return sorted(rows, key=lambda row: row["p95_ms"], reverse=True)
+
+    def prometheus(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            return prometheus_text(self._counts, self._sums, self._buckets, self._errors, self._totals)
+
+    def reset(self) -> None:
+        with self._lock:
+            for table in (self._buckets, self._counts, self._sums, self._errors, self._totals, self._recent):
+                table.clear()
+
+
+def percentiles(samples: Iterable[float]) -> dict:
+    ordered = sorted(samples)
+    if not ordered:
+        return {"p50_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+
+    def at(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+    return {"p50_ms": at(0.5), "p95_ms": at(0.95), "max_ms": ordered[-1] * 1000}
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text(counts: Dict[str, int], sums: Dict[str, float], buckets: Dict[str, List[int]],
+                    errors: Dict[str, int], totals: Dict[tuple, float]) -> str:
+    lines = ["# HELP trail_span_seconds Time spent in instrumented code paths.",
+             "# TYPE trail_span_seconds histogram"]
+    for name in sorted(counts):
+        span = _label(name)
+        for bound, count in zip(BUCKETS, buckets[name]):
+            lines.append(f'trail_span_seconds_bucket{{span="{span}",le="{bound}"}} {count}')
+        lines.append(f'trail_span_seconds_bucket{{span="{span}",le="+Inf"}} {counts[name]}')
+        lines.append(f'trail_span_seconds_sum{{span="{span}"}} {sums[name]:.6f}')
+        lines.append(f'trail_span_seconds_count{{span="{span}"}} {counts[name]}')
+
+    lines += ["# HELP trail_span_errors_total Instrumented calls that raised.",
+              "# TYPE trail_span_errors_total counter"]
+    lines += [f'trail_span_errors_total{{span="{_label(name)}"}} {errors.get(name, 0)}'
+              for name in sorted(counts)]
+
+    for attr in COUNTED_ATTRS:
+        names = sorted(name for name, counted in totals if counted == attr)
+        if names:
+            lines += [f"# HELP trail_{attr}_total Sum of {attr.replace('_', ' ')} over instrumented calls.",
+                      f"# TYPE trail_{attr}_total counter"]
+            lines += [f'trail_{attr}_total{{span="{_label(name)}"}} {totals[(name, attr)]:g}' for name in names]
+    return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("perf_trace", default=None)
+_current_span: contextvars.ContextVar = contextvars.ContextVar("perf_span", default=None)
+
+_logger = None
+_listener = None
+_server = None
+_setup_lock = threading.Lock()
+
+
+def _get_logger() -> logging.Logger:
+    """The span logger; records are written to the rotating JSONL file on a background thread."""
+    global _logger, _listener
+    if _logger is not None:
+        return _logger
+    with _setup_lock:
+        if _logger is None:
+            os.makedirs(METRICS_DIR, exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(SPAN_LOG, maxBytes=LOG_MAX_BYTES,
+                                                           backupCount=LOG_BACKUPS, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            records = queue.SimpleQueue()
+            _listener = logging.handlers.QueueListener(records, handler)
+            _listener.start()
+            atexit.register(_listener.stop)
+            logger = logging.getLogger("trail.perf")
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            logger.addHandler(logging.handlers.QueueHandler(records))
+            _logger = logger
+        return _logger
+
+
+def start_trace(page: str, session: str) -> Trace:
+    """Begin recording the spans of a script run; spans opened in this context join it."""
+    trace = Trace(page=page, session=session)
+    _current_trace.set(trace)
+    if METRICS_PORT:
+        serve_metrics(int(METRICS_PORT))
+    return trace
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def record(span: Span) -> None:
+    """Add a finished span to the current trace, the process metrics and the span log."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.spans.append(span)
+    metrics.observe(span.name, span.seconds, span.attrs, span.error)
+    entry = {"ts": round(time.time(), 3), "span": span.name, "ms": round(span.seconds * 1000, 3),
+             "depth": span.depth, "thread": span.thread, **span.attrs}
+    if span.error:
+        entry["error"] = span.error
+    if trace is not None:
+        entry.update(page=trace.page, session=trace.session, run=trace.id)
+    _get_logger().info(json.dumps(entry, default=str))
+
+
+@contextmanager
+def span(name: str, **attrs) -> Iterator[Span]:
+    """
+    Time the enclosed block as a span named `name`.
+
+    Attributes such as row counts, payload sizes and token counts can be
+    passed here or added while the block runs, via `annotate` or the
+    yielded span's `attrs`.
+    """
+    parent = _current_span.get()
+    current = Span(name, attrs, depth=parent.depth + 1 if parent else 0,
+                   thread=threading.current_thread().name)
+    token = _current_span.set(current)
+    current.start = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.error = type(e).__name__
+        raise
+    finally:
+        current.seconds = time.perf_counter() - current.start
+        try:
+            _current_span.reset(token)
+        except ValueError:
+            # A generator holding the span was closed from another context
+            pass
+        if ENABLED:
+            record(current)
+
+
+def annotate(**attrs) -> None:
+    """Add attributes to the innermost open span, if any."""
+    current = _current_span.get()
+    if current is not None:
+        current.attrs.update(attrs)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def render(self) -> str:
+        return metrics.prometheus()
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_metrics(port: int, host: str = "127.0.0.1") -> None:
+    """Serve this process's metrics at http://host:port/metrics (once per process)."""
+    global _server
+    with _setup_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            threading.Thread(target=_server.serve_forever, name="perf-metrics", daemon=True).start()
+
+
+def read_log(path: str = SPAN_LOG) -> Iterator[dict]:
+    """Yield the entries of the span log and its rotated backups, oldest file first."""
+    paths = sorted(glob.glob(path + ".*"), key=lambda p: int(p.rsplit(".", 1)[1]), reverse=True)
+    for log_path in paths + [path]:
+        if not os.path.exists(log_path):
+            continue
+        with open(log_path, encoding="utf-8") as file:
+            for line in file:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+
+def load_metrics(entries: Iterable[dict]) -> Metrics:
+    """Rebuild process-style metrics from span log entries."""
+    rebuilt = Metrics()
+    for entry in entries:
+        rebuilt.observe(entry["span"], entry["ms"] / 1000, entry, entry.get("error"))
+    return rebuilt
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize the span log written by the app.")
+    parser.add_argument("command", choices=["report", "prometheus", "serve"], nargs="?", default="report")
+    parser.add_argument("--log", default=SPAN_LOG)
+    parser.add_argument("--since", type=float, default=None, help="Only entries from the last N hours")
+    parser.add_argument("--port", type=int, default=9464, help="Port for `serve`")
+    args = parser.parse_args()
+
+    entries = read_log(args.log)
+    if args.since is not None:
+        cutoff = time.time() - args.since * 3600
+        entries = (entry for entry in entries if entry.get("ts", 0) >= cutoff)
+    entries = list(entries)
+
+    if args.command == "prometheus":
+        print(load_metrics(entries).prometheus(), end="")
+        return
+    if args.command == "serve":
+        # Re-reads the log on every scrape, for processes without TRAIL_METRICS_PORT
+        class LogHandler(_MetricsHandler):
+            def render(self) -> str:
+                return load_metrics(read_log(args.log)).prometheus()
+
+        print(f"Serving http://127.0.0.1:{args.port}/metrics from {args.log}")
+        ThreadingHTTPServer(("127.0.0.1", args.port), LogHandler).serve_forever()
+        return
+
+    runs = defaultdict(float)
+    for entry in entries:
+        if entry.get("run") and entry.get("depth", 0) == 0:
+            runs[(entry.get("page"), entry["run"])] += entry["ms"]
+    tokens = defaultdict(lambda: [0, 0])
+    for entry in entries:
+        tokens[entry["span"]][0] += entry.get("prompt_tokens") or 0
+        tokens[entry["span"]][1] += entry.get("completion_tokens") or 0
+
+    print(f"{len(entries)} spans from {args.log}")
+    print(f"{'span':<28} {'count':>7} {'errors':>6} {'p50':>10} {'p95':>10} {'max':>10} {'tokens in/out':>15}")
+    for row in load_metrics(entries).summary():
+        prompt, completion = tokens[row["span"]]
+        print(f"{row['span']:<28} {row['count']:>7} {row['errors']:>6} {row['p50_ms']:>8.1f}ms "
+              f"{row['p95_ms']:>8.1f}ms {row['max_ms']:>8.1f}ms {f'{prompt}/{completion}' if prompt else '':>15}")
+    if runs:
+        print(f"Instrumented time per run: median {statistics.median(runs.values()):.1f} ms over {len(runs)} runs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+# Default location of the shared cache database (next to the app, survives restarts);
+# TRAIL_CACHE_DIR moves it along with the snapshot, coordinates, boundaries and every
+# other derived file built under it, e.g. for load tests
+CACHE_DIR = os.environ.get("TRAIL_CACHE_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+DEFAULT_CACHE_PATH = os.path.join(CACHE_DIR, "responses.sqlite3")
+
+
+class ResponseCache:
+    """
+    Disk-backed cache for model responses, shared by every Streamlit session.
+
+    Entries are keyed on (namespace, key, model, prompt version), expire after
+    `ttl` seconds and are evicted least-recently-used once the cache holds more
+    than `max_entries` rows or `max_bytes` of response text.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, ttl: float = 7 * 24 * 3600,
+                 max_entries: int = 500, max_bytes: int = 20 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    prompt_version TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    PRIMARY KEY (namespace, key, model, prompt_version)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_access)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # One short-lived connection per call keeps this safe across Streamlit threads
+        # and across processes sharing the same file.
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, namespace: str, key: str, model: str, prompt_version: str) -> Optional[str]:
+        """Return the cached response, or None if missing or expired."""
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT value, created_at FROM responses "
+                "WHERE namespace = ? AND key = ? AND model = ? AND prompt_version = ?",
+                (namespace, key, model, prompt_version)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if self.ttl is not None and now - created_at > self.ttl:
+                conn.execute(
+                    "DELETE FROM responses "
+                    "WHERE namespace = ? AND key = ? AND model = ? AND prompt_version = ?",
+                    (namespace, key, model, prompt_version)
+                )
+                return None
+            conn.execute(
+                "UPDATE responses SET last_access = ? "
+                "WHERE namespace = ? AND key = ? AND model = ? AND prompt_version = ?",
+                (now, namespace, key, model, prompt_version)
+            )
+            return value
+
+    def set(self, namespace: str, key: str, model: str, prompt_version: str, value: str) -> None:
+        """Store a response and evict old entries if the cache is over budget."""
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(namespace, key, model, prompt_version, value, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (namespace, key, model, prompt_version, value,
+                 len(value.encode("utf-8")), now, now)
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        """Drop expired rows, then least-recently-used rows until within budget."""
+        if self.ttl is not None:
+            conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,))
+
+        count, total = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+
+        rows = conn.execute(
+            "SELECT rowid, size FROM responses ORDER BY last_access ASC"
+        ).fetchall()
+        doomed = []
+        for rowid, size in rows:
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            doomed.append((rowid,))
+            count -= 1
+            total -= size
+        conn.executemany("DELETE FROM responses WHERE rowid = ?", doomed)
+
+    def clear(self, namespace: Optional[str] = None) -> None:
+        """Remove every entry, or only those in one namespace."""
+        with self._lock, self._connect() as conn:
+            if namespace is None:
+                conn.execute("DELETE FROM responses")
+            else:
+                conn.execute("DELETE FROM responses WHERE namespace = ?", (namespace,))
+
+    def stats(self) -> dict:
+        """Return the entry count and total cached bytes."""
+        with self._lock, self._connect() as conn:
+            count, total = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return {"entries": count, "bytes": total}
@@ -0,0 +1,106 @@
+import argparse
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+from typing import Optional
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+PAGES = [
+    "Main.py",
+    "pages/1_trail_finder.py",
+    "pages/2_trail_info.py",
+    "pages/3_trail_visualizer.py",
+]
+
+# Runs in a fresh interpreter: Streamlit itself is imported before timing, so
+# the cold run measures what the page's own imports and first render cost
+_CHILD = r"""
+import json, os, sys, time
+root, page, reruns = sys.argv[1], sys.argv[2], int(sys.argv[3])
+os.chdir(root)
+sys.path.insert(0, root)
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+from streamlit.testing.v1 import AppTest
+
+before = set(sys.modules)
+start = time.perf_counter()
+at = AppTest.from_file(os.path.join(root, page), default_timeout=300).run()
+cold = time.perf_counter() - start
+modules = len(set(sys.modules) - before)
+times = []
+for _ in range(reruns):
+    start = time.perf_counter()
+    at.run()
+    times.append(time.perf_counter() - start)
+error = at.exception[0].message if len(at.exception) else None
+print(json.dumps({"cold": cold, "reruns": times, "modules": modules, "error": error}))
+"""
+
+
+def measure(root: str, page: str, reruns: int = 5) -> dict:
+    """Time a page's first run and its reruns in a fresh Python process."""
+    if not os.path.exists(os.path.join(root, page)):
+        return {"error": "missing"}
+    result = subprocess.run([sys.executable, "-c", _CHILD, root, page, str(reruns)],
+                            capture_output=True, text=True, timeout=600)
+    lines = result.stdout.strip().splitlines()
+    if result.returncode != 0 or not lines:
+        return {"error": (result.stderr.strip().splitlines() or ["failed"])[-1]}
+    data = json.loads(lines[-1])
+    data["rerun"] = statistics.median(data.pop("reruns")) if data["reruns"] else 0.0
+    return data
+
+
+def export_ref(ref: str, target: str) -> str:
+    """Write the tree at git `ref` (including data files) into `target`."""
+    archive = subprocess.run(["git", "archive", "--format=tar", ref], cwd=APP_DIR,
+                             capture_output=True, check=True).stdout
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        tar.extractall(target)
+    return target
+
+
+def format_ms(seconds: Optional[float]) -> str:
+    return "-" if seconds is None else f"{seconds * 1000:,.0f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cold start and rerun time of every page.")
+    parser.add_argument("--baseline", help="Git ref to compare against, e.g. HEAD~1")
+    parser.add_argument("--reruns", type=int, default=5, help="Reruns timed per page (median reported)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as baseline_dir:
+        if args.baseline:
+            export_ref(args.baseline, baseline_dir)
+
+        header = f"{'page':<30} {'cold start':>12} {'rerun':>10} {'modules':>8}"
+        if args.baseline:
+            header += f" | {'baseline cold':>13} {'rerun':>10} {'modules':>8} | {'cold saved':>10} {'rerun saved':>11}"
+        print(header)
+        for page in PAGES:
+            now = measure(APP_DIR, page, args.reruns)
+            line = (f"{page:<30} {format_ms(now.get('cold')):>12} {format_ms(now.get('rerun')):>10} "
+                    f"{now.get('modules', '-'):>8}")
+            if args.baseline:
+                base = measure(baseline_dir, page, args.reruns)
+                line += (f" | {format_ms(base.get('cold')):>13} {format_ms(base.get('rerun')):>10} "
+                         f"{base.get('modules', '-'):>8}")
+                if "cold" in now and "cold" in base:
+                    line += (f" | {format_ms(base['cold'] - now['cold']):>10} "
+                             f"{format_ms(base['rerun'] - now['rerun']):>11}")
+                if base.get("error"):
+                    line += f"  (baseline error: {base['error'][:60]})"
+            if now.get("error"):
+                line += f"  (error: {now['error'][:60]})"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import time
+from contextlib import closing
+from typing import Callable, Iterable, Iterator, Optional
+
+import openai_client
+
+
+def stream_chat_completion(model: str, messages: list, **kwargs) -> Iterator[str]:
+    """
+    Yield the text of a chat completion as it is generated.
+
+    The underlying HTTP stream is closed as soon as the generator is closed,
+    so abandoning it mid-way (e.g. on a Streamlit rerun) stops the request
+    and frees its slot in the shared client (see openai_client.py).
+    """
+    with closing(openai_client.stream_chat(model=model, messages=messages, **kwargs)) as stream:
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+def render_stream(placeholder, chunks: Iterable[str],
+                  render: Optional[Callable[[str], str]] = None,
+                  min_interval: float = 0.05) -> str:
+    """
+    Render text chunks into a Streamlit placeholder as they arrive.
+
+    Args:
+        placeholder: An `st.empty()` container to draw into
+        chunks: Iterable of text fragments
+        render: Turns the text received so far into the HTML/Markdown to show
+        min_interval (float): Minimum seconds between redraws
+
+    Returns:
+        str: The complete text
+    """
+    render = render or (lambda text: text)
+    text = ""
+    last_draw = 0.0
+    try:
+        for chunk in chunks:
+            text += chunk
+            now = time.monotonic()
+            if now - last_draw >= min_interval:
+                placeholder.markdown(render(text), unsafe_allow_html=True)
+                last_draw = now
+    finally:
+        # If the script is interrupted by a rerun, stop the upstream request too
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+    placeholder.markdown(render(text), unsafe_allow_html=True)
+    return text
@@ -0,0 +1,34 @@
+import geocode_index
+import park_spatial
+from parks_data import PARKS_CSV, load_parks
+
+
+def test_local_geocoder_never_records_address_source(tmp_path):
+    output = str(tmp_path / "park_coordinates.csv")
+    coordinates = geocode_index.build_index(PARKS_CSV, output, geocode_index.LocalGeocoder())
+
+    sources = {coordinate.source for coordinate in coordinates.values()}
+    assert geocode_index.ADDRESS not in sources
+    assert geocode_index.ESTIMATED in sources
+    assert geocode_index.load_coordinate_table(output) == coordinates
+
+
+def test_auto_built_table_is_estimated(tmp_path, monkeypatch):
+    path = str(tmp_path / "park_coordinates.csv")
+    monkeypatch.setattr(geocode_index, "COORDINATES_CSV", path)
+    geocode_index.ensure_table(path)
+
+    coordinates = geocode_index.load_coordinate_table(path)
+    assert len(coordinates) == len(load_parks())
+    assert not any(coordinate.exact for coordinate in coordinates.values())
+
+
+def test_zip_code_location_ignores_estimates(tmp_path, monkeypatch):
+    path = str(tmp_path / "park_coordinates.csv")
+    geocode_index.build_index(PARKS_CSV, path, geocode_index.LocalGeocoder())
+    monkeypatch.setattr(geocode_index, "COORDINATES_CSV", path)
+    monkeypatch.setattr(geocode_index, "get_coordinates", lambda: geocode_index.load_coordinate_table(path))
+
+    df = load_parks()
+    zip_code = df["zip code"].dropna().iloc[0]
+    assert park_spatial.zip_code_location(df, zip_code) is None
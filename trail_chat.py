@@ -0,0 +1,184 @@
+import html
+from collections import deque
+from typing import Callable, List, Optional
+
+import streamlit as st
+
+import openai_client
+import perf_trace
+from streaming import render_stream, stream_chat_completion
+
+CHAT_MODEL = "gpt-4o-mini"
+
+SYSTEM_PROMPT = """You are the Creekside Trail Explorer assistant for Santa Clara County parks and trails.
+Answer questions about trails, hiking, safety, and the plants and animals found along creek trails.
+Be friendly and concise. If you are not sure about a specific park detail, say so."""
+
+SUMMARY_PROMPT = """Update the running summary of a conversation between a hiker and a trail assistant.
+Keep the hiker's preferences, parks and trails mentioned, and any open questions.
+Reply with the new summary only, in at most a few short sentences."""
+
+CONTEXT_PROMPT = """Data retrieved for the latest question from the county parks dataset and the Trail Guide.
+Prefer it over general knowledge when it answers the question; it may be incomplete."""
+
+# Token budget for the conversation sent with each question: the running
+# summary plus the most recent turns, verbatim
+CONTEXT_TOKENS = 2000
+SUMMARY_TOKENS = 250
+RECENT_TOKENS = CONTEXT_TOKENS - SUMMARY_TOKENS
+
+# Longest question and answer, in tokens
+PROMPT_TOKENS = 500
+ANSWER_TOKENS = 600
+
+# Messages kept for display in the sidebar
+TRANSCRIPT_LENGTH = 40
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token, plus per-message overhead)."""
+    return len(text) // 4 + 4
+
+
+def truncate(text: str, tokens: int) -> str:
+    """Cut text to roughly `tokens` tokens."""
+    limit = tokens * 4
+    return text if len(text) <= limit else text[:limit] + "…"
+
+
+def summarize_turns(summary: str, turns: List[dict]) -> str:
+    """Fold older turns into the running summary."""
+    transcript = "\n".join(f"{turn['role']}: {turn['content']}" for turn in turns)
+    response = openai_client.chat(
+        model=CHAT_MODEL,
+        messages=[
+            {"role": "system", "content": SUMMARY_PROMPT},
+            {"role": "user", "content": f"Current summary:\n{summary or '(none)'}\n\nNew turns:\n{transcript}"}
+        ],
+        temperature=0.2,
+        max_tokens=SUMMARY_TOKENS
+    )
+    return response.choices[0].message.content.strip()
+
+
+class ChatMemory:
+    """
+    Bounded conversation state for one session.
+
+    Recent turns are kept verbatim up to `RECENT_TOKENS`; when they overflow,
+    the oldest are folded into a running summary of at most
+    `SUMMARY_TOKENS`. Every request therefore carries at most about
+    `CONTEXT_TOKENS` of history however long the conversation gets. Turns
+    are folded in batches (down to half the budget) so the extra summary
+    request is only made every few turns. The transcript shown in the
+    sidebar is capped separately at `TRANSCRIPT_LENGTH` messages.
+    """
+
+    def __init__(self):
+        self.summary = ""
+        self.recent: List[dict] = []
+        self.transcript: deque = deque(maxlen=TRANSCRIPT_LENGTH)
+
+    def add(self, role: str, content: str) -> None:
+        message = {"role": role, "content": content}
+        self.recent.append(message)
+        self.transcript.append(message)
+
+    def recent_tokens(self) -> int:
+        return sum(estimate_tokens(message["content"]) for message in self.recent)
+
+    def messages(self, system_prompt: str = SYSTEM_PROMPT, context: str = "") -> List[dict]:
+        """The messages to send: system prompt, retrieved context, running summary, then recent turns."""
+        messages = [{"role": "system", "content": system_prompt}]
+        if context:
+            messages.append({"role": "system", "content": f"{CONTEXT_PROMPT}\n\n{context}"})
+        if self.summary:
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{self.summary}"})
+        return messages + self.recent
+
+    def compact(self, summarize: Optional[Callable[[str, List[dict]], str]] = None) -> None:
+        """Fold the oldest turns into the summary if the recent turns are over budget."""
+        summarize = summarize or summarize_turns
+        if self.recent_tokens() <= RECENT_TOKENS:
+            return
+        folded = []
+        # Always keep the latest exchange verbatim
+        while len(self.recent) > 2 and self.recent_tokens() > RECENT_TOKENS // 2:
+            folded.append(self.recent.pop(0))
+        if not folded:
+            return
+        try:
+            self.summary = truncate(summarize(self.summary, folded), SUMMARY_TOKENS)
+        except Exception:
+            # The folded turns are dropped either way, so memory stays bounded
+            pass
+
+
+def get_memory() -> ChatMemory:
+    """Return this session's chat memory."""
+    if "chat_memory" not in st.session_state:
+        st.session_state.chat_memory = ChatMemory()
+    return st.session_state.chat_memory
+
+
+def retrieve_context(question: str) -> str:
+    """Parks rows and Trail Guide passages relevant to `question` (see park_retrieval.py)."""
+    try:
+        # Imported on first question: it loads the parks data and pandas
+        import park_retrieval
+
+        with perf_trace.span("chat.retrieve") as span:
+            context = park_retrieval.get_retriever().context(question)
+            span.attrs["context_chars"] = len(context)
+        return context
+    except Exception:
+        # Answer without grounding rather than not at all
+        return ""
+
+
+def answer(memory: ChatMemory, question: str, placeholder) -> Optional[str]:
+    """Stream the answer to `question` into `placeholder` and record both turns."""
+    question = truncate(question, PROMPT_TOKENS)
+    context = retrieve_context(question)
+    memory.add("user", question)
+    try:
+        reply = render_stream(
+            placeholder,
+            stream_chat_completion(CHAT_MODEL, memory.messages(context=context),
+                                   temperature=0.5, max_tokens=ANSWER_TOKENS),
+            render=html.escape
+        )
+    except Exception as e:
+        memory.recent.pop()
+        placeholder.error(f"Chat error: {e}")
+        return None
+    memory.add("assistant", reply)
+    memory.compact()
+    return reply
+
+
+def chat_sidebar() -> None:
+    """Draw the Trail Chat Assistant in the current container (normally the sidebar)."""
+    st.markdown("""
+    <div style='text-align: center; padding: 1rem;'>
+        <h2 style='color: #ffffff;'>💭 Trail Chat Assistant</h2>
+    </div>
+    """, unsafe_allow_html=True)
+
+    memory = get_memory()
+
+    # Chat container
+    messages = st.container()
+    with messages:
+        for message in memory.transcript:
+            with st.chat_message(message["role"]):
+                st.write(message["content"])
+
+    # Chat input with styling
+    prompt = st.chat_input("Ask about trails...")
+    if prompt:
+        with messages:
+            with st.chat_message("user"):
+                st.write(prompt)
+            with st.chat_message("assistant"):
+                answer(memory, prompt, st.empty())
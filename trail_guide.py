@@ -0,0 +1,143 @@
+import argparse
+import time
+from contextlib import closing
+from typing import Iterator
+
+import openai_client
+from response_cache import ResponseCache
+from streaming import stream_chat_completion
+
+# Topics offered on the Trail Guide page
+TOPICS = [
+    "Wildlife Encounters & Safety",
+    "Plant Hazards & Identification",
+    "Weather Safety & Preparation",
+    "Navigation & Trail Markers",
+    "First Aid & Emergency Response",
+    "Gear & Equipment Essentials",
+    "Water Safety & Hydration",
+    "Trail Etiquette & Rules",
+    "Seasonal Hiking Tips",
+    "Physical Preparation & Fitness"
+]
+
+DEFAULT_MODEL = "gpt-4o-2024-08-06"
+
+# Bump whenever the prompts below change so stale cached answers are not served
+PROMPT_VERSION = "1"
+
+SYSTEM_PROMPT = "You are an expert on hiking safety and trail information. Provide detailed, practical advice about hiking concerns and safety measures. Format your response using Markdown with appropriate headers, bullet points, and emphasis where needed."
+
+CACHE_NAMESPACE = "trail_guide"
+
+_cache = None
+
+
+def get_cache() -> ResponseCache:
+    """Return the process-wide response cache, creating it on first use."""
+    global _cache
+    if _cache is None:
+        _cache = ResponseCache()
+    return _cache
+
+
+def build_messages(category: str) -> list:
+    """Build the chat messages for a Trail Guide topic."""
+    return [
+        {
+            "role": "system",
+            "content": SYSTEM_PROMPT
+        },
+        {
+            "role": "user",
+            "content": f"Provide comprehensive information about {category} on hiking trails, including potential risks and safety tips. Include specific examples and actionable advice."
+        }
+    ]
+
+
+def generate_hiking_info(category: str, model: str = DEFAULT_MODEL) -> str:
+    """Call the model for a topic, bypassing the cache."""
+    completion = openai_client.chat(
+        model=model,
+        messages=build_messages(category)
+    )
+    return completion.choices[0].message.content
+
+
+def get_hiking_info(category: str, model: str = DEFAULT_MODEL, refresh: bool = False) -> str:
+    """
+    Return hiking information for a topic, served from the shared cache when possible.
+
+    Args:
+        category (str): The hiking topic to get information about
+        model (str): The GPT model to use
+        refresh (bool): Regenerate even if a cached answer exists
+
+    Returns:
+        str: Generated information about the hiking topic
+    """
+    cache = get_cache()
+    if not refresh:
+        cached = cache.get(CACHE_NAMESPACE, category, model, PROMPT_VERSION)
+        if cached is not None:
+            return cached
+
+    response = generate_hiking_info(category, model)
+    if response:
+        cache.set(CACHE_NAMESPACE, category, model, PROMPT_VERSION, response)
+    return response
+
+
+def stream_hiking_info(category: str, model: str = DEFAULT_MODEL) -> Iterator[str]:
+    """
+    Yield hiking information for a topic as it is generated.
+
+    A cached answer is yielded in one piece. A fresh answer is streamed and only
+    written to the cache once the stream completes, so a stream abandoned
+    half-way never leaves a truncated entry behind.
+    """
+    cache = get_cache()
+    cached = cache.get(CACHE_NAMESPACE, category, model, PROMPT_VERSION)
+    if cached is not None:
+        yield cached
+        return
+
+    parts = []
+    with closing(stream_chat_completion(model, build_messages(category))) as chunks:
+        for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
+
+    response = "".join(parts)
+    if response:
+        cache.set(CACHE_NAMESPACE, category, model, PROMPT_VERSION, response)
+
+
+def prewarm(model: str = DEFAULT_MODEL, refresh: bool = False) -> None:
+    """Fill the cache for every Trail Guide topic."""
+    for category in TOPICS:
+        start = time.perf_counter()
+        try:
+            get_hiking_info(category, model, refresh=refresh)
+            print(f"{category}: ok ({time.perf_counter() - start:.2f}s)")
+        except Exception as e:
+            print(f"{category}: failed ({e})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the Trail Guide response cache.")
+    parser.add_argument("command", choices=["prewarm", "stats", "clear"])
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="Model to prewarm answers for")
+    parser.add_argument("--refresh", action="store_true", help="Regenerate answers that are already cached")
+    args = parser.parse_args()
+
+    if args.command == "prewarm":
+        prewarm(args.model, refresh=args.refresh)
+    elif args.command == "clear":
+        get_cache().clear(CACHE_NAMESPACE)
+    stats = get_cache().stats()
+    print(f"Cache: {stats['entries']} entries, {stats['bytes']:,} bytes")
+
+
+if __name__ == "__main__":
+    main()
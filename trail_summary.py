@@ -0,0 +1,331 @@
+import argparse
+import asyncio
+import hashlib
+import html
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+import openai_client
+from parks_data import load_parks
+from response_cache import CACHE_DIR
+from streaming import stream_chat_completion
+
+SUMMARY_MODEL = "gpt-3.5-turbo"
+SUMMARY_MAX_TOKENS = 500
+
+# Bump whenever the prompts below change so stored summaries are regenerated
+PROMPT_VERSION = "1"
+
+DEFAULT_STORE_PATH = os.path.join(CACHE_DIR, "summaries.sqlite3")
+
+SUMMARY_SECTIONS = [
+    "Trail Highlights",
+    "Key Features",
+    "Best Times to Visit",
+    "Notable Information"
+]
+
+# System message to set the context
+SYSTEM_PROMPT = "You are a knowledgeable park ranger. Provide a concise summary of the trail information."
+
+
+def format_trail_info(trail_data: dict) -> str:
+    """Format a park row as the "key: value" lines sent to the model."""
+    return "\n".join([f"{key}: {value}" for key, value in trail_data.items()])
+
+
+def row_hash(trail_data: dict) -> str:
+    """Content hash of everything that determines a park's summary."""
+    content = f"{SUMMARY_MODEL}\n{PROMPT_VERSION}\n{format_trail_info(trail_data)}"
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def build_messages(trail_data: dict) -> list:
+    """Build the chat messages asking for a summary of one trail."""
+    # Format trail info
+    trail_info = format_trail_info(trail_data)
+
+    # User message with the trail data and request
+    user_msg = f"""Analyze the following trail information and provide a structured summary with these sections:
+        - Trail Highlights
+        - Key Features
+        - Best Times to Visit
+        - Notable Information
+
+        Present each section's content without bullet points or dashes.
+
+        Trail Data:
+        {trail_info}"""
+
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": user_msg}
+    ]
+
+
+def format_summary_line(line: str) -> str:
+    """Format one line of a raw summary as HTML."""
+    text = line.strip().lstrip("#-•* ").strip()
+    if not text:
+        return ""
+
+    # Section headings may come as "**Key Features:**", "## Key Features" or "Key Features: ..."
+    plain = text.replace("**", "")
+    for section in SUMMARY_SECTIONS:
+        if plain.lower().startswith(section.lower()):
+            rest = plain[len(section):].lstrip(":").strip()
+            heading = f"<p><strong>{section}</strong></p>"
+            return heading + (f"<p>{html.escape(rest)}</p>" if rest else "")
+
+    return f"<p>{html.escape(plain)}</p>"
+
+
+def format_summary(raw_summary: str) -> str:
+    """Format a raw model summary as HTML with one heading per section."""
+    return "".join(format_summary_line(line) for line in raw_summary.splitlines())
+
+
+class SummaryFormatter:
+    """
+    Incremental version of `format_summary` for streamed text.
+
+    Completed lines are formatted once and remembered; only the trailing,
+    still-growing line is reformatted on each call.
+    """
+
+    def __init__(self):
+        self._done_len = 0
+        self._done_html = ""
+
+    def __call__(self, text: str) -> str:
+        end = text.rfind("\n") + 1
+        if end > self._done_len:
+            self._done_html += format_summary(text[self._done_len:end])
+            self._done_len = end
+        return self._done_html + format_summary_line(text[self._done_len:])
+
+
+def get_trail_summary(trail_data: dict) -> str:
+    """Generate a formatted summary for one trail in a single request."""
+    try:
+        response = openai_client.chat(
+            model=SUMMARY_MODEL,
+            messages=build_messages(trail_data),
+            temperature=0.7,
+            max_tokens=SUMMARY_MAX_TOKENS
+        )
+
+        # Get and format the response
+        raw_summary = str(response.choices[0].message.content)
+        return format_summary(raw_summary)
+
+    except Exception as api_error:
+        return f"API Error: {str(api_error)}"
+
+
+def stream_trail_summary(trail_data: dict) -> Iterator[str]:
+    """Yield the raw summary text for one trail as it is generated."""
+    yield from stream_chat_completion(
+        SUMMARY_MODEL,
+        build_messages(trail_data),
+        temperature=0.7,
+        max_tokens=SUMMARY_MAX_TOKENS
+    )
+
+
+class SummaryStore:
+    """
+    Precomputed trail summaries, one per OBJECTID.
+
+    Each summary is stored with the hash of the row it was generated from
+    (see `row_hash`), so a summary is only served while the park's data,
+    the model and the prompt are unchanged.
+    """
+
+    def __init__(self, path: str = DEFAULT_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS summaries (
+                    objectid INTEGER PRIMARY KEY,
+                    row_hash TEXT NOT NULL,
+                    summary TEXT NOT NULL,
+                    tokens INTEGER NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, objectid: int, row_hash: str) -> Optional[str]:
+        """Return the raw summary for a park, or None if missing or out of date."""
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT summary FROM summaries WHERE objectid = ? AND row_hash = ?",
+                (int(objectid), row_hash)
+            ).fetchone()
+        return row[0] if row else None
+
+    def hashes(self) -> dict:
+        """Return {objectid: row_hash} for every stored summary."""
+        with self._lock, self._connect() as conn:
+            return dict(conn.execute("SELECT objectid, row_hash FROM summaries").fetchall())
+
+    def put(self, objectid: int, row_hash: str, summary: str, tokens: int = 0) -> None:
+        """Store (or replace) the summary for a park."""
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO summaries (objectid, row_hash, summary, tokens, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (int(objectid), row_hash, summary, tokens, time.time())
+            )
+
+    def prune(self, objectids) -> int:
+        """Delete summaries of parks no longer in the dataset; return how many."""
+        keep = {int(objectid) for objectid in objectids}
+        stale = [(objectid,) for objectid in self.hashes() if objectid not in keep]
+        with self._lock, self._connect() as conn:
+            conn.executemany("DELETE FROM summaries WHERE objectid = ?", stale)
+        return len(stale)
+
+
+_store = None
+
+
+def get_store() -> SummaryStore:
+    """Return the process-wide summary store, creating it on first use."""
+    global _store
+    if _store is None:
+        _store = SummaryStore()
+    return _store
+
+
+def get_stored_summary(trail_data: dict) -> Optional[str]:
+    """Return the precomputed raw summary for a park row, if it is up to date."""
+    return get_store().get(trail_data["objectid"], row_hash(trail_data))
+
+
+class AsyncRateLimiter:
+    """Spaces request start times so no more than `per_minute` start per minute."""
+
+    def __init__(self, per_minute: float):
+        self.interval = 60.0 / per_minute
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self) -> None:
+        async with self._lock:
+            now = asyncio.get_running_loop().time()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def estimate_tokens(trail_data: dict) -> int:
+    """Rough upper bound on the tokens one summary request uses (4 chars per token)."""
+    prompt = sum(len(message["content"]) for message in build_messages(trail_data))
+    return prompt // 4 + SUMMARY_MAX_TOKENS
+
+
+async def generate_summaries(rows: list, store: SummaryStore, requests_per_minute: float = 60,
+                             token_budget: Optional[int] = None, concurrency: int = 8,
+                             client=None) -> dict:
+    """
+    Generate and store summaries for the given park rows concurrently.
+
+    At most `concurrency` requests are in flight and at most
+    `requests_per_minute` start per minute. Once the tokens used plus the
+    estimates for requests in flight would exceed `token_budget`, remaining
+    rows are left for the next run.
+
+    Returns:
+        dict: Counts of generated, failed and deferred rows and tokens used
+    """
+    client = client or openai_client.get_async_client()
+    limiter = AsyncRateLimiter(requests_per_minute)
+    semaphore = asyncio.Semaphore(concurrency)
+    stats = {"generated": 0, "failed": 0, "deferred": 0, "tokens": 0}
+    reserved = 0
+
+    async def summarize(trail_data: dict) -> None:
+        nonlocal reserved
+        async with semaphore:
+            estimate = estimate_tokens(trail_data)
+            if token_budget is not None and stats["tokens"] + reserved + estimate > token_budget:
+                stats["deferred"] += 1
+                return
+            reserved += estimate
+            try:
+                await limiter.wait()
+                response = await client.chat.completions.create(
+                    model=SUMMARY_MODEL,
+                    messages=build_messages(trail_data),
+                    temperature=0.7,
+                    max_tokens=SUMMARY_MAX_TOKENS
+                )
+                tokens = response.usage.total_tokens if response.usage else estimate
+                store.put(trail_data["objectid"], row_hash(trail_data),
+                          str(response.choices[0].message.content), tokens)
+                stats["generated"] += 1
+                stats["tokens"] += tokens
+            except Exception as e:
+                stats["failed"] += 1
+                print(f"OBJECTID {trail_data['objectid']}: {e}")
+            finally:
+                reserved -= estimate
+
+    await asyncio.gather(*(summarize(trail_data) for trail_data in rows))
+    return stats
+
+
+def pending_rows(df, store: SummaryStore, refresh: bool = False) -> list:
+    """Return the park rows whose stored summary is missing or out of date."""
+    stored = {} if refresh else store.hashes()
+    rows = []
+    for trail_data in df.to_dict("records"):
+        if stored.get(int(trail_data["objectid"])) != row_hash(trail_data):
+            rows.append(trail_data)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute AI summaries for every park.")
+    parser.add_argument("--rpm", type=float, default=60, help="Maximum requests started per minute")
+    parser.add_argument("--token-budget", type=int, help="Stop once this many tokens have been used")
+    parser.add_argument("--concurrency", type=int, default=8, help="Maximum requests in flight")
+    parser.add_argument("--refresh", action="store_true", help="Regenerate summaries that are up to date")
+    parser.add_argument("--dry-run", action="store_true", help="Only report which parks need a summary")
+    args = parser.parse_args()
+
+    df = load_parks()
+    store = get_store()
+    pruned = store.prune(df["objectid"].tolist())
+    rows = pending_rows(df, store, refresh=args.refresh)
+    print(f"{len(df)} parks, {len(rows)} need a summary, {pruned} stale summaries removed")
+    if args.dry_run or not rows:
+        return
+
+    start = time.perf_counter()
+    stats = asyncio.run(generate_summaries(rows, store, args.rpm, args.token_budget, args.concurrency))
+    print(f"Generated {stats['generated']}, failed {stats['failed']}, deferred {stats['deferred']} "
+          f"({stats['tokens']:,} tokens, {time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()